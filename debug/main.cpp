@@ -1,12 +1,34 @@
-#include "../lib/src/glxcontext.h"
+#include "../lib/src/glprobe.h"
+
+#include <cstdio>
 
 int main()
 {
-    createGlxContext(1, 1);
+    Result context = createGlxContext(1, 1);
+    if (context.code != 0) {
+        std::printf("createGlxContext failed: %s\n", context.message);
+        return context.code;
+    }
     gladLoadFunctions();
     gladGetMajorVersion();
     gladGetMinorVersion();
-    testBasicOpenGlFunctions();
+
+    GlProbe probe;
+    Result  res = probeOpenGL(&probe);
+    if (res.code != 0) {
+        std::printf("probeOpenGL failed: %s\n", res.message);
+    } else {
+        std::printf("OpenGL %d.%d, %s, %s\n", probe.major, probe.minor, probe.vendor, probe.renderer);
+        std::printf("%d statements, %d errors\n", probe.statements, probe.errorCount);
+        int recorded = probe.errorCount < GL_PROBE_MAX_ERRORS ? probe.errorCount : GL_PROBE_MAX_ERRORS;
+        for (int i = 0; i < recorded; ++i) {
+            const GlProbeError& error = probe.errors[i];
+            std::printf("  statement %d: error 0x%x %s\n", error.statement, error.error, error.text);
+        }
+        if (probe.infoLog[0] != '\0') {
+            std::printf("%s\n", probe.infoLog);
+        }
+    }
     destroyGlxContext();
-    return 0;
-}
\ No newline at end of file
+    return res.code;
+}
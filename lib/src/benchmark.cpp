@@ -0,0 +1,224 @@
+#include "benchmark.h"
+#include "../glad/glad.h"
+#include "glutil.h"
+
+#include <chrono>
+#include <cstring>
+#include <vector>
+
+namespace {
+
+using Clock = std::chrono::steady_clock;
+
+const GLsizeiptr UPLOAD_SIZE     = 32 * 1024 * 1024;
+const int        UPLOAD_ROUNDS   = 8;
+const GLsizei    TARGET_SIZE     = 1024;
+const int        READBACK_ROUNDS = 16;
+const int        FILL_ROUNDS     = 64;
+const int        DRAW_CALLS      = 10000;
+
+// Measures both wall time and, when timer queries are supported, GPU time
+class Timer
+{
+public:
+    Timer()
+    {
+        if (GLAD_GL_VERSION_3_3 || GLAD_GL_ARB_timer_query) {
+            glGenQueries(1, &query_);
+        }
+    }
+
+    ~Timer()
+    {
+        if (query_) {
+            glDeleteQueries(1, &query_);
+        }
+    }
+
+    bool hasGpuTime() const { return query_ != 0; }
+
+    void begin()
+    {
+        glFinish();
+        start_ = Clock::now();
+        if (query_) {
+            glBeginQuery(GL_TIME_ELAPSED, query_);
+        }
+    }
+
+    void end()
+    {
+        if (query_) {
+            glEndQuery(GL_TIME_ELAPSED);
+        }
+        glFinish();
+        cpu_ = std::chrono::duration<double>(Clock::now() - start_).count();
+        gpu_ = 0.0;
+        if (query_) {
+            GLuint64 ns = 0;
+            glGetQueryObjectui64v(query_, GL_QUERY_RESULT, &ns);
+            gpu_ = ns * 1e-9;
+        }
+    }
+
+    // wall time of the CPU submitting the work and waiting for it
+    double cpu() const { return cpu_; }
+
+    // GPU execution time, wall time when timer queries are unsupported
+    double gpu() const { return gpu_ > 0.0 ? gpu_ : cpu_; }
+
+private:
+    GLuint            query_ = 0;
+    Clock::time_point start_;
+    double            cpu_ = 0.0;
+    double            gpu_ = 0.0;
+};
+
+double megabytes(double bytes) { return bytes / (1024.0 * 1024.0); }
+
+} // namespace
+
+Result runGpuBenchmark(BenchmarkResult* out)
+{
+    static const GLchar* vsSource = R"glsl(
+        #version 330 core
+        uniform vec4 uRect;
+        void main() {
+            vec2 p = vec2((gl_VertexID & 1) != 0 ? uRect.z : uRect.x,
+                          (gl_VertexID & 2) != 0 ? uRect.w : uRect.y);
+            gl_Position = vec4(p, 0.0, 1.0);
+        }
+    )glsl";
+    static const GLchar* fsSource = R"glsl(
+        #version 330 core
+        out vec4 FragColor;
+        void main() {
+            FragColor = vec4(0.2, 0.4, 0.6, 1.0);
+        }
+    )glsl";
+    if (!GLAD_GL_VERSION_3_3) {
+        return {1, "GPU benchmark requires OpenGL 3.3"};
+    }
+
+    *out = {};
+    Timer timer;
+    out->gpuTimers = timer.hasGpuTime();
+    while (glGetError() != GL_NO_ERROR) {
+    }
+
+    GLint viewport[4];
+    glGetIntegerv(GL_VIEWPORT, viewport);
+    // the default framebuffer of a surfaceless context is an FBO, not 0
+    GLint previous = 0;
+    glGetIntegerv(GL_FRAMEBUFFER_BINDING, &previous);
+
+    // upload bandwidth: glBufferSubData and mapped buffer writes
+    std::vector<char> data(UPLOAD_SIZE, 0x5a);
+    GLuint            buffer = 0;
+    glGenBuffers(1, &buffer);
+    glBindBuffer(GL_ARRAY_BUFFER, buffer);
+    glBufferData(GL_ARRAY_BUFFER, UPLOAD_SIZE, nullptr, GL_STREAM_DRAW);
+
+    timer.begin();
+    for (int i = 0; i < UPLOAD_ROUNDS; ++i) {
+        glBufferSubData(GL_ARRAY_BUFFER, 0, UPLOAD_SIZE, data.data());
+    }
+    timer.end();
+    out->uploadMBps = megabytes(double(UPLOAD_SIZE) * UPLOAD_ROUNDS) / timer.cpu();
+
+    timer.begin();
+    for (int i = 0; i < UPLOAD_ROUNDS; ++i) {
+        void* ptr = glMapBufferRange(GL_ARRAY_BUFFER, 0, UPLOAD_SIZE, GL_MAP_WRITE_BIT | GL_MAP_INVALIDATE_BUFFER_BIT);
+        if (!ptr) {
+            break;
+        }
+        std::memcpy(ptr, data.data(), UPLOAD_SIZE);
+        glUnmapBuffer(GL_ARRAY_BUFFER);
+    }
+    timer.end();
+    out->mappedUploadMBps = megabytes(double(UPLOAD_SIZE) * UPLOAD_ROUNDS) / timer.cpu();
+    glBindBuffer(GL_ARRAY_BUFFER, 0);
+    glDeleteBuffers(1, &buffer);
+
+    // offscreen target for readback, draw calls and fill rate
+    GLuint fbo = 0, color = 0, vao = 0;
+    glGenRenderbuffers(1, &color);
+    glBindRenderbuffer(GL_RENDERBUFFER, color);
+    glRenderbufferStorage(GL_RENDERBUFFER, GL_RGBA8, TARGET_SIZE, TARGET_SIZE);
+    glGenFramebuffers(1, &fbo);
+    glBindFramebuffer(GL_FRAMEBUFFER, fbo);
+    glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_RENDERBUFFER, color);
+    if (glCheckFramebufferStatus(GL_FRAMEBUFFER) != GL_FRAMEBUFFER_COMPLETE) {
+        glBindFramebuffer(GL_FRAMEBUFFER, previous);
+        glDeleteFramebuffers(1, &fbo);
+        glDeleteRenderbuffers(1, &color);
+        return {2, "GPU benchmark failed to create offscreen framebuffer"};
+    }
+    glViewport(0, 0, TARGET_SIZE, TARGET_SIZE);
+    glClearColor(0.0f, 0.0f, 0.0f, 1.0f);
+    glClear(GL_COLOR_BUFFER_BIT);
+
+    // readback bandwidth: framebuffer into a pixel pack buffer
+    const GLsizeiptr readbackSize = GLsizeiptr(TARGET_SIZE) * TARGET_SIZE * 4;
+    GLuint           pbo          = 0;
+    glGenBuffers(1, &pbo);
+    glBindBuffer(GL_PIXEL_PACK_BUFFER, pbo);
+    glBufferData(GL_PIXEL_PACK_BUFFER, readbackSize, nullptr, GL_STREAM_READ);
+    timer.begin();
+    for (int i = 0; i < READBACK_ROUNDS; ++i) {
+        glReadPixels(0, 0, TARGET_SIZE, TARGET_SIZE, GL_RGBA, GL_UNSIGNED_BYTE, nullptr);
+    }
+    timer.end();
+    out->readbackMBps = megabytes(double(readbackSize) * READBACK_ROUNDS) / timer.gpu();
+    glBindBuffer(GL_PIXEL_PACK_BUFFER, 0);
+    glDeleteBuffers(1, &pbo);
+
+    GLuint program = compileProgram(vsSource, fsSource);
+    if (!program) {
+        glBindFramebuffer(GL_FRAMEBUFFER, previous);
+        glDeleteFramebuffers(1, &fbo);
+        glDeleteRenderbuffers(1, &color);
+        return {3, "GPU benchmark failed to build shader program"};
+    }
+    GLint rect = glGetUniformLocation(program, "uRect");
+    glGenVertexArrays(1, &vao);
+    glBindVertexArray(vao);
+    glUseProgram(program);
+    glDisable(GL_DEPTH_TEST);
+    glDisable(GL_BLEND);
+
+    // draw call throughput: tiny quads, bound by CPU and driver
+    const float pixel = 2.0f / TARGET_SIZE;
+    glUniform4f(rect, -1.0f, -1.0f, -1.0f + pixel, -1.0f + pixel);
+    timer.begin();
+    for (int i = 0; i < DRAW_CALLS; ++i) {
+        glDrawArrays(GL_TRIANGLE_STRIP, 0, 4);
+    }
+    timer.end();
+    out->drawCallsPerSec = DRAW_CALLS / timer.cpu();
+
+    // fill rate: full screen quads
+    glUniform4f(rect, -1.0f, -1.0f, 1.0f, 1.0f);
+    timer.begin();
+    for (int i = 0; i < FILL_ROUNDS; ++i) {
+        glDrawArrays(GL_TRIANGLE_STRIP, 0, 4);
+    }
+    timer.end();
+    out->fillRateMPixPerSec = double(TARGET_SIZE) * TARGET_SIZE * FILL_ROUNDS / timer.gpu() / 1e6;
+
+    GLenum err = glGetError();
+
+    glUseProgram(0);
+    glBindVertexArray(0);
+    glDeleteVertexArrays(1, &vao);
+    glDeleteProgram(program);
+    glBindFramebuffer(GL_FRAMEBUFFER, previous);
+    glDeleteFramebuffers(1, &fbo);
+    glDeleteRenderbuffers(1, &color);
+    glViewport(viewport[0], viewport[1], viewport[2], viewport[3]);
+
+    if (err != GL_NO_ERROR) {
+        return {4, "GPU benchmark raised an OpenGL error"};
+    }
+    return {0, ""};
+}
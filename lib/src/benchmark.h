@@ -0,0 +1,18 @@
+#pragma once
+
+#include "glxcontext.h"
+
+extern "C" {
+
+struct BenchmarkResult {
+    double uploadMBps;
+    double mappedUploadMBps;
+    double readbackMBps;
+    double drawCallsPerSec;
+    double fillRateMPixPerSec;
+    int    gpuTimers;
+};
+
+Result runGpuBenchmark(BenchmarkResult* out);
+
+}
@@ -0,0 +1,165 @@
+#include "eglcontext.h"
+#include "../glad/glad.h"
+#include "glutil.h"
+
+#include <vector>
+
+#include <EGL/egl.h>
+#include <EGL/eglext.h>
+
+namespace {
+
+EGLDisplay g_display     = EGL_NO_DISPLAY;
+EGLContext g_context     = EGL_NO_CONTEXT;
+GLuint     g_framebuffer = 0;
+GLuint     g_color       = 0;
+GLuint     g_depth       = 0;
+int        g_width       = 1;
+int        g_height      = 1;
+
+// first hardware device, software devices (llvmpipe) are left to the surfaceless platform
+EGLDisplay deviceDisplay(PFNEGLGETPLATFORMDISPLAYEXTPROC getPlatformDisplay)
+{
+    auto queryDevices      = (PFNEGLQUERYDEVICESEXTPROC)eglGetProcAddress("eglQueryDevicesEXT");
+    auto queryDeviceString = (PFNEGLQUERYDEVICESTRINGEXTPROC)eglGetProcAddress("eglQueryDeviceStringEXT");
+    EGLint count           = 0;
+    if (!queryDevices || !queryDeviceString || !queryDevices(0, nullptr, &count) || count <= 0) {
+        return EGL_NO_DISPLAY;
+    }
+    std::vector<EGLDeviceEXT> devices(count);
+    if (!queryDevices(count, devices.data(), &count)) {
+        return EGL_NO_DISPLAY;
+    }
+    for (EGLint i = 0; i < count; ++i) {
+        if (!hasExtension(queryDeviceString(devices[i], EGL_EXTENSIONS), "EGL_MESA_device_software")) {
+            return getPlatformDisplay(EGL_PLATFORM_DEVICE_EXT, devices[i], nullptr);
+        }
+    }
+    return EGL_NO_DISPLAY;
+}
+
+EGLDisplay openDisplay()
+{
+    const char* clientExtensions = eglQueryString(EGL_NO_DISPLAY, EGL_EXTENSIONS);
+    auto        getPlatformDisplay =
+        (PFNEGLGETPLATFORMDISPLAYEXTPROC)eglGetProcAddress("eglGetPlatformDisplayEXT");
+    if (!getPlatformDisplay) {
+        return EGL_NO_DISPLAY;
+    }
+    if (hasExtension(clientExtensions, "EGL_EXT_platform_device")) {
+        EGLDisplay display = deviceDisplay(getPlatformDisplay);
+        if (display != EGL_NO_DISPLAY && eglInitialize(display, nullptr, nullptr)) {
+            return display;
+        }
+    }
+    if (hasExtension(clientExtensions, "EGL_MESA_platform_surfaceless")) {
+        EGLDisplay display = getPlatformDisplay(EGL_PLATFORM_SURFACELESS_MESA, EGL_DEFAULT_DISPLAY, nullptr);
+        if (display != EGL_NO_DISPLAY && eglInitialize(display, nullptr, nullptr)) {
+            return display;
+        }
+    }
+    return EGL_NO_DISPLAY;
+}
+
+void destroyFramebuffer()
+{
+    if (g_framebuffer) {
+        glBindFramebuffer(GL_FRAMEBUFFER, 0);
+        glDeleteFramebuffers(1, &g_framebuffer);
+        glDeleteRenderbuffers(1, &g_color);
+        glDeleteRenderbuffers(1, &g_depth);
+    }
+    g_framebuffer = g_color = g_depth = 0;
+}
+
+} // namespace
+
+Result createEglContext(int w, int h)
+{
+    if (g_display != EGL_NO_DISPLAY) {
+        return {6, "EGL context already exists"};
+    }
+
+    EGLDisplay display = openDisplay();
+    if (display == EGL_NO_DISPLAY) {
+        return {1, "EGL failed to open a device or surfaceless display"};
+    }
+    if (!hasExtension(eglQueryString(display, EGL_EXTENSIONS), "EGL_KHR_surfaceless_context")) {
+        eglTerminate(display);
+        return {2, "EGL display doesn't support surfaceless contexts"};
+    }
+
+    static const EGLint configAttribs[] = {EGL_RENDERABLE_TYPE, EGL_OPENGL_BIT, EGL_NONE};
+
+    EGLConfig config     = nullptr;
+    EGLint    numConfigs = 0;
+    if (!eglBindAPI(EGL_OPENGL_API) || !eglChooseConfig(display, configAttribs, &config, 1, &numConfigs)) {
+        eglTerminate(display);
+        return {3, "EGL couldn't find appropriate config"};
+    }
+
+    EGLContext context = eglCreateContext(display, numConfigs ? config : nullptr, EGL_NO_CONTEXT, nullptr);
+    if (context == EGL_NO_CONTEXT) {
+        eglTerminate(display);
+        return {4, "EGL failed to create OpenGL context"};
+    }
+    if (!eglMakeCurrent(display, EGL_NO_SURFACE, EGL_NO_SURFACE, context)) {
+        eglDestroyContext(display, context);
+        eglTerminate(display);
+        return {5, "EGL failed to make context current"};
+    }
+
+    g_display = display;
+    g_context = context;
+    g_width   = w > 0 ? w : 1;
+    g_height  = h > 0 ? h : 1;
+    return {0, ""};
+}
+
+Result destroyEglContext()
+{
+    if (g_display == EGL_NO_DISPLAY) {
+        return {1, "EGL context does not exist"};
+    }
+    destroyFramebuffer();
+    eglMakeCurrent(g_display, EGL_NO_SURFACE, EGL_NO_SURFACE, EGL_NO_CONTEXT);
+    eglDestroyContext(g_display, g_context);
+    eglTerminate(g_display);
+    g_context = EGL_NO_CONTEXT;
+    g_display = EGL_NO_DISPLAY;
+    return {0, ""};
+}
+
+int hasEglContext() { return g_display != EGL_NO_DISPLAY; }
+
+Result gladLoadEglFunctions()
+{
+    if (g_display == EGL_NO_DISPLAY) {
+        return {1, "EGL context does not exist"};
+    }
+    if (!gladLoadGLLoader((GLADloadproc)eglGetProcAddress)) {
+        return {1, "EGL failed to load OpenGL functions"};
+    }
+    if (g_framebuffer || !GLAD_GL_VERSION_3_0) {
+        return {0, ""};
+    }
+
+    // a surfaceless context has no default framebuffer, checks draw into this one
+    glGenRenderbuffers(1, &g_color);
+    glBindRenderbuffer(GL_RENDERBUFFER, g_color);
+    glRenderbufferStorage(GL_RENDERBUFFER, GL_RGBA8, g_width, g_height);
+    glGenRenderbuffers(1, &g_depth);
+    glBindRenderbuffer(GL_RENDERBUFFER, g_depth);
+    glRenderbufferStorage(GL_RENDERBUFFER, GL_DEPTH24_STENCIL8, g_width, g_height);
+    glBindRenderbuffer(GL_RENDERBUFFER, 0);
+    glGenFramebuffers(1, &g_framebuffer);
+    glBindFramebuffer(GL_FRAMEBUFFER, g_framebuffer);
+    glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_RENDERBUFFER, g_color);
+    glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_DEPTH_STENCIL_ATTACHMENT, GL_RENDERBUFFER, g_depth);
+    if (glCheckFramebufferStatus(GL_FRAMEBUFFER) != GL_FRAMEBUFFER_COMPLETE) {
+        destroyFramebuffer();
+        return {2, "EGL failed to create the surfaceless framebuffer"};
+    }
+    glViewport(0, 0, g_width, g_height);
+    return {0, ""};
+}
@@ -0,0 +1,14 @@
+#pragma once
+
+#include "glxcontext.h"
+
+extern "C" {
+
+// headless alternative to the GLX context: a hardware EGL device when there is one,
+// else the surfaceless platform, rendering into an FBO bound as default framebuffer
+Result createEglContext(int w, int h);
+Result destroyEglContext();
+int    hasEglContext();
+Result gladLoadEglFunctions();
+
+}
@@ -0,0 +1,161 @@
+#include "egldevice.h"
+#include "../glad/glad.h"
+#include "glutil.h"
+
+#include <cstring>
+#include <vector>
+
+#include <EGL/egl.h>
+#include <EGL/eglext.h>
+
+namespace {
+
+const GLsizei TARGET_SIZE = 16;
+
+struct EglDeviceApi
+{
+    PFNEGLQUERYDEVICESEXTPROC       queryDevices;
+    PFNEGLQUERYDEVICESTRINGEXTPROC  queryDeviceString;
+    PFNEGLGETPLATFORMDISPLAYEXTPROC getPlatformDisplay;
+};
+
+bool loadDeviceApi(EglDeviceApi* api)
+{
+    api->queryDevices       = (PFNEGLQUERYDEVICESEXTPROC)eglGetProcAddress("eglQueryDevicesEXT");
+    api->queryDeviceString  = (PFNEGLQUERYDEVICESTRINGEXTPROC)eglGetProcAddress("eglQueryDeviceStringEXT");
+    api->getPlatformDisplay = (PFNEGLGETPLATFORMDISPLAYEXTPROC)eglGetProcAddress("eglGetPlatformDisplayEXT");
+    return api->queryDevices && api->queryDeviceString && api->getPlatformDisplay;
+}
+
+std::vector<EGLDeviceEXT> queryDevices(const EglDeviceApi& api)
+{
+    EGLint count = 0;
+    if (!api.queryDevices(0, nullptr, &count) || count <= 0) {
+        return {};
+    }
+    std::vector<EGLDeviceEXT> devices(count);
+    if (!api.queryDevices(count, devices.data(), &count)) {
+        return {};
+    }
+    devices.resize(count);
+    return devices;
+}
+
+// clears an offscreen target and reads it back, the context has no default framebuffer
+bool renderCheck()
+{
+    GLuint fbo = 0, color = 0;
+    glGenRenderbuffers(1, &color);
+    glBindRenderbuffer(GL_RENDERBUFFER, color);
+    glRenderbufferStorage(GL_RENDERBUFFER, GL_RGBA8, TARGET_SIZE, TARGET_SIZE);
+    glGenFramebuffers(1, &fbo);
+    glBindFramebuffer(GL_FRAMEBUFFER, fbo);
+    glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_RENDERBUFFER, color);
+
+    bool rendered = false;
+    if (glCheckFramebufferStatus(GL_FRAMEBUFFER) == GL_FRAMEBUFFER_COMPLETE) {
+        GLubyte pixel[4] = {};
+        glViewport(0, 0, TARGET_SIZE, TARGET_SIZE);
+        glClearColor(0.0f, 1.0f, 0.0f, 1.0f);
+        glClear(GL_COLOR_BUFFER_BIT);
+        glReadPixels(TARGET_SIZE / 2, TARGET_SIZE / 2, 1, 1, GL_RGBA, GL_UNSIGNED_BYTE, pixel);
+        rendered = pixel[0] == 0 && pixel[1] == 255 && pixel[2] == 0 && glGetError() == GL_NO_ERROR;
+    }
+
+    glBindFramebuffer(GL_FRAMEBUFFER, 0);
+    glDeleteFramebuffers(1, &fbo);
+    glDeleteRenderbuffers(1, &color);
+    return rendered;
+}
+
+} // namespace
+
+int eglDeviceCount()
+{
+    EglDeviceApi api;
+    if (!loadDeviceApi(&api)) {
+        return -1;
+    }
+    return int(queryDevices(api).size());
+}
+
+Result probeEglDevice(int index, DeviceProbe* out)
+{
+    std::memset(out, 0, sizeof(*out));
+
+    EglDeviceApi api;
+    if (!loadDeviceApi(&api)) {
+        return {1, "EGL device enumeration is not supported"};
+    }
+    std::vector<EGLDeviceEXT> devices = queryDevices(api);
+    if (index < 0 || index >= int(devices.size())) {
+        return {2, "EGL device index out of range"};
+    }
+
+    EGLDeviceEXT device     = devices[index];
+    const char*  extensions = api.queryDeviceString(device, EGL_EXTENSIONS);
+    out->software           = hasExtension(extensions, "EGL_MESA_device_software");
+    if (hasExtension(extensions, "EGL_EXT_device_drm")) {
+        copyString(out->drmFile, sizeof(out->drmFile), api.queryDeviceString(device, EGL_DRM_DEVICE_FILE_EXT));
+    }
+
+    EGLDisplay display = api.getPlatformDisplay(EGL_PLATFORM_DEVICE_EXT, device, nullptr);
+    if (display == EGL_NO_DISPLAY || !eglInitialize(display, nullptr, nullptr)) {
+        return {3, "EGL failed to initialize device display"};
+    }
+
+    static const EGLint configAttribs[]  = {EGL_SURFACE_TYPE, EGL_PBUFFER_BIT, EGL_RENDERABLE_TYPE, EGL_OPENGL_BIT,
+                                            EGL_NONE};
+    static const EGLint pbufferAttribs[] = {EGL_WIDTH, 1, EGL_HEIGHT, 1, EGL_NONE};
+
+    EGLConfig config     = nullptr;
+    EGLint    numConfigs = 0;
+    if (!eglBindAPI(EGL_OPENGL_API) || !eglChooseConfig(display, configAttribs, &config, 1, &numConfigs) ||
+        numConfigs == 0) {
+        eglTerminate(display);
+        return {4, "EGL couldn't find appropriate config"};
+    }
+
+    EGLContext context = eglCreateContext(display, config, EGL_NO_CONTEXT, nullptr);
+    if (context == EGL_NO_CONTEXT) {
+        eglTerminate(display);
+        return {5, "EGL failed to create OpenGL context"};
+    }
+
+    EGLSurface surface = EGL_NO_SURFACE;
+    if (!hasExtension(eglQueryString(display, EGL_EXTENSIONS), "EGL_KHR_surfaceless_context")) {
+        surface = eglCreatePbufferSurface(display, config, pbufferAttribs);
+    }
+    if (!eglMakeCurrent(display, surface, surface, context)) {
+        if (surface != EGL_NO_SURFACE) {
+            eglDestroySurface(display, surface);
+        }
+        eglDestroyContext(display, context);
+        eglTerminate(display);
+        return {6, "EGL failed to make context current"};
+    }
+
+    Result res = {0, ""};
+    if (gladLoadGLLoader((GLADloadproc)eglGetProcAddress)) {
+        copyString(out->vendor, sizeof(out->vendor), (const char*)glGetString(GL_VENDOR));
+        copyString(out->renderer, sizeof(out->renderer), (const char*)glGetString(GL_RENDERER));
+        copyString(out->version, sizeof(out->version), (const char*)glGetString(GL_VERSION));
+        if (GLVersion.major >= 2) {
+            copyString(out->glslVersion, sizeof(out->glslVersion),
+                       (const char*)glGetString(GL_SHADING_LANGUAGE_VERSION));
+        }
+        out->major    = GLVersion.major;
+        out->minor    = GLVersion.minor;
+        out->rendered = GLVersion.major >= 3 && renderCheck();
+    } else {
+        res = {7, "EGL failed to load OpenGL functions"};
+    }
+
+    eglMakeCurrent(display, EGL_NO_SURFACE, EGL_NO_SURFACE, EGL_NO_CONTEXT);
+    if (surface != EGL_NO_SURFACE) {
+        eglDestroySurface(display, surface);
+    }
+    eglDestroyContext(display, context);
+    eglTerminate(display);
+    return res;
+}
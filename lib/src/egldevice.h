@@ -0,0 +1,22 @@
+#pragma once
+
+#include "glxcontext.h"
+
+extern "C" {
+
+struct DeviceProbe {
+    char drmFile[256];
+    char vendor[256];
+    char renderer[256];
+    char version[256];
+    char glslVersion[256];
+    int  major;
+    int  minor;
+    int  software;
+    int  rendered;
+};
+
+int    eglDeviceCount();
+Result probeEglDevice(int index, DeviceProbe* out);
+
+}
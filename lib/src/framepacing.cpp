@@ -0,0 +1,148 @@
+#include "framepacing.h"
+#include "../glad/glad.h"
+#include "glutil.h"
+
+#include <chrono>
+
+namespace {
+
+using Clock = std::chrono::steady_clock;
+
+const GLsizei TARGET_SIZE     = 512;
+const GLsizei WINDOW_SIZE     = 256;
+const int     DRAWS_PER_FRAME = 16;
+
+double milliseconds(Clock::duration d) { return std::chrono::duration<double, std::milli>(d).count(); }
+
+// renders `frames` frames into the bound framebuffer, swapping the window buffers when `present` is set
+void renderFrames(int frames, bool present, GLint frameUniform, GLuint query, double* cpuMs, double* gpuMs,
+                  double* intervalMs)
+{
+    glFinish();
+    Clock::time_point last = Clock::now();
+    for (int i = 0; i < frames; ++i) {
+        Clock::time_point start = Clock::now();
+        if (query) {
+            glBeginQuery(GL_TIME_ELAPSED, query);
+        }
+        glUniform1f(frameUniform, float(i));
+        glClear(GL_COLOR_BUFFER_BIT);
+        for (int d = 0; d < DRAWS_PER_FRAME; ++d) {
+            glDrawArrays(GL_TRIANGLE_STRIP, 0, 4);
+        }
+        if (query) {
+            glEndQuery(GL_TIME_ELAPSED);
+        }
+        Clock::time_point submitted = Clock::now();
+        if (present) {
+            glxSwapBuffers();
+        }
+        glFinish();
+        Clock::time_point done = Clock::now();
+
+        cpuMs[i]      = milliseconds(submitted - start);
+        intervalMs[i] = milliseconds(done - last);
+        gpuMs[i]      = 0.0;
+        if (query) {
+            GLuint64 ns = 0;
+            glGetQueryObjectui64v(query, GL_QUERY_RESULT, &ns);
+            gpuMs[i] = ns * 1e-6;
+        }
+        last = done;
+    }
+}
+
+} // namespace
+
+Result runFramePacing(int frames, int present, FramePacingResult* out, double* cpuMs, double* gpuMs, double* intervalMs)
+{
+    static const GLchar* vsSource = R"glsl(
+        #version 330 core
+        void main() {
+            vec2 p = vec2((gl_VertexID & 1) != 0 ? 1.0 : -1.0, (gl_VertexID & 2) != 0 ? 1.0 : -1.0);
+            gl_Position = vec4(p, 0.0, 1.0);
+        }
+    )glsl";
+    static const GLchar* fsSource = R"glsl(
+        #version 330 core
+        uniform float uFrame;
+        out vec4 FragColor;
+        void main() {
+            float t = fract(uFrame / 60.0);
+            FragColor = vec4(t, fract(gl_FragCoord.x / 64.0), fract(gl_FragCoord.y / 64.0), 1.0);
+        }
+    )glsl";
+    if (!GLAD_GL_VERSION_3_3) {
+        return {1, "Frame pacing probe requires OpenGL 3.3"};
+    }
+    if (frames <= 0) {
+        return {2, "Frame pacing probe needs at least one frame"};
+    }
+
+    *out        = {};
+    out->frames = frames;
+    while (glGetError() != GL_NO_ERROR) {
+    }
+
+    GLint viewport[4];
+    glGetIntegerv(GL_VIEWPORT, viewport);
+    // the default framebuffer of a surfaceless context is an FBO, not 0
+    GLint previous = 0;
+    glGetIntegerv(GL_FRAMEBUFFER_BINDING, &previous);
+
+    GLuint program = compileProgram(vsSource, fsSource);
+    if (!program) {
+        return {3, "Frame pacing probe failed to build shader program"};
+    }
+    GLuint query = 0, vao = 0, fbo = 0, color = 0;
+    glGenQueries(1, &query);
+    out->gpuTimers = query != 0;
+    glGenVertexArrays(1, &vao);
+    glBindVertexArray(vao);
+    glUseProgram(program);
+    glDisable(GL_DEPTH_TEST);
+    glDisable(GL_BLEND);
+    GLint frameUniform = glGetUniformLocation(program, "uFrame");
+
+    // offscreen: no presentation, frame intervals show CPU and GPU jitter only
+    glGenRenderbuffers(1, &color);
+    glBindRenderbuffer(GL_RENDERBUFFER, color);
+    glRenderbufferStorage(GL_RENDERBUFFER, GL_RGBA8, TARGET_SIZE, TARGET_SIZE);
+    glGenFramebuffers(1, &fbo);
+    glBindFramebuffer(GL_FRAMEBUFFER, fbo);
+    glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_RENDERBUFFER, color);
+    Result res = {0, ""};
+    if (glCheckFramebufferStatus(GL_FRAMEBUFFER) == GL_FRAMEBUFFER_COMPLETE) {
+        glViewport(0, 0, TARGET_SIZE, TARGET_SIZE);
+        renderFrames(frames, false, frameUniform, query, cpuMs, gpuMs, intervalMs);
+    } else {
+        res = {4, "Frame pacing probe failed to create offscreen framebuffer"};
+    }
+    glBindFramebuffer(GL_FRAMEBUFFER, previous);
+    glDeleteFramebuffers(1, &fbo);
+    glDeleteRenderbuffers(1, &color);
+
+    // presented: swaps to a mapped window with vsync requested, when there is one
+    if (res.code == 0 && present && glxShowWindow(WINDOW_SIZE, WINDOW_SIZE)) {
+        out->presented    = 1;
+        out->swapInterval = glxSetSwapInterval(1);
+        glViewport(0, 0, WINDOW_SIZE, WINDOW_SIZE);
+        renderFrames(frames, true, frameUniform, query, cpuMs + frames, gpuMs + frames, intervalMs + frames);
+        glxSetSwapInterval(0);
+        glxHideWindow();
+    }
+
+    GLenum err = glGetError();
+
+    glUseProgram(0);
+    glBindVertexArray(0);
+    glDeleteVertexArrays(1, &vao);
+    glDeleteQueries(1, &query);
+    glDeleteProgram(program);
+    glViewport(viewport[0], viewport[1], viewport[2], viewport[3]);
+
+    if (res.code == 0 && err != GL_NO_ERROR) {
+        return {5, "Frame pacing probe raised an OpenGL error"};
+    }
+    return res;
+}
@@ -0,0 +1,19 @@
+#pragma once
+
+#include "glxcontext.h"
+
+extern "C" {
+
+struct FramePacingResult {
+    int frames;
+    int gpuTimers;
+    int presented;
+    int swapInterval;
+};
+
+// cpuMs, gpuMs and intervalMs hold 2 * frames values: offscreen frames first,
+// then frames presented to the window when `present` is set and a window exists
+Result runFramePacing(int frames, int present, FramePacingResult* out, double* cpuMs, double* gpuMs,
+                      double* intervalMs);
+
+}
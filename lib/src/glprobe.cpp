@@ -0,0 +1,158 @@
+#include "glprobe.h"
+#include "../glad/glad.h"
+#include "glutil.h"
+
+#include <cstring>
+
+namespace {
+
+void addError(GlProbe* out, GLenum error, const char* text)
+{
+    if (out->errorCount < GL_PROBE_MAX_ERRORS) {
+        GlProbeError& record = out->errors[out->errorCount];
+        record.statement     = out->statements;
+        record.error         = error;
+        copyString(record.text, sizeof(record.text), text);
+    }
+    out->errorCount++;
+}
+
+void queryLimits(GlProbe* out)
+{
+    glGetIntegerv(GL_MAX_TEXTURE_SIZE, &out->maxTextureSize);
+    glGetIntegerv(GL_MAX_3D_TEXTURE_SIZE, &out->max3DTextureSize);
+    glGetIntegerv(GL_MAX_CUBE_MAP_TEXTURE_SIZE, &out->maxCubeMapTextureSize);
+    glGetIntegerv(GL_MAX_VIEWPORT_DIMS, out->maxViewportDims);
+    glGetIntegerv(GL_MAX_DRAW_BUFFERS, &out->maxDrawBuffers);
+    glGetIntegerv(GL_MAX_VERTEX_ATTRIBS, &out->maxVertexAttribs);
+    glGetIntegerv(GL_MAX_TEXTURE_IMAGE_UNITS, &out->maxTextureImageUnits);
+    if (GLAD_GL_VERSION_3_0) {
+        glGetIntegerv(GL_MAX_RENDERBUFFER_SIZE, &out->maxRenderbufferSize);
+        glGetIntegerv(GL_MAX_SAMPLES, &out->maxSamples);
+        glGetIntegerv(GL_MAX_COLOR_ATTACHMENTS, &out->maxColorAttachments);
+    }
+    if (GLAD_GL_VERSION_3_1) {
+        glGetIntegerv(GL_MAX_UNIFORM_BLOCK_SIZE, &out->maxUniformBlockSize);
+    }
+    if (GLAD_GL_VERSION_4_3) {
+        glGetIntegerv(GL_MAX_SHADER_STORAGE_BLOCK_SIZE, &out->maxShaderStorageBlockSize);
+        glGetIntegerv(GL_MAX_COMPUTE_WORK_GROUP_INVOCATIONS, &out->maxComputeWorkGroupInvocations);
+    }
+    while (glGetError() != GL_NO_ERROR) {
+    }
+}
+
+} // namespace
+
+// statements are numbered from 1, a GL error one raises is recorded with its number
+#define GL_CHECK(stmt)                                                                                                 \
+    do {                                                                                                               \
+        stmt;                                                                                                          \
+        out->statements++;                                                                                             \
+        GLenum err = glGetError();                                                                                     \
+        if (err != GL_NO_ERROR) {                                                                                      \
+            addError(out, err, #stmt);                                                                                 \
+        }                                                                                                              \
+    } while (0)
+
+Result probeOpenGL(GlProbe* out)
+{
+    static const GLchar* vsSource = R"glsl(
+        #version 430 core
+        layout(location = 0) in vec2 aPos;
+        void main() {
+            gl_Position = vec4(aPos, 0.0, 1.0);
+        }
+    )glsl";
+    static const GLchar* fsSource = R"glsl(
+        #version 430 core
+        out vec4 FragColor;
+        void main() {
+            FragColor = vec4(1.0, 0.5, 0.2, 1.0);
+        }
+    )glsl";
+    std::memset(out, 0, sizeof(GlProbe));
+    out->major = GLVersion.major;
+    out->minor = GLVersion.minor;
+    if (!GLAD_GL_VERSION_2_0) {
+        return {1, "OpenGL functions are not loaded"};
+    }
+    while (glGetError() != GL_NO_ERROR) {
+    }
+    copyString(out->vendor, sizeof(out->vendor), (const char*)glGetString(GL_VENDOR));
+    copyString(out->renderer, sizeof(out->renderer), (const char*)glGetString(GL_RENDERER));
+    copyString(out->version, sizeof(out->version), (const char*)glGetString(GL_VERSION));
+    copyString(out->glslVersion, sizeof(out->glslVersion), (const char*)glGetString(GL_SHADING_LANGUAGE_VERSION));
+    queryLimits(out);
+
+    GLuint  vao = 0, vbo = 0, ebo = 0, shader = 0, vs = 0, fs = 0;
+    GLfloat vertices[] = {-0.5, -0.5, 0.0, 0.5, 0.5, -0.5};
+    GLuint  indices[]  = {0, 1, 2};
+    GLint   success;
+
+    GL_CHECK(glGenVertexArrays(1, &vao));
+    GL_CHECK(glGenBuffers(1, &vbo));
+    GL_CHECK(glGenBuffers(1, &ebo));
+    GL_CHECK(glBindVertexArray(vao));
+    GL_CHECK(glBindBuffer(GL_ARRAY_BUFFER, vbo));
+    GL_CHECK(glBufferData(GL_ARRAY_BUFFER, sizeof(vertices), nullptr, GL_STATIC_DRAW));
+    GL_CHECK(glBufferSubData(GL_ARRAY_BUFFER, 0, sizeof(vertices), vertices));
+    GL_CHECK(glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, ebo));
+    GL_CHECK(glBufferData(GL_ELEMENT_ARRAY_BUFFER, sizeof(indices), nullptr, GL_STATIC_DRAW));
+    GL_CHECK(glBufferSubData(GL_ELEMENT_ARRAY_BUFFER, 0, sizeof(indices), indices));
+    GL_CHECK(glEnableVertexAttribArray(0));
+    GL_CHECK(glVertexAttribPointer(0, 2, GL_FLOAT, GL_FALSE, 0, 0));
+    GL_CHECK(vs = glCreateShader(GL_VERTEX_SHADER));
+    GL_CHECK(glShaderSource(vs, 1, &vsSource, nullptr));
+    GL_CHECK(glCompileShader(vs));
+    GL_CHECK(glGetShaderiv(vs, GL_COMPILE_STATUS, &success));
+    if (!success) {
+        addError(out, GL_NO_ERROR, "Vertex Shader Compilation Error");
+        if (out->infoLog[0] == '\0') {
+            GL_CHECK(glGetShaderInfoLog(vs, GL_PROBE_LOG_SIZE, nullptr, out->infoLog));
+        }
+    }
+    GL_CHECK(fs = glCreateShader(GL_FRAGMENT_SHADER));
+    GL_CHECK(glShaderSource(fs, 1, &fsSource, nullptr));
+    GL_CHECK(glCompileShader(fs));
+    GL_CHECK(glGetShaderiv(fs, GL_COMPILE_STATUS, &success));
+    if (!success) {
+        addError(out, GL_NO_ERROR, "Fragment Shader Compilation Error");
+        if (out->infoLog[0] == '\0') {
+            GL_CHECK(glGetShaderInfoLog(fs, GL_PROBE_LOG_SIZE, nullptr, out->infoLog));
+        }
+    }
+    GL_CHECK(shader = glCreateProgram());
+    GL_CHECK(glAttachShader(shader, vs));
+    GL_CHECK(glAttachShader(shader, fs));
+    GL_CHECK(glLinkProgram(shader));
+    GL_CHECK(glGetProgramiv(shader, GL_LINK_STATUS, &success));
+    if (!success) {
+        addError(out, GL_NO_ERROR, "Shader Program Linking Error");
+        if (out->infoLog[0] == '\0') {
+            GL_CHECK(glGetProgramInfoLog(shader, GL_PROBE_LOG_SIZE, nullptr, out->infoLog));
+        }
+    }
+    GL_CHECK(glUseProgram(shader));
+    GL_CHECK(glDeleteShader(vs));
+    GL_CHECK(glDeleteShader(fs));
+    GL_CHECK(glClearColor(1.0f, 1.0f, 1.0f, 1.0f));
+    GL_CHECK(glClear(GL_COLOR_BUFFER_BIT));
+    GL_CHECK(glDrawArrays(GL_TRIANGLES, 0, 3));
+    GL_CHECK(glDrawElements(GL_TRIANGLES, 3, GL_UNSIGNED_INT, nullptr));
+    GL_CHECK(glFlush());
+    GL_CHECK(glUseProgram(0));
+    GL_CHECK(glDisableVertexAttribArray(0));
+    GL_CHECK(glBindVertexArray(0));
+    GL_CHECK(glBindBuffer(GL_ARRAY_BUFFER, 0));
+    GL_CHECK(glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0));
+    GL_CHECK(glDeleteProgram(shader));
+    GL_CHECK(glDeleteVertexArrays(1, &vao));
+    GL_CHECK(glDeleteBuffers(1, &vbo));
+    GL_CHECK(glDeleteBuffers(1, &ebo));
+
+    if (out->errorCount > 0) {
+        return {1, "OpenGL basic function calls failed"};
+    }
+    return {0, ""};
+}
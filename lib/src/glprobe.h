@@ -0,0 +1,53 @@
+#pragma once
+
+#include "glxcontext.h"
+
+extern "C" {
+
+#define GL_PROBE_STRING_SIZE 256
+#define GL_PROBE_MAX_ERRORS 64
+#define GL_PROBE_LOG_SIZE 512
+#define GL_PROBE_TEXT_SIZE 128
+
+// a failed statement of the basic function test, `error` is 0 for shader
+// compile and link failures, their log is in GlProbe::infoLog; the statement
+// text is copied, so a GlProbe holds no pointers and can live in shared memory
+struct GlProbeError {
+    int      statement;
+    unsigned error;
+    char     text[GL_PROBE_TEXT_SIZE];
+};
+
+struct GlProbe {
+    int  major;
+    int  minor;
+    char vendor[GL_PROBE_STRING_SIZE];
+    char renderer[GL_PROBE_STRING_SIZE];
+    char version[GL_PROBE_STRING_SIZE];
+    char glslVersion[GL_PROBE_STRING_SIZE];
+
+    int maxTextureSize;
+    int max3DTextureSize;
+    int maxCubeMapTextureSize;
+    int maxRenderbufferSize;
+    int maxViewportDims[2];
+    int maxSamples;
+    int maxColorAttachments;
+    int maxDrawBuffers;
+    int maxVertexAttribs;
+    int maxTextureImageUnits;
+    int maxUniformBlockSize;
+    int maxShaderStorageBlockSize;
+    int maxComputeWorkGroupInvocations;
+
+    int          statements;
+    int          errorCount; // may exceed GL_PROBE_MAX_ERRORS, only the first ones are recorded
+    GlProbeError errors[GL_PROBE_MAX_ERRORS];
+    char         infoLog[GL_PROBE_LOG_SIZE];
+};
+
+// fills `out` in one call: versions, strings, limits and the basic function test,
+// keeps no state between calls
+Result probeOpenGL(GlProbe* out);
+
+}
@@ -0,0 +1,49 @@
+#include "glutil.h"
+
+#include <cstring>
+
+bool hasExtension(const char* extensions, const char* name)
+{
+    if (!extensions) {
+        return false;
+    }
+    size_t      length = std::strlen(name);
+    const char* found  = extensions;
+    while ((found = std::strstr(found, name)) != nullptr) {
+        if ((found == extensions || found[-1] == ' ') && (found[length] == ' ' || found[length] == '\0')) {
+            return true;
+        }
+        found += length;
+    }
+    return false;
+}
+
+void copyString(char* dst, size_t size, const char* src)
+{
+    std::strncpy(dst, src ? src : "", size - 1);
+    dst[size - 1] = '\0';
+}
+
+GLuint compileProgram(const GLchar* vsSource, const GLchar* fsSource)
+{
+    GLuint vs = glCreateShader(GL_VERTEX_SHADER);
+    glShaderSource(vs, 1, &vsSource, nullptr);
+    glCompileShader(vs);
+    GLuint fs = glCreateShader(GL_FRAGMENT_SHADER);
+    glShaderSource(fs, 1, &fsSource, nullptr);
+    glCompileShader(fs);
+    GLuint program = glCreateProgram();
+    glAttachShader(program, vs);
+    glAttachShader(program, fs);
+    glLinkProgram(program);
+    glDeleteShader(vs);
+    glDeleteShader(fs);
+
+    GLint success = 0;
+    glGetProgramiv(program, GL_LINK_STATUS, &success);
+    if (!success) {
+        glDeleteProgram(program);
+        return 0;
+    }
+    return program;
+}
@@ -0,0 +1,16 @@
+#pragma once
+
+#include "../glad/glad.h"
+
+#include <cstddef>
+
+// helpers shared by the context backends and probes, not part of the C API
+
+// whether the space separated `extensions` list (may be null) contains `name`
+bool hasExtension(const char* extensions, const char* name);
+
+// copies `src` (may be null) into `dst` of `size` bytes, always terminated
+void copyString(char* dst, size_t size, const char* src);
+
+// compiles and links a vertex and fragment shader, 0 on failure
+GLuint compileProgram(const GLchar* vsSource, const GLchar* fsSource);
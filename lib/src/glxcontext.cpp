@@ -1,8 +1,8 @@
 #include "glxcontext.h"
 #include "../glad/glad.h"
+#include "glutil.h"
 
 #include <cstdio>
-#include <string>
 
 #include <GL/gl.h>
 #include <GL/glx.h>
@@ -14,28 +14,19 @@ Display*   g_display = nullptr;
 Window     g_win;
 GLXContext g_context;
 
-const char* glErrorStr(GLenum err)
+bool hasGlxExtension(const char* name)
 {
-#define CASE(x)                                                                                                        \
-    case x:                                                                                                            \
-        return #x
-    switch (err) {
-        CASE(GL_NO_ERROR);
-        CASE(GL_INVALID_ENUM);
-        CASE(GL_INVALID_VALUE);
-        CASE(GL_INVALID_OPERATION);
-        CASE(GL_INVALID_FRAMEBUFFER_OPERATION);
-        CASE(GL_OUT_OF_MEMORY);
-        CASE(GL_STACK_UNDERFLOW);
-        CASE(GL_STACK_OVERFLOW);
-    }
-    return "UNKNOWN_ERROR";
+    return hasExtension(glXQueryExtensionsString(g_display, DefaultScreen(g_display)), name);
 }
 
 } // namespace
 
 Result createGlxContext(int w, int h)
 {
+    if (g_display) {
+        return {6, "GLX context already exists"};
+    }
+
     g_display = XOpenDisplay(nullptr);
     if (!g_display) {
         return {1, "GLX failed to open X display"};
@@ -97,6 +88,9 @@ Result createGlxContext(int w, int h)
 
 Result destroyGlxContext()
 {
+    if (!g_display) {
+        return {1, "GLX context does not exist"};
+    }
     glXMakeCurrent(g_display, 0, 0);
     glXDestroyContext(g_display, g_context);
     XDestroyWindow(g_display, g_win);
@@ -107,116 +101,67 @@ Result destroyGlxContext()
     return {0, ""};
 }
 
-Result gladLoadFunctions()
+int hasGlxContext() { return g_display != nullptr; }
+
+bool glxShowWindow(int w, int h)
 {
-    if (gladLoadGL()) {
-        return {0, ""};
+    if (!g_display) {
+        return false;
     }
-    return {1, "GLX failed to load OpenGL functions"};
+    XResizeWindow(g_display, g_win, w, h);
+    XMapWindow(g_display, g_win);
+    XSync(g_display, False);
+    return true;
 }
 
-int gladGetMajorVersion() { return GLVersion.major; }
-
-int gladGetMinorVersion() { return GLVersion.minor; }
-
-Result getOpenGLVersionString()
+void glxHideWindow()
 {
-    return {0, (char*)glGetString(GL_VERSION)};
+    if (g_display) {
+        XUnmapWindow(g_display, g_win);
+        XSync(g_display, False);
+    }
 }
 
-#define GL_CHECK(stmt)                                                                                                 \
-    do {                                                                                                               \
-        stmt;                                                                                                          \
-        GLenum err = glGetError();                                                                                     \
-        if (err != GL_NO_ERROR) {                                                                                      \
-            output += std::string(#stmt " : ") + glErrorStr(err) + "|";                                              \
-        }                                                                                                              \
-    } while (0)
-
-Result testBasicOpenGlFunctions()
+int glxSetSwapInterval(int interval)
 {
-    static std::string   output;
-    static const GLchar* vsSource = R"glsl(
-        #version 430 core
-        layout(location = 0) in vec2 aPos;
-        void main() {
-            gl_Position = vec4(aPos, 0.0, 1.0);
-        }
-    )glsl";
-    static const GLchar* fsSource = R"glsl(
-        #version 430 core
-        out vec4 FragColor;
-        void main() {
-            FragColor = vec4(1.0, 0.5, 0.2, 1.0);
-        }
-    )glsl";
-    GLuint               vao = 0, vbo = 0, ebo = 0, shader = 0, vs = 0, fs = 0;
-    GLfloat              vertices[] = {-0.5, -0.5, 0.0, 0.5, 0.5, -0.5};
-    GLuint               indices[]  = {0, 1, 2};
-    GLint                success;
-    GLchar               log[512];
-
-    output = {};
-
-    GL_CHECK(glGenVertexArrays(1, &vbo));
-    GL_CHECK(glGenBuffers(1, &vbo));
-    GL_CHECK(glGenBuffers(1, &ebo));
-    GL_CHECK(glBindVertexArray(vao));
-    GL_CHECK(glBindBuffer(GL_ARRAY_BUFFER, vbo));
-    GL_CHECK(glBufferData(GL_ARRAY_BUFFER, sizeof(vertices), nullptr, GL_STATIC_DRAW));
-    GL_CHECK(glBufferSubData(GL_ARRAY_BUFFER, 0, sizeof(vertices), vertices));
-    GL_CHECK(glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, ebo));
-    GL_CHECK(glBufferData(GL_ELEMENT_ARRAY_BUFFER, sizeof(indices), nullptr, GL_STATIC_DRAW));
-    GL_CHECK(glBufferSubData(GL_ELEMENT_ARRAY_BUFFER, 0, sizeof(indices), indices));
-    GL_CHECK(glEnableVertexAttribArray(0));
-    GL_CHECK(glVertexAttribPointer(0, 2, GL_FLOAT, GL_FALSE, 0, 0));
-    GL_CHECK(vs = glCreateShader(GL_VERTEX_SHADER));
-    GL_CHECK(glShaderSource(vs, 1, &vsSource, nullptr));
-    GL_CHECK(glCompileShader(vs));
-    GL_CHECK(glGetShaderiv(vs, GL_COMPILE_STATUS, &success));
-    if (!success) {
-        GL_CHECK(glGetShaderInfoLog(vs, 512, nullptr, log));
-        output += std::string("Vertex Shader Compilation Error:\n") + log + "|";
+    if (!g_display) {
+        return -1;
+    }
+    typedef void (*SwapIntervalEXT)(Display*, GLXDrawable, int);
+    typedef int (*SwapIntervalMESA)(unsigned int);
+    typedef int (*SwapIntervalSGI)(int);
+
+    if (hasGlxExtension("GLX_EXT_swap_control")) {
+        auto swapInterval = (SwapIntervalEXT)glXGetProcAddressARB((const GLubyte*)"glXSwapIntervalEXT");
+        swapInterval(g_display, g_win, interval);
+        return interval;
     }
-    GL_CHECK(fs = glCreateShader(GL_FRAGMENT_SHADER));
-    GL_CHECK(glShaderSource(fs, 1, &fsSource, nullptr));
-    GL_CHECK(glCompileShader(fs));
-    GL_CHECK(glGetShaderiv(fs, GL_COMPILE_STATUS, &success));
-    if (!success) {
-        GL_CHECK(glGetShaderInfoLog(fs, 512, nullptr, log));
-        output += std::string("Fragment Shader Compilation Error:\n") + log + "|";
+    if (hasGlxExtension("GLX_MESA_swap_control")) {
+        auto swapInterval = (SwapIntervalMESA)glXGetProcAddressARB((const GLubyte*)"glXSwapIntervalMESA");
+        return swapInterval(interval) == 0 ? interval : -1;
     }
-    GL_CHECK(shader = glCreateProgram());
-    GL_CHECK(glAttachShader(shader, vs));
-    GL_CHECK(glAttachShader(shader, fs));
-    GL_CHECK(glLinkProgram(shader));
-    GL_CHECK(glGetProgramiv(shader, GL_LINK_STATUS, &success));
-    if (!success) {
-        GL_CHECK(glGetShaderInfoLog(shader, 512, nullptr, log));
-        output += std::string("Shader Program Linking Error:\n") + log + "|";
+    if (interval > 0 && hasGlxExtension("GLX_SGI_swap_control")) {
+        auto swapInterval = (SwapIntervalSGI)glXGetProcAddressARB((const GLubyte*)"glXSwapIntervalSGI");
+        return swapInterval(interval) == 0 ? interval : -1;
+    }
+    return -1;
+}
+
+void glxSwapBuffers()
+{
+    if (g_display) {
+        glXSwapBuffers(g_display, g_win);
     }
-    GL_CHECK(glUseProgram(shader));
-    GL_CHECK(glDeleteShader(vs));
-    GL_CHECK(glDeleteShader(fs));
-    GL_CHECK(glClearColor(1.0f, 1.0f, 1.0f, 1.0f));
-    GL_CHECK(glClear(GL_COLOR_BUFFER_BIT));
-    GL_CHECK(glDrawArrays(GL_TRIANGLES, 0, 3));
-    GL_CHECK(glDrawElements(GL_TRIANGLES, 0, GL_UNSIGNED_INT, (void*)3));
-    GL_CHECK(glFlush());
-    GL_CHECK(glUseProgram(0));
-    GL_CHECK(glDisableVertexAttribArray(0));
-    GL_CHECK(glBindVertexArray(0));
-    GL_CHECK(glBindBuffer(GL_ARRAY_BUFFER, 0));
-    GL_CHECK(glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0));
-    GL_CHECK(glDeleteProgram(shader));
-    GL_CHECK(glDeleteVertexArrays(1, &vao));
-    GL_CHECK(glDeleteBuffers(1, &vbo));
-    GL_CHECK(glDeleteBuffers(1, &ebo));
-
-    if (output.empty()) {
+}
+
+Result gladLoadFunctions()
+{
+    if (gladLoadGL()) {
         return {0, ""};
     }
+    return {1, "GLX failed to load OpenGL functions"};
+}
+
+int gladGetMajorVersion() { return GLVersion.major; }
 
-    output.erase(output.size() - 1);
-    return {1, output.c_str()};
-}
\ No newline at end of file
+int gladGetMinorVersion() { return GLVersion.minor; }
@@ -9,12 +9,16 @@ struct Result {
 
 Result createGlxContext(int w, int h);
 Result destroyGlxContext();
+int hasGlxContext();
 
 Result gladLoadFunctions();
 int gladGetMajorVersion();
 int gladGetMinorVersion();
 
-Result getOpenGLVersionString();
-Result testBasicOpenGlFunctions();
+}
 
-}
\ No newline at end of file
+// presentation through the GLX window, for other native probes
+bool glxShowWindow(int w, int h);
+void glxHideWindow();
+int  glxSetSwapInterval(int interval);
+void glxSwapBuffers();
@@ -0,0 +1,242 @@
+#include "render.h"
+#include "../glad/glad.h"
+#include "glutil.h"
+
+#include <cstddef>
+#include <vector>
+
+namespace {
+
+const int CHECKER_SIZE = 8;
+
+struct Vertex
+{
+    GLfloat x, y, z;
+    GLfloat r, g, b, a;
+    GLfloat u, v;
+};
+
+struct Color
+{
+    GLfloat r, g, b, a;
+};
+
+// geometry of a scene, rectangles are given in pixels so their edges fall between pixel centers
+class Mesh
+{
+public:
+    Mesh(int w, int h) : w_(w), h_(h) {}
+
+    void rect(int x0, int y0, int x1, int y1, GLfloat z, Color c0, Color c1, Color c2, Color c3)
+    {
+        GLuint base = GLuint(vertices_.size());
+        vertices_.push_back({ndcX(x0), ndcY(y0), z, c0.r, c0.g, c0.b, c0.a, 0.0f, 0.0f});
+        vertices_.push_back({ndcX(x1), ndcY(y0), z, c1.r, c1.g, c1.b, c1.a, 1.0f, 0.0f});
+        vertices_.push_back({ndcX(x0), ndcY(y1), z, c2.r, c2.g, c2.b, c2.a, 0.0f, 1.0f});
+        vertices_.push_back({ndcX(x1), ndcY(y1), z, c3.r, c3.g, c3.b, c3.a, 1.0f, 1.0f});
+        GLuint quad[] = {base, base + 1, base + 2, base + 2, base + 1, base + 3};
+        indices_.insert(indices_.end(), quad, quad + 6);
+    }
+
+    void rect(int x0, int y0, int x1, int y1, GLfloat z, Color c) { rect(x0, y0, x1, y1, z, c, c, c, c); }
+
+    void draw()
+    {
+        GLuint vao = 0, buffers[2] = {};
+        glGenVertexArrays(1, &vao);
+        glBindVertexArray(vao);
+        glGenBuffers(2, buffers);
+        glBindBuffer(GL_ARRAY_BUFFER, buffers[0]);
+        glBufferData(GL_ARRAY_BUFFER, vertices_.size() * sizeof(Vertex), vertices_.data(), GL_STATIC_DRAW);
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, buffers[1]);
+        glBufferData(GL_ELEMENT_ARRAY_BUFFER, indices_.size() * sizeof(GLuint), indices_.data(), GL_STATIC_DRAW);
+        glEnableVertexAttribArray(0);
+        glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, sizeof(Vertex), (void*)offsetof(Vertex, x));
+        glEnableVertexAttribArray(1);
+        glVertexAttribPointer(1, 4, GL_FLOAT, GL_FALSE, sizeof(Vertex), (void*)offsetof(Vertex, r));
+        glEnableVertexAttribArray(2);
+        glVertexAttribPointer(2, 2, GL_FLOAT, GL_FALSE, sizeof(Vertex), (void*)offsetof(Vertex, u));
+
+        glDrawElements(GL_TRIANGLES, GLsizei(indices_.size()), GL_UNSIGNED_INT, nullptr);
+
+        glBindVertexArray(0);
+        glDeleteVertexArrays(1, &vao);
+        glBindBuffer(GL_ARRAY_BUFFER, 0);
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0);
+        glDeleteBuffers(2, buffers);
+    }
+
+private:
+    GLfloat ndcX(int x) const { return 2.0f * x / w_ - 1.0f; }
+    GLfloat ndcY(int y) const { return 2.0f * y / h_ - 1.0f; }
+
+    int                 w_, h_;
+    std::vector<Vertex> vertices_;
+    std::vector<GLuint> indices_;
+};
+
+GLuint checkerTexture()
+{
+    GLubyte texels[CHECKER_SIZE * CHECKER_SIZE * 4];
+    for (int y = 0; y < CHECKER_SIZE; ++y) {
+        for (int x = 0; x < CHECKER_SIZE; ++x) {
+            GLubyte  value = (x + y) % 2 == 0 ? 255 : 0;
+            GLubyte* t     = texels + (y * CHECKER_SIZE + x) * 4;
+            t[0] = t[1] = t[2] = value;
+            t[3]               = 255;
+        }
+    }
+    GLuint texture = 0;
+    glGenTextures(1, &texture);
+    glBindTexture(GL_TEXTURE_2D, texture);
+    glPixelStorei(GL_UNPACK_ALIGNMENT, 1);
+    glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA8, CHECKER_SIZE, CHECKER_SIZE, 0, GL_RGBA, GL_UNSIGNED_BYTE, texels);
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST);
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST);
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE);
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE);
+    return texture;
+}
+
+void drawScene(int scene, int w, int h, GLint textured)
+{
+    const Color black = {0.0f, 0.0f, 0.0f, 1.0f};
+    const Color red   = {1.0f, 0.0f, 0.0f, 1.0f};
+    const Color green = {0.0f, 1.0f, 0.0f, 1.0f};
+    const Color blue  = {0.0f, 0.0f, 1.0f, 1.0f};
+
+    Mesh mesh(w, h);
+    switch (scene) {
+    case kSceneClear:
+        glClearColor(0.2f, 0.4f, 0.6f, 1.0f);
+        glClear(GL_COLOR_BUFFER_BIT);
+        return;
+    case kSceneIndexedQuads:
+        mesh.rect(w / 4, h / 4, 3 * w / 4, h / 2, 0.0f, red);
+        mesh.rect(w / 8, h / 2, w / 2, 7 * h / 8, 0.0f, green);
+        break;
+    case kSceneGradient:
+        mesh.rect(0, 0, w, h, 0.0f, black, red, green, {1.0f, 1.0f, 0.0f, 1.0f});
+        break;
+    case kSceneDepth:
+        // the near rectangle is drawn first, the far one must not cover it
+        glEnable(GL_DEPTH_TEST);
+        glDepthFunc(GL_LESS);
+        mesh.rect(w / 4, h / 4, 3 * w / 4, 3 * h / 4, -0.5f, green);
+        mesh.rect(0, 0, w, h, 0.5f, blue);
+        break;
+    case kSceneTexture: {
+        GLuint texture = checkerTexture();
+        glUniform1i(textured, 1);
+        mesh.rect(0, 0, w, h, 0.0f, black);
+        mesh.draw();
+        glUniform1i(textured, 0);
+        glBindTexture(GL_TEXTURE_2D, 0);
+        glDeleteTextures(1, &texture);
+        return;
+    }
+    case kSceneBlend:
+        glClearColor(0.0f, 0.0f, 1.0f, 1.0f);
+        glClear(GL_COLOR_BUFFER_BIT);
+        glEnable(GL_BLEND);
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA);
+        mesh.rect(0, 0, w, h, 0.0f, {1.0f, 0.0f, 0.0f, 0.5f});
+        break;
+    }
+    mesh.draw();
+    glDisable(GL_DEPTH_TEST);
+    glDisable(GL_BLEND);
+}
+
+} // namespace
+
+Result renderScene(int scene, int w, int h, unsigned char* pixels)
+{
+    static const GLchar* vsSource = R"glsl(
+        #version 330 core
+        layout(location = 0) in vec3 aPos;
+        layout(location = 1) in vec4 aColor;
+        layout(location = 2) in vec2 aUv;
+        out vec4 vColor;
+        out vec2 vUv;
+        void main() {
+            vColor = aColor;
+            vUv = aUv;
+            gl_Position = vec4(aPos, 1.0);
+        }
+    )glsl";
+    static const GLchar* fsSource = R"glsl(
+        #version 330 core
+        uniform int uTextured;
+        uniform sampler2D uTexture;
+        in vec4 vColor;
+        in vec2 vUv;
+        out vec4 FragColor;
+        void main() {
+            FragColor = uTextured != 0 ? texture(uTexture, vUv) : vColor;
+        }
+    )glsl";
+    if (!GLAD_GL_VERSION_3_3) {
+        return {1, "Render check requires OpenGL 3.3"};
+    }
+    if (scene < 0 || scene >= kSceneCount) {
+        return {2, "Render scene index out of range"};
+    }
+    GLint maxSize = 0;
+    glGetIntegerv(GL_MAX_RENDERBUFFER_SIZE, &maxSize);
+    if (w <= 0 || h <= 0 || w % 8 || h % 8 || w > maxSize || h > maxSize) {
+        return {3, "Render target size is not supported"};
+    }
+    while (glGetError() != GL_NO_ERROR) {
+    }
+
+    GLint viewport[4], previous = 0;
+    glGetIntegerv(GL_VIEWPORT, viewport);
+    glGetIntegerv(GL_FRAMEBUFFER_BINDING, &previous);
+
+    GLuint fbo = 0, renderbuffers[2] = {};
+    glGenRenderbuffers(2, renderbuffers);
+    glBindRenderbuffer(GL_RENDERBUFFER, renderbuffers[0]);
+    glRenderbufferStorage(GL_RENDERBUFFER, GL_RGBA8, w, h);
+    glBindRenderbuffer(GL_RENDERBUFFER, renderbuffers[1]);
+    glRenderbufferStorage(GL_RENDERBUFFER, GL_DEPTH_COMPONENT24, w, h);
+    glBindRenderbuffer(GL_RENDERBUFFER, 0);
+    glGenFramebuffers(1, &fbo);
+    glBindFramebuffer(GL_FRAMEBUFFER, fbo);
+    glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_RENDERBUFFER, renderbuffers[0]);
+    glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT, GL_RENDERBUFFER, renderbuffers[1]);
+
+    Result res     = {0, ""};
+    GLuint program = 0;
+    if (glCheckFramebufferStatus(GL_FRAMEBUFFER) != GL_FRAMEBUFFER_COMPLETE) {
+        res = {4, "Render check failed to create offscreen framebuffer"};
+    } else if (!(program = compileProgram(vsSource, fsSource))) {
+        res = {5, "Render check failed to build shader program"};
+    } else {
+        glViewport(0, 0, w, h);
+        glDisable(GL_SCISSOR_TEST);
+        glDisable(GL_DEPTH_TEST);
+        glDisable(GL_BLEND);
+        glClearColor(0.0f, 0.0f, 0.0f, 1.0f);
+        glClearDepth(1.0);
+        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT);
+        glUseProgram(program);
+        glUniform1i(glGetUniformLocation(program, "uTexture"), 0);
+        glActiveTexture(GL_TEXTURE0);
+        drawScene(scene, w, h, glGetUniformLocation(program, "uTextured"));
+        glUseProgram(0);
+
+        glPixelStorei(GL_PACK_ALIGNMENT, 1);
+        glReadPixels(0, 0, w, h, GL_RGBA, GL_UNSIGNED_BYTE, pixels);
+        if (glGetError() != GL_NO_ERROR) {
+            res = {6, "Render check raised an OpenGL error"};
+        }
+        glDeleteProgram(program);
+    }
+
+    glBindFramebuffer(GL_FRAMEBUFFER, previous);
+    glDeleteFramebuffers(1, &fbo);
+    glDeleteRenderbuffers(2, renderbuffers);
+    glViewport(viewport[0], viewport[1], viewport[2], viewport[3]);
+    return res;
+}
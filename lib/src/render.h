@@ -0,0 +1,22 @@
+#pragma once
+
+#include "glxcontext.h"
+
+extern "C" {
+
+// scenes in the order of `SCENES` in tool/render.py, which builds their golden images
+enum RenderScene {
+    kSceneClear,
+    kSceneIndexedQuads,
+    kSceneGradient,
+    kSceneDepth,
+    kSceneTexture,
+    kSceneBlend,
+    kSceneCount,
+};
+
+// renders `scene` into a w x h RGBA8 framebuffer and reads it back into `pixels`,
+// w * h * 4 bytes, rows bottom to top; w and h must be multiples of 8
+Result renderScene(int scene, int w, int h, unsigned char* pixels);
+
+}
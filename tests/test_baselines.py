@@ -0,0 +1,80 @@
+from tool.baselines import find_baseline, find_gpu
+from tool.devices import DeviceInfo
+from tool.system_info import GpuInfo
+
+BASELINES = {
+    "10de:2489": {"fill_rate_mpix": 90000},
+    "8086:46a6": {"fill_rate_mpix": 9000},
+    "llvmpipe": {"draw_calls_per_sec": 100000},
+    "default": {"fill_rate_mpix": 1000},
+}
+
+NVIDIA = ("NVIDIA Corporation", "NVIDIA GeForce RTX 3070/PCIe/SSE2")
+INTEL = ("Intel", "Mesa Intel(R) Graphics (ADL GT2)")
+LLVMPIPE = ("Mesa", "llvmpipe (LLVM 15.0.7, 256 bits)")
+
+
+def gpu(slot: str, vendor_id: int, device_id: int) -> GpuInfo:
+    info = GpuInfo()
+    info.slot = slot
+    info.vendor_id = vendor_id
+    info.device_id = device_id
+    return info
+
+
+def device(slot: str, renderer: str) -> DeviceInfo:
+    info = DeviceInfo(0)
+    info.slot = slot
+    info.renderer = renderer
+    return info
+
+
+HYBRID = [gpu("00:02.0", 0x8086, 0x46A6), gpu("01:00.0", 0x10DE, 0x2489)]
+
+
+def baseline(gpus, strings, devices=None):
+    found = find_gpu(gpus, *strings, devices=devices)
+    return find_baseline(BASELINES, found, strings[1])
+
+
+def test_hybrid_uses_the_gpu_of_the_context():
+    assert find_gpu(HYBRID, *INTEL) is HYBRID[0]
+    assert find_gpu(HYBRID, *NVIDIA) is HYBRID[1]
+    assert baseline(HYBRID, INTEL) == {"fill_rate_mpix": 9000}
+    assert baseline(HYBRID, NVIDIA) == {"fill_rate_mpix": 90000}
+
+
+def test_software_renderer_has_no_gpu():
+    assert find_gpu(HYBRID, *LLVMPIPE) is None
+    assert baseline(HYBRID, LLVMPIPE) == {"draw_calls_per_sec": 100000}
+
+
+def test_gpu_without_baseline():
+    gpus = [gpu("00:02.0", 0x8086, 0x46A6), gpu("03:00.0", 0x1002, 0x73BF)]
+    amd = ("AMD", "AMD Radeon RX 6800 XT (radeonsi, navi21, LLVM 15.0.7)")
+    assert find_gpu(gpus, *amd) is gpus[1]
+    # not the baseline of the Intel GPU listed first
+    assert baseline(gpus, amd) == {"fill_rate_mpix": 1000}
+    no_default = {k: v for k, v in BASELINES.items() if k != "default"}
+    assert find_baseline(no_default, gpus[1], amd[1]) is None
+
+
+def test_same_vendor_told_apart_by_egl_devices():
+    gpus = [gpu("01:00.0", 0x10DE, 0x2204), gpu("02:00.0", 0x10DE, 0x2489)]
+    probed = []
+
+    def devices():
+        probed.append(True)
+        return [
+            device("01:00.0", "NVIDIA GeForce RTX 3090/PCIe/SSE2"),
+            device("02:00.0", NVIDIA[1]),
+        ]
+
+    assert find_gpu(gpus, *NVIDIA) is None
+    assert find_gpu(gpus, *NVIDIA, devices=devices) is gpus[1]
+    assert baseline(gpus, NVIDIA, devices) == {"fill_rate_mpix": 90000}
+
+    # one GPU of the vendor needs no EGL probing
+    probed.clear()
+    assert find_gpu(HYBRID, *NVIDIA, devices=devices) is HYBRID[1]
+    assert probed == []
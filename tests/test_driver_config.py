@@ -0,0 +1,161 @@
+from tool.analyser import DriverConfigCheck
+from tool.driver_config import DriverConfig, bus_id_slot
+from tool.system_info import ErrorContext, GpuInfo, SystemInfo
+import os
+
+
+def write(root, path: str, text: str) -> str:
+    full = os.path.join(str(root), path)
+    os.makedirs(os.path.dirname(full), exist_ok=True)
+    with open(full, "w") as f:
+        f.write(text)
+    return full
+
+
+XORG_NVIDIA = """\
+Section "Device"
+    Identifier "Card0"
+    Driver     "nvidia"
+    BusID      "PCI:1:0:0"
+EndSection
+"""
+
+
+def gpu(slot: str, in_use: str, modules=()) -> GpuInfo:
+    info = GpuInfo()
+    info.slot = slot
+    info.kernel_module_in_use = in_use
+    info.kernel_modules = list(modules)
+    return info
+
+
+def run_check(drivers: DriverConfig, gpus) -> DriverConfigCheck:
+    info = SystemInfo()
+    info.driver_config = drivers
+    info.gpus_info = gpus
+    check = DriverConfigCheck()
+    check.__run__(ErrorContext(), info, None)
+    return check
+
+
+def test_etc_hides_same_name_in_lib(tmp_path):
+    etc = write(tmp_path, "etc/modprobe.d/nvidia.conf", "options nvidia NVreg_X=1\n")
+    write(tmp_path, "lib/modprobe.d/nvidia.conf", "blacklist nvidia\n")
+    other = write(tmp_path, "lib/modprobe.d/alsa.conf", "blacklist snd_pcsp\n")
+
+    drivers = DriverConfig.from_root(root=tmp_path)
+    assert drivers.files == [other, etc]
+    assert drivers.blacklist_source("nvidia") is None
+    assert drivers.blacklist_source("snd-pcsp") == other + ":1"
+    assert drivers.module_options("nvidia") == [("NVreg_X=1", etc + ":1")]
+
+
+def test_first_install_wins(tmp_path):
+    first = write(
+        tmp_path,
+        "etc/modprobe.d/a.conf",
+        "# keep nouveau\ninstall nouveau /sbin/modprobe --ignore-install nouveau\n",
+    )
+    write(tmp_path, "lib/modprobe.d/b.conf", "install nouveau /bin/false\n")
+
+    drivers = DriverConfig.from_root(root=tmp_path)
+    command, source = drivers.installs["nouveau"]
+    assert command == "/sbin/modprobe --ignore-install nouveau"
+    assert source == first + ":2"
+    assert drivers.blacklist_source("nouveau") is None
+
+
+def test_install_false_disables(tmp_path):
+    path = write(
+        tmp_path, "etc/modprobe.d/no-nvidia.conf", "install nvidia /bin/false\n"
+    )
+    drivers = DriverConfig.from_root(root=tmp_path)
+    assert drivers.blacklist_source("nvidia") == path + ":1"
+
+
+def test_cmdline_blacklist(tmp_path):
+    cmdline = write(
+        tmp_path,
+        "proc/cmdline",
+        "BOOT_IMAGE=/vmlinuz root=/dev/sda1 modprobe.blacklist=nouveau,radeon quiet\n",
+    )
+    drivers = DriverConfig.from_root(root=tmp_path)
+    assert drivers.blacklist_source("nouveau") == cmdline
+    assert drivers.blacklist_source("radeon") == cmdline
+    assert drivers.blacklist_source("amdgpu") is None
+
+
+def test_xorg_bus_id_to_slot(tmp_path):
+    path = write(tmp_path, "etc/X11/xorg.conf.d/10-nvidia.conf", XORG_NVIDIA)
+    drivers = DriverConfig.from_root(root=tmp_path)
+    device = drivers.xorg_device("01:00.0")
+    assert device.identifier == "Card0"
+    assert device.driver == "nvidia"
+    assert device.source == path + ":3"
+    assert drivers.xorg_device("02:00.0") is None
+
+    assert bus_id_slot("PCI:10:2:1") == "0a:02.1"
+    assert bus_id_slot("PCI:1@0:0:0") == "01:00.0"
+    assert bus_id_slot("PCI:1@2:0:0") == "0002:01:00.0"
+    assert bus_id_slot("0000:01:00.0") is None
+
+
+def test_xorg_device_without_bus_id(tmp_path):
+    write(
+        tmp_path,
+        "etc/X11/xorg.conf",
+        'Section "Device"\n  Identifier "Only"\n  Driver "intel"\nEndSection\n',
+    )
+    drivers = DriverConfig.from_root(root=tmp_path)
+    assert drivers.xorg_device("00:02.0").identifier == "Only"
+
+
+def test_check_passes(tmp_path):
+    write(tmp_path, "etc/X11/xorg.conf.d/10-nvidia.conf", XORG_NVIDIA)
+    drivers = DriverConfig.from_root(root=tmp_path)
+    check = run_check(drivers, [gpu("01:00.0", "nvidia", ["nvidia", "nouveau"])])
+    assert check.messages == []
+
+
+def test_check_warns(tmp_path):
+    blacklist = write(tmp_path, "etc/modprobe.d/nouveau.conf", "blacklist nouveau\n")
+    xorg = write(tmp_path, "etc/X11/xorg.conf.d/10-nvidia.conf", XORG_NVIDIA)
+    drivers = DriverConfig.from_root(root=tmp_path)
+
+    check = run_check(drivers, [gpu("01:00.0", "nouveau", ["nouveau", "nvidia"])])
+    assert check.messages == [
+        (
+            "warn",
+            "Driver 'nouveau' in use by 01:00.0 is blacklisted in {}:1, it will not "
+            "load after reboot".format(blacklist),
+        ),
+        (
+            "warn",
+            "Xorg requests driver 'nvidia' ({}:3) but 01:00.0 is driven by "
+            "'nouveau'".format(xorg),
+        ),
+    ]
+
+
+def test_check_fails_when_all_modules_are_blacklisted(tmp_path):
+    blacklist = write(
+        tmp_path,
+        "etc/modprobe.d/blacklist.conf",
+        "blacklist nvidiafb\nblacklist nouveau\ninstall nvidia /bin/false\n",
+    )
+    drivers = DriverConfig.from_root(root=tmp_path)
+
+    modules = ["nvidiafb", "nouveau", "nvidia"]
+    check = run_check(drivers, [gpu("01:00.0", None, modules)])
+    assert check.messages == [
+        (
+            "fail",
+            "No driver bound to 01:00.0, all its modules are blacklisted: "
+            "nouveau ({0}:2), nvidia ({0}:3)".format(blacklist),
+        )
+    ]
+    assert check.has_failed()
+
+    # one loadable module is enough
+    check = run_check(drivers, [gpu("01:00.0", None, ["nouveau", "nvidia", "vfio"])])
+    assert check.messages == []
@@ -0,0 +1,117 @@
+from tool.kernel_log import KernelLogAnalyzer
+from tool.utils import CHUNK_SIZE, PARTIAL_LINE_LIMIT, Capture
+import os
+import tracemalloc
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "kernel_log")
+
+
+def analyze(name: str) -> KernelLogAnalyzer:
+    analyzer = KernelLogAnalyzer()
+    with open(os.path.join(FIXTURES, name)) as f:
+        for line in f:
+            analyzer.feed(line)
+    return analyzer
+
+
+def summary(analyzer: KernelLogAnalyzer) -> dict:
+    return {
+        s.signature.name: (s.count, s.first_time, s.last_time)
+        for s in analyzer.found()
+    }
+
+
+def test_dmesg_fixture():
+    analyzer = analyze("dmesg.log")
+    assert analyzer.lines == 14
+    assert summary(analyzer) == {
+        "gpu_off_bus": (1, "301.007299", "301.007299"),
+        "nvidia_xid": (3, "120.301455", "301.007263"),
+        "gpu_hang": (1, "402.559877", "402.559877"),
+        "fence_timeout": (2, "402.559120", "610.000001"),
+        "firmware_load": (1, "3.112090", "3.112090"),
+    }
+    samples = {s.signature.name: s.sample for s in analyzer.found()}
+    assert samples["nvidia_xid"].startswith(
+        "[  120.301455] NVRM: Xid (PCI:0000:01:00): 13,"
+    )
+    assert samples["gpu_off_bus"].endswith(
+        "GPU 0000:01:00.0: GPU has fallen off the bus."
+    )
+    assert samples["fence_timeout"].endswith("[drm] *ERROR* flip_done timed out")
+    assert "gsp_ga10x.bin failed" in samples["firmware_load"]
+
+
+def test_journal_fixture():
+    analyzer = analyze("journal.log")
+    assert analyzer.lines == 13
+    assert summary(analyzer) == {
+        "gpu_hang": (2, "66.000410", "66.000512"),
+        "fence_timeout": (2, "80.433216", "900.000000"),
+        "nouveau_fault": (2, "70.250000", "71.117775"),
+        "amdgpu_fault": (2, "55.890113", "55.890170"),
+        "firmware_load": (1, "4.120601", "4.120601"),
+    }
+    samples = {s.signature.name: s.sample for s in analyzer.found()}
+    assert samples["gpu_hang"].startswith(
+        "[   66.000410] render-07 kernel: [drm:amdgpu"
+    )
+    assert "ring gfx_0.0.0 timeout" in samples["gpu_hang"]
+    assert "fifo: fault 00 [READ]" in samples["nouveau_fault"]
+    assert "[gfxhub] page fault" in samples["amdgpu_fault"]
+    assert "gc_11_0_0_imu.bin failed" in samples["firmware_load"]
+
+
+def test_found_keeps_signature_order():
+    names = [s.signature.name for s in analyze("dmesg.log").found()]
+    assert names == [
+        "gpu_off_bus",
+        "nvidia_xid",
+        "gpu_hang",
+        "fence_timeout",
+        "firmware_load",
+    ]
+
+
+def log_block(start: int) -> bytes:
+    """1000 lines of a synthetic dmesg starting with an Xid error."""
+    lines = ["[{:>5}.000000] NVRM: Xid (PCI:0000:01:00): 13, pid=1\n".format(start)]
+    lines.extend(
+        "[{:>5}.000000] usb 1-4: new high-speed USB device number 5\n".format(start + i)
+        for i in range(1, 1000)
+    )
+    return "".join(lines).encode()
+
+
+def test_streaming_memory_is_bounded():
+    first, last = log_block(0), log_block(1000)
+    blocks = 100
+    analyzer = KernelLogAnalyzer()
+    capture = Capture(line_filter=analyzer.feed)
+    tracemalloc.start()
+    try:
+        for _ in range(blocks - 1):
+            capture.feed(first)
+        capture.feed(last)
+        capture.output()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    # the log is five times the memory used to scan it
+    assert capture.size > 5 * 1024 * 1024
+    assert peak < 1024 * 1024
+    assert capture.lines == []
+    assert analyzer.lines == blocks * 1000
+    assert summary(analyzer) == {"nvidia_xid": (blocks, "0.000000", "1000.000000")}
+
+
+def test_long_line_is_cut():
+    analyzer = KernelLogAnalyzer()
+    capture = Capture(line_filter=analyzer.feed)
+    for _ in range(100):
+        capture.feed(b"x" * CHUNK_SIZE)
+        assert len(capture.partial) <= PARTIAL_LINE_LIMIT
+    capture.feed(b" GPU has fallen off the bus\n")
+    assert analyzer.lines == 1
+    assert summary(analyzer) == {"gpu_off_bus": (1, None, None)}
@@ -0,0 +1,61 @@
+from tool.packages import PackageIndex
+
+STATUS = """\
+Package: mesa-utils
+Status: install ok installed
+Priority: optional
+Version: 8.4.0-1build1
+Description: Miscellaneous Mesa utilities
+ glxinfo and glxgears.
+ Version: 0.0 in a description is not a field
+
+Package: nvidia-driver-535
+Status: install ok installed
+Version: 535.129.03-0ubuntu1
+
+Package: nvidia-dkms-535
+Version: 535.129.03-0ubuntu1
+Status: install ok installed
+
+Package: nvidia-driver-470
+Status: deinstall ok config-files
+Version: 470.223.02-0ubuntu1
+
+Package: libnvidia-gl-535-server
+Status: install ok installed
+Version: 535.154.05-0ubuntu1
+
+Package: xserver-xorg-video-nouveau
+Status: install ok half-installed
+Version: 1:1.0.17-2
+
+Package: libgl1
+Status: install ok installed
+Version: 1.4.0-1"""
+
+
+def test_status(tmp_path):
+    path = tmp_path / "status"
+    path.write_text(STATUS)
+    packages = PackageIndex.from_status(str(path))
+
+    assert len(packages) == 5
+    assert packages.version("mesa-utils") == "8.4.0-1build1"
+    # the last stanza has no trailing blank line
+    assert packages.version("libgl1") == "1.4.0-1"
+    assert not packages.installed("nvidia-driver-470")
+    assert not packages.installed("xserver-xorg-video-nouveau")
+    assert packages.family("nvidia-driver-") == ["nvidia-driver-535"]
+    assert packages.nvidia_branches() == {
+        "535": [
+            ("nvidia-driver-535", "535.129.03-0ubuntu1"),
+            ("nvidia-dkms-535", "535.129.03-0ubuntu1"),
+            ("libnvidia-gl-535-server", "535.154.05-0ubuntu1"),
+        ]
+    }
+
+
+def test_empty_status(tmp_path):
+    path = tmp_path / "status"
+    path.write_text("")
+    assert len(PackageIndex.from_status(str(path))) == 0
@@ -0,0 +1,230 @@
+from tool import system_info
+from tool.checks import plan_checks
+from tool.config import Config
+from tool.system_info import ErrorContext, GpuInfo, OpenGLInfo, SystemInfo
+import os
+import pytest
+
+COLLECTORS = [
+    "collect_os_info",
+    "collect_gpu_info",
+    "collect_opengl_info",
+    "collect_journal_info",
+    "collect_packages_info",
+    "collect_driver_config",
+]
+
+
+@pytest.fixture
+def prompts(monkeypatch):
+    """Commands sudo was asked for, with collectors that do nothing."""
+    asked = []
+    monkeypatch.setattr(system_info, "acquire_sudo", asked.append)
+    for name in COLLECTORS:
+        monkeypatch.setattr(SystemInfo, name, lambda self, err_ctx, config: None)
+    return asked
+
+
+def start(info: SystemInfo, config: Config, names=None):
+    info.start_collectors(ErrorContext(), config, names)
+    info.require()
+    info.stop_collectors()
+
+
+def test_sudo_prompt_on_normal_run(prompts):
+    config = Config()
+    config.no_cache = True
+    # the collectors `execute_checks` starts for the default checks
+    names = {"os"}.union(*(check.inputs for check in plan_checks(config)))
+    info = SystemInfo()
+    start(info, config, names)
+    assert prompts == [["dmesg"]]
+
+    # a watch rerun of the journal does not ask again
+    start(info, config, {"journal"})
+    assert prompts == [["dmesg"]]
+
+
+def test_sudo_prompt_only_for_journal(prompts):
+    config = Config()
+    config.no_cache = True
+    start(SystemInfo(), config, {"os", "gpu"})
+    assert prompts == []
+    start(SystemInfo(), config)
+    assert prompts == [["dmesg"]]
+
+
+def test_no_sudo_prompt_when_quiet(prompts):
+    config = Config()
+    config.no_cache = True
+    config.quiet = True
+    start(SystemInfo(), config, {"journal"})
+    assert prompts == []
+
+
+def write(root, path: str, text: str) -> str:
+    full = os.path.join(str(root), path)
+    os.makedirs(os.path.dirname(full), exist_ok=True)
+    with open(full, "w") as f:
+        f.write(text)
+    return full
+
+
+def pci_device(root, slot: str, ids: dict, driver: str = None, module: str = None):
+    """A `/sys/bus/pci/devices/<slot>` directory, `driver` and `module` are
+    links into the tree like in sysfs."""
+    device_dir = os.path.join(str(root), "bus/pci/devices", slot)
+    for name, value in ids.items():
+        write(device_dir, name, "0x{:04x}\n".format(value))
+    if driver is not None:
+        driver_dir = os.path.join(str(root), "bus/pci/drivers", driver)
+        os.makedirs(driver_dir, exist_ok=True)
+        os.symlink(driver_dir, os.path.join(device_dir, "driver"))
+        if module is not None:
+            module_dir = os.path.join(str(root), "module", module)
+            os.makedirs(module_dir, exist_ok=True)
+            os.symlink(module_dir, os.path.join(driver_dir, "module"))
+    return device_dir
+
+
+NVIDIA_IDS = {
+    "class": 0x030000,
+    "vendor": 0x10DE,
+    "device": 0x2489,
+    "subsystem_vendor": 0x1458,
+    "subsystem_device": 0x405E,
+}
+
+
+def test_sysfs_tree(tmp_path):
+    pci_device(tmp_path, "0000:01:00.0", NVIDIA_IDS, "nvidia", "nvidia")
+    pci_device(
+        tmp_path,
+        "0000:00:02.0",
+        dict(NVIDIA_IDS, **{"class": 0x038000, "vendor": 0x8086, "device": 0x46A6}),
+    )
+    pci_device(tmp_path, "0000:00:1f.6", dict(NVIDIA_IDS, **{"class": 0x020000}))
+
+    gpus = GpuInfo.from_sysfs_tree(ErrorContext(), str(tmp_path))
+    assert [gpu.slot for gpu in gpus] == ["00:02.0", "01:00.0"]
+    intel, nvidia = gpus
+
+    assert (nvidia.class_id, nvidia.vendor_id, nvidia.device_id) == (
+        0x0300,
+        0x10DE,
+        0x2489,
+    )
+    assert nvidia.description == (
+        "01:00.0 VGA compatible controller: NVIDIA Corporation Device 2489"
+    )
+    assert nvidia.subsystem == "Device 1458 Device 405e"
+    assert nvidia.kernel_module_in_use == "nvidia"
+    assert nvidia.kernel_modules == ["nvidia"]
+
+    assert intel.description == (
+        "00:02.0 Display controller: Intel Corporation Device 46a6"
+    )
+    assert intel.kernel_module_in_use is None
+    assert intel.kernel_modules == []
+
+
+def test_sysfs_driver_without_module(tmp_path):
+    pci_device(tmp_path, "0000:01:00.0", NVIDIA_IDS, "vfio-pci")
+    (gpu,) = GpuInfo.from_sysfs_tree(ErrorContext(), str(tmp_path))
+    assert gpu.kernel_module_in_use == "vfio-pci"
+    assert gpu.kernel_modules == []
+
+
+def test_sysfs_missing_file_falls_back_to_lspci(tmp_path, monkeypatch):
+    device_dir = pci_device(tmp_path, "0000:01:00.0", NVIDIA_IDS)
+    os.remove(os.path.join(device_dir, "subsystem_vendor"))
+    with pytest.raises(OSError):
+        GpuInfo.from_sysfs_tree(ErrorContext(), str(tmp_path))
+    with pytest.raises(OSError):
+        GpuInfo.from_sysfs_tree(ErrorContext(), str(tmp_path / "empty"))
+
+    from_sysfs_tree = GpuInfo.from_sysfs_tree
+    monkeypatch.setattr(
+        GpuInfo,
+        "from_sysfs_tree",
+        staticmethod(lambda err_ctx: from_sysfs_tree(err_ctx, str(tmp_path))),
+    )
+    lspci = []
+    monkeypatch.setattr(
+        SystemInfo,
+        "__collect_gpu_info_lspci__",
+        lambda self, err_ctx, config: lspci.append(err_ctx),
+    )
+    info = SystemInfo()
+    info.collect_gpu_info(ErrorContext(), Config())
+    assert len(lspci) == 1
+    assert info.gpus_info is None
+
+
+GLXINFO = """\
+name of display: :0
+display: :0  screen: 0
+direct rendering: Yes
+server glx extensions:
+    GLX_ARB_create_context, GLX_ARB_multisample, GLX_EXT_swap_control,
+    GLX_SGI_swap_control
+Memory info (GL_NVX_gpu_memory_info):
+    Dedicated video memory: 8192 MB
+    Total available memory: 8192 MB
+    Currently available dedicated video memory: 7311 MB
+OpenGL vendor string: NVIDIA Corporation
+OpenGL renderer string: NVIDIA GeForce RTX 3070/PCIe/SSE2
+OpenGL core profile version string: 4.6.0 NVIDIA 535.129.03
+OpenGL core profile shading language version string: 4.60 NVIDIA
+OpenGL core profile extensions:
+    GL_AMD_multi_draw_indirect, GL_ARB_ES2_compatibility,
+    GL_KHR_debug
+OpenGL version string: 4.6.0 NVIDIA 535.129.03
+OpenGL shading language version string: 4.60 NVIDIA
+OpenGL limits:
+    GL_MAX_TEXTURE_SIZE = 32768
+    GL_MAX_VIEWPORT_DIMS = 32768, 32768
+"""
+
+
+def test_glxinfo():
+    err_ctx = ErrorContext()
+    gl = OpenGLInfo.from_glxinfo(err_ctx, GLXINFO)
+    assert gl.vendor == "NVIDIA Corporation"
+    assert gl.renderer == "NVIDIA GeForce RTX 3070/PCIe/SSE2"
+    assert gl.direct_rendering == "Yes"
+    assert (gl.version.major, gl.version.minor) == (4, 6)
+    assert gl.version.string == "4.6.0 NVIDIA 535.129.03"
+    assert (gl.glsl_version.major, gl.glsl_version.minor) == (4, 60)
+    assert (gl.core_version.major, gl.core_version.minor) == (4, 6)
+    assert gl.extensions == {
+        "GL_AMD_multi_draw_indirect",
+        "GL_ARB_ES2_compatibility",
+        "GL_KHR_debug",
+    }
+    assert gl.has_extension("GL_KHR_debug")
+    assert "GLX_SGI_swap_control" in gl.glx_extensions
+    assert gl.memory == {
+        "Dedicated video memory": 8192,
+        "Total available memory": 8192,
+        "Currently available dedicated video memory": 7311,
+    }
+    assert gl.limits == {
+        "GL_MAX_TEXTURE_SIZE": "32768",
+        "GL_MAX_VIEWPORT_DIMS": "32768, 32768",
+    }
+    assert err_ctx.opengl_version_parse_error is None
+
+
+def test_glxinfo_brief():
+    err_ctx = ErrorContext()
+    gl = OpenGLInfo.from_glxinfo(
+        err_ctx, "OpenGL vendor string: Mesa\nOpenGL version string: unknown\n"
+    )
+    assert gl.vendor == "Mesa"
+    assert gl.renderer is None
+    # -B prints no extension lists, unknown is not the same as none
+    assert gl.extensions is None
+    assert not gl.has_extension("GL_KHR_debug")
+    assert gl.version.major is None
+    assert "unknown" in err_ctx.opengl_version_parse_error
@@ -0,0 +1,19 @@
+from tool.utils import run
+import pytest
+import time
+
+
+def test_run_output():
+    assert run(["sh", "-c", "echo one; echo two >&2; echo three"]) == "one\nthree"
+
+
+def test_run_fails():
+    with pytest.raises(RuntimeError, match="failed with exit code 3"):
+        run(["sh", "-c", "echo broken >&2; exit 3"])
+
+
+def test_run_kills_child_that_closed_its_pipes():
+    started = time.monotonic()
+    with pytest.raises(RuntimeError, match="hanged for 1 seconds"):
+        run(["sh", "-c", "exec >&- 2>&-; sleep 30"], timeout=1)
+    assert time.monotonic() - started < 5
@@ -1,18 +1,57 @@
-from .analyser import run_checks
-from .config import parse_args, create_dirs
-from .logging import init_file_logger
-from .report import create_report
-import tempfile
-import shutil
+from .config import parse_args
 
 
 def main():
-    log_file = tempfile.NamedTemporaryFile(mode="w+", suffix=".log", prefix="ghc_")
-    init_file_logger(log_file)
     config = parse_args()
+    if config.list_checks:
+        from .checks import format_checks, plan_checks
+
+        print(format_checks(plan_checks(config)))
+        return
+
+    # everything else is imported only for a real run, see `tool.bench`
+    from .analyser import run_checks
+    from .config import create_dirs
+    from .logging import init_file_logger
+    from .profile import profiler
+    from .report import create_report, open_report
+    from .history import record_history
+    from .results import run_record, write_results
+    from .watch import watch
+    import tempfile
+    import traceback
+
+    log_file = tempfile.NamedTemporaryFile(mode="w+", suffix=".log", prefix="ghc_")
+    init_file_logger(log_file, config.quiet)
     create_dirs(config)
-    run_checks(config)
+    config.report = open_report(config)
+    profiler.enabled = config.profile
+    if config.watch:
+        watch(config, log_file)
+        clear(config)
+        return
+    try:
+        checks, info = run_checks(config)
+    except Exception:
+        traceback.print_exc()
+        create_report(config, log_file)
+        clear(config)
+        exit(1)
+    if not config.no_history:
+        record_history(config, run_record(checks, info))
+    if config.profile:
+        profile = profiler.format_report()
+        print(profile)
+        config.report.add_text("profile.txt", profile)
     create_report(config, log_file)
+    if config.results is not None:
+        write_results(config.results, checks, info, config.format)
+    clear(config)
+
+
+def clear(config):
+    import shutil
+
     if not config.no_clear:
         shutil.rmtree(config.temp_dir)
 
@@ -1,17 +1,29 @@
+from .baselines import BENCHMARK_METRICS, find_baseline, find_gpu, load_baselines
+from .checks import CHECKS_BY_NAME, plan_checks
 from .config import Config
-from .lib import Lib
-from .logging import TextColor
+from .driver_config import FRAMEBUFFER_MODULES, XORG_KERNEL_MODULES
+from .lib import GL_ERRORS, GL_PROBE_LIMITS, GL_PROBE_MAX_ERRORS, NativeError
+from .logging import TextColor, check_done, check_started
+from .profile import profiler
 from .system_info import SystemInfo, ErrorContext
 from .utils import run
-from typing import List, Tuple, Union
+from .worker import NativeRunner, SharedBuffer
+from typing import Dict, Iterable, List, Tuple, Union
+import math
 import shutil
-import sys
 import time
 
-lib = Lib()
+lib = NativeRunner()
+session = lib.session(1, 1)
 
 PADDING = 50
 
+# frame intervals stutter when p99 is this many times p50 and FRAME_SPIKE_MS longer
+FRAME_SPIKE_RATIO = 2.0
+FRAME_SPIKE_MS = 2.0
+# with vsync, share of frames presented later than 1.5 intervals
+MISSED_VSYNC_LIMIT = 0.05
+
 
 def icon_ok() -> str:
     return TextColor.green("✔")
@@ -25,15 +37,20 @@ def icon_fail() -> str:
     return TextColor.red("❌")
 
 
+def icon_skip() -> str:
+    return TextColor.yellow("⏭")
+
+
 def print_started(label: str):
-    sys.stdout.write(" ⏳ {} ".format(label))
-    sys.stdout.flush()
+    check_started(label)
 
 
 def print_done(label: str, messages: List[Tuple[str, str]]):
-    sys.stdout.write("\r" + " " * PADDING + "\r")
-    sys.stdout.write(format_summary(label, messages, PADDING) + "\n")
-    sys.stdout.flush()
+    check_done(format_summary(label, messages, PADDING) + "\n")
+
+
+def print_skipped(label: str, reason: str):
+    check_done(" {}  {} \n     ↳ skipped: {}\n".format(icon_skip(), label, reason))
 
 
 def format_summary(label: str, messages: List[Tuple[str, str]], padding=PADDING):
@@ -50,22 +67,44 @@ def format_summary(label: str, messages: List[Tuple[str, str]], padding=PADDING)
 
 
 class Check(object):
+    """Base of all checks, the label, inputs and requires are in `tool.checks`."""
 
-    def __init__(
-        self,
-        label: str,
-    ):
-        self.label = label # type: str
+    def __init__(self):
+        info = CHECKS_BY_NAME[type(self).__name__]
+        self.label = info.label # type: str
+        self.inputs = info.inputs # type: Tuple[str, ...]
+        self.requires = info.requires # type: Tuple[str, ...]
         self.messages = [] # type: List[tuple[str, str]]
+        self.duration = None # type: float
+        self.data = {} # type: Dict[str, object]
+        self.skipped = None # type: str
+
+    @property
+    def name(self) -> str:
+        return type(self).__name__
 
     def run(self, err_ctx: ErrorContext, info: SystemInfo, config: Config):
         print_started(self.label)
-        self.__run__(err_ctx, info, config)
+        info.require(*self.inputs)
+        started = time.time()
+        with profiler.measure("check", type(self).__name__):
+            try:
+                self.__run__(err_ctx, info, config)
+            except NativeError as e:
+                self.fail(str(e))
+        self.duration = time.time() - started
         print_done(self.label, self.messages)
 
+    def skip(self, reason: str):
+        self.skipped = reason
+        print_skipped(self.label, reason)
+
     def is_ok(self) -> bool:
         return len(self.messages) == 0
 
+    def has_failed(self) -> bool:
+        return self.skipped is not None or any(m[0] == "fail" for m in self.messages)
+
     def fail(self, message: Union[str, bytes]):
         self.__add_message__("fail", message)
 
@@ -83,13 +122,8 @@ class Check(object):
 
 class GPUCheck(Check):
 
-    def __init__(self):
-        super(GPUCheck, self).__init__("Checking GPU")
-
     def __run__(self, err_ctx: ErrorContext, info: SystemInfo, config: Config):
-        info.collect_gpu_info(err_ctx, config)
-
-        if info.gpus_info is None:
+        if not info.gpus_info:
             self.fail(err_ctx.gpu_info_parse_error or "No GPUs detected")
             return
 
@@ -104,20 +138,17 @@ class GPUCheck(Check):
                     )
                 )
 
-        is_nvidia = "NVIDIA" in gpu.description
-        not_nvidia_module = gpu.kernel_module_in_use not in ("nvidia", "nouveau")
-        if is_nvidia and not_nvidia_module:
-            self.fail(
-                "NVIDIA GPU '{}' uses unsupported driver '{}'".format(
-                    gpu.subsystem or "[unknown]", gpu.kernel_module_in_use
+            is_nvidia = "NVIDIA" in (gpu.description or "")
+            not_nvidia_module = gpu.kernel_module_in_use not in ("nvidia", "nouveau")
+            if is_nvidia and not_nvidia_module:
+                self.fail(
+                    "NVIDIA GPU '{}' uses unsupported driver '{}'".format(
+                        gpu.subsystem or "[unknown]", gpu.kernel_module_in_use
+                    )
                 )
-            )
 
 
 class OpenGLInfoCheck(Check):
-    def __init__(self):
-        super(OpenGLInfoCheck, self).__init__("Checking OpenGL info")
-
     def __run__(self, err_ctx: ErrorContext, info: SystemInfo, config: Config):
         if shutil.which("glxinfo") is None:
             self.fail(
@@ -125,24 +156,26 @@ class OpenGLInfoCheck(Check):
             )
             return
 
-        info.collect_opengl_info(err_ctx, config)
         gl = info.opengl_info
         if gl is None:
             self.fail(err_ctx.opengl_info_parse_error or "Failed to parse OpenGL info")
             return
 
-        if "llvmpipe" in gl.renderer.lower() or "softpipe" in gl.renderer.lower():
+        if gl.renderer is None:
+            self.fail("No 'OpenGL renderer string' in glxinfo output")
+        elif "llvmpipe" in gl.renderer.lower() or "softpipe" in gl.renderer.lower():
             self.warn("Software renderer detected: '{}'".format(gl.renderer))
 
         if gl.version is None:
             self.fail("Failed to get OpenGL version")
+            return
 
         major, minor = gl.version.major, gl.version.minor
         if major is None or minor is None:
             self.fail(
                 err_ctx.opengl_version_parse_error or "Failed to parse OpenGL version"
             )
-        elif major < 4 and minor < 3:
+        elif (major, minor) < (4, 3):
             self.fail(
                 "OpenGL version too low: {}.{} ({})".format(
                     gl.version.major, gl.version.minor, gl.version.string
@@ -151,87 +184,395 @@ class OpenGLInfoCheck(Check):
 
 
 class OpenGLContextCheck(Check):
-    def __init__(self):
-        super(OpenGLContextCheck, self).__init__("Checking OpenGL context")
-
     def __run__(self, err_ctx: ErrorContext, info: SystemInfo, config: Config):
-        res = lib.createGlxContext(1, 1)
-        if res.code != 0:
-            self.fail(res.message)
-            return
-
-        res = lib.destroyGlxContext()
+        res = session.create_context()
+        self.data["backend"] = session.backend
         if res.code != 0:
             self.fail(res.message)
 
 
 class OpenGLFunctionsLoadCheck(Check):
-    def __init__(self):
-        super(OpenGLFunctionsLoadCheck, self).__init__(
-            "Checking OpenGL functions loading"
-        )
-
     def __run__(self, err_ctx: ErrorContext, info: SystemInfo, config: Config):
-        res = lib.createGlxContext(1, 1)
-        if res.code != 0:
+        res, probe = session.probe_context()
+        if probe is None:
             self.fail(res.message)
             return
 
-        res = lib.gladLoadFunctions()
-        if res.code != 0:
-            self.fail(res.message)
-
-        major, minor = lib.gladGetVersion()
-        res = lib.getOpenGLVersionString()
-        if major < 4 and minor < 3:
+        major, minor = probe.major, probe.minor
+        self.data = {
+            "vendor": probe.vendor.decode(errors="replace"),
+            "renderer": probe.renderer.decode(errors="replace"),
+            "version": probe.version.decode(errors="replace"),
+            "glsl_version": probe.glslVersion.decode(errors="replace"),
+            "limits": {
+                name: value if isinstance(value, int) else list(value)
+                for name, value in ((n, getattr(probe, n)) for n in GL_PROBE_LIMITS)
+            },
+        }
+        if (major, minor) < (4, 3):
             self.fail(
                 "Loaded by glad OpenGL version too low: {}.{}".format(major, minor)
             )
+        if info.opengl_info is None or info.opengl_info.version is None:
+            return
         ver = info.opengl_info.version
         if major != ver.major or minor != ver.minor:
             self.warn(
                 "Loaded by glad OpenGL version mismatch:"
                 "\n\tglad:    {}.{}  '{}'"
                 "\n\tglxinfo: {}.{}  '{}'".format(
-                    major, minor, res.message.decode(), ver.major, ver.minor, ver.string
+                    major, minor, self.data["version"], ver.major, ver.minor, ver.string
                 )
             )
 
-        res = lib.destroyGlxContext()
+
+class OpenGLFunctionsCallCheck(Check):
+    def __run__(self, err_ctx: ErrorContext, info: SystemInfo, config: Config):
+        res, probe = session.probe_context()
+        if probe is None:
+            self.fail(res.message)
+            return
+        self.data["statements"] = probe.statements
+        if res.code != 0 and probe.errorCount == 0:
+            self.fail(res.message)
+        for error in probe.errors[: min(probe.errorCount, GL_PROBE_MAX_ERRORS)]:
+            text = error.text.decode()
+            if error.error == 0:
+                log = probe.infoLog.decode(errors="replace")
+                self.fail("{}:\n{}".format(text, log))
+            else:
+                name = GL_ERRORS.get(error.error, "0x{:04x}".format(error.error))
+                self.fail("{} : {}".format(text, name))
+        if probe.errorCount > GL_PROBE_MAX_ERRORS:
+            more = probe.errorCount - GL_PROBE_MAX_ERRORS
+            self.fail("{} more failed statements".format(more))
+
+
+class RenderCheck(Check):
+    def __run__(self, err_ctx: ErrorContext, info: SystemInfo, config: Config):
+        from .render import SCENES, compare, to_ppm
+
+        res = session.load_functions()
         if res.code != 0:
             self.fail(res.message)
+            return
+
+        size = config.render_size
+        self.data["size"] = size
+        # one buffer shared with the worker for all scenes, compared in place
+        with SharedBuffer(size * size * 4) as buffer:
+            for index, scene in enumerate(SCENES):
+                res, pixels = lib.renderScene(index, size, size, buffer)
+                if res.code != 0:
+                    self.fail("Scene '{}': {}".format(scene.name, res.message.decode()))
+                    continue
+                with profiler.measure("render", scene.name):
+                    golden = scene.golden(size, size)
+                    diff = compare(pixels, golden, size, size, scene.tolerance)
+                self.data[scene.name] = {
+                    "mismatch_percent": round(diff.percent, 4),
+                    "max_diff": diff.max_diff,
+                }
+                if diff.percent > config.render_mismatch:
+                    self.fail(
+                        "Scene '{}' differs from its golden image in {:.2f}% of "
+                        "pixels, max channel difference {}".format(
+                            scene.name, diff.percent, diff.max_diff
+                        )
+                    )
+                if diff.image is not None and config.report is not None:
+                    name = "render/{}".format(scene.name)
+                    config.report.add_bytes(
+                        name + "_actual.ppm", to_ppm(pixels, size, size, 4)
+                    )
+                    config.report.add_bytes(
+                        name + "_diff.ppm", to_ppm(diff.image, size, size, 3)
+                    )
 
 
-class OpenGLFunctionsCallCheck(Check):
-    def __init__(self):
-        super(OpenGLFunctionsCallCheck, self).__init__(
-            "Checking OpenGL basic function calls"
-        )
+class GPUDevicesCheck(Check):
+    def __run__(self, err_ctx: ErrorContext, info: SystemInfo, config: Config):
+        from .devices import probe_devices
+        from .results import to_record
+
+        try:
+            devices = probe_devices(config.jobs)
+        except Exception as e:
+            self.warn("Per-GPU OpenGL probing unavailable: {}".format(e))
+            return
+
+        gpus = {gpu.slot: gpu for gpu in info.gpus_info or []}
+        for device in devices:
+            key = device.slot or device.drm_file or "egl{}".format(device.index)
+            self.data[key] = to_record(device)
+            if device.software:
+                continue
+
+            gpu = gpus.pop(device.slot, None)
+            label = "GPU {} '{}'".format(
+                key, (gpu and gpu.description) or device.renderer or "[unknown]"
+            )
+            if device.code != 0:
+                self.fail("{}: {}".format(label, device.error))
+                continue
+            if (device.major, device.minor) < (4, 3):
+                self.fail(
+                    "{}: OpenGL version too low: {}.{} ({})".format(
+                        label, device.major, device.minor, device.version
+                    )
+                )
+            if not device.rendered:
+                self.fail("{}: offscreen rendering failed".format(label))
+            if "llvmpipe" in device.renderer.lower():
+                self.warn("{}: software renderer '{}'".format(label, device.renderer))
+
+        for slot, gpu in sorted(gpus.items()):
+            self.warn(
+                "GPU {} '{}' has no EGL device, driver '{}'".format(
+                    slot, gpu.description or "[unknown]", gpu.kernel_module_in_use
+                )
+            )
+
+
+class KernelLogCheck(Check):
+    def __run__(self, err_ctx: ErrorContext, info: SystemInfo, config: Config):
+        log = info.kernel_log
+        if log is None:
+            self.warn("Kernel log unavailable:\n" + (err_ctx.journal_error or ""))
+            return
 
+        for stats in log.found():
+            message = "{}: {} time(s)".format(stats.signature.message, stats.count)
+            if stats.first_time is not None:
+                message += ", first at {}s, last at {}s".format(
+                    stats.first_time, stats.last_time
+                )
+            message += "\n\t" + stats.sample
+            self.__add_message__(stats.signature.level, message)
+            self.data[stats.signature.name] = stats.count
+
+
+class PackagesCheck(Check):
     def __run__(self, err_ctx: ErrorContext, info: SystemInfo, config: Config):
-        res = lib.createGlxContext(1, 1)
+        packages = info.packages
+        if packages is None:
+            self.warn(err_ctx.packages_error or "Package index unavailable")
+            return
+
+        self.data["installed"] = len(packages)
+        if not packages.installed("mesa-utils"):
+            self.warn("Package 'mesa-utils' is not installed, glxinfo is missing")
+
+        branches = packages.nvidia_branches()
+        if len(branches) > 1:
+            self.warn(
+                "Mixed NVIDIA driver branches installed: {}".format(
+                    ", ".join(
+                        "{} ({})".format(
+                            branch, ", ".join(name for name, _ in branches[branch])
+                        )
+                        for branch in sorted(branches)
+                    )
+                )
+            )
+        for branch, installed in sorted(branches.items()):
+            versions = {version for _, version in installed}
+            if len(versions) > 1:
+                self.warn(
+                    "NVIDIA {} packages have different versions:\n\t{}".format(
+                        branch,
+                        "\n\t".join(
+                            "{} {}".format(name, version)
+                            for name, version in installed
+                        ),
+                    )
+                )
+
+        modules = {gpu.kernel_module_in_use for gpu in info.gpus_info or []}
+        if "nvidia" in modules and not packages.family("xserver-xorg-video-nvidia-"):
+            self.warn("NVIDIA driver in use but no xserver-xorg-video-nvidia package")
+        if "nouveau" in modules and not packages.installed("libdrm-nouveau2"):
+            self.warn("nouveau driver in use but 'libdrm-nouveau2' is not installed")
+
+
+class DriverConfigCheck(Check):
+    def __run__(self, err_ctx: ErrorContext, info: SystemInfo, config: Config):
+        drivers = info.driver_config
+        if drivers is None:
+            self.warn(err_ctx.driver_config_error or "Driver config unavailable")
+            return
+
+        self.data["files"] = len(drivers.files)
+        for gpu in info.gpus_info or []:
+            module = gpu.kernel_module_in_use
+            if module is None:
+                candidates = [
+                    m for m in gpu.kernel_modules if m not in FRAMEBUFFER_MODULES
+                ]
+                blocked = [m for m in candidates if drivers.blacklist_source(m)]
+                if candidates and len(blocked) == len(candidates):
+                    self.fail(
+                        "No driver bound to {}, all its modules are blacklisted: "
+                        "{}".format(
+                            gpu.slot,
+                            ", ".join(
+                                "{} ({})".format(m, drivers.blacklist_source(m))
+                                for m in blocked
+                            ),
+                        )
+                    )
+                continue
+
+            source = drivers.blacklist_source(module)
+            if source is not None:
+                self.warn(
+                    "Driver '{}' in use by {} is blacklisted in {}, it will not "
+                    "load after reboot".format(module, gpu.slot, source)
+                )
+
+            device = drivers.xorg_device(gpu.slot)
+            if device is None:
+                continue
+            expected = XORG_KERNEL_MODULES.get(device.driver)
+            if expected is not None and module not in expected:
+                self.warn(
+                    "Xorg requests driver '{}' ({}) but {} is driven by '{}'".format(
+                        device.driver, device.source, gpu.slot, module
+                    )
+                )
+
+
+class GPUBenchmarkCheck(Check):
+    def __run__(self, err_ctx: ErrorContext, info: SystemInfo, config: Config):
+        res = session.load_functions()
         if res.code != 0:
             self.fail(res.message)
             return
-        res = lib.gladLoadFunctions()
+
+        res, bench = lib.runGpuBenchmark()
         if res.code != 0:
             self.fail(res.message)
             return
-        res = lib.testBasicOpenGlFunctions()
+
+        self.data = {
+            "upload_mbps": bench.uploadMBps,
+            "mapped_upload_mbps": bench.mappedUploadMBps,
+            "readback_mbps": bench.readbackMBps,
+            "draw_calls_per_sec": bench.drawCallsPerSec,
+            "fill_rate_mpix": bench.fillRateMPixPerSec,
+            "gpu_timers": bool(bench.gpuTimers),
+        }
+        if config.baselines is None:
+            return
+
+        try:
+            baselines = load_baselines(config.baselines)
+        except (OSError, ValueError) as e:
+            self.warn("Failed to load benchmark baselines: {}".format(e))
+            return
+
+        # the GPU of the session context, not the first one with a baseline
+        _, probe = session.probe_context()
+        vendor = probe.vendor.decode() if probe is not None else None
+        renderer = probe.renderer.decode() if probe is not None else None
+
+        def devices() -> list:
+            from .devices import probe_devices
+
+            try:
+                return probe_devices(config.jobs)
+            except Exception:
+                return []
+
+        gpu = find_gpu(info.gpus_info or [], vendor, renderer, devices)
+        baseline = find_baseline(baselines, gpu, renderer)
+        if baseline is None:
+            return
+
+        for metric, label in BENCHMARK_METRICS.items():
+            expected = baseline.get(metric)
+            if expected is None:
+                continue
+            if self.data[metric] < expected * (1.0 - config.benchmark_tolerance):
+                self.warn(
+                    "GPU performance regression, {}: {:.0f}, baseline {:.0f}".format(
+                        label, self.data[metric], expected
+                    )
+                )
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    """Nearest-rank p50, p99 and max."""
+    ordered = sorted(values)
+
+    def rank(p: float) -> float:
+        return ordered[max(0, int(math.ceil(p / 100.0 * len(ordered))) - 1)]
+
+    return {"p50": rank(50), "p99": rank(99), "max": ordered[-1]}
+
+
+class FramePacingCheck(Check):
+    def __run__(self, err_ctx: ErrorContext, info: SystemInfo, config: Config):
+        res = session.load_functions()
         if res.code != 0:
-            fails = res.message.decode().split("|")
-            [self.fail(f) for f in fails]
-        res = lib.destroyGlxContext()
+            self.fail(res.message)
+            return
+
+        res, pacing, cpu, gpu, interval = lib.runFramePacing(config.frames, True)
         if res.code != 0:
             self.fail(res.message)
+            return
 
+        self.data = {
+            "frames": pacing.frames,
+            "gpu_timers": bool(pacing.gpuTimers),
+            "presented": bool(pacing.presented),
+            "swap_interval": pacing.swapInterval,
+        }
+        passes = [("offscreen", 0)]
+        if pacing.presented:
+            passes.append(("presented", pacing.frames))
+        for name, start in passes:
+            end = start + pacing.frames
+            # the first frame pays for shader compilation and allocations
+            stats = {
+                "cpu_submit_ms": percentiles(cpu[start + 1 : end]),
+                "interval_ms": percentiles(interval[start + 1 : end]),
+            }
+            if pacing.gpuTimers:
+                stats["gpu_ms"] = percentiles(gpu[start + 1 : end])
+            self.data[name] = stats
+            self.__check_pass__(
+                name, interval[start + 1 : end], stats["interval_ms"]
+            )
 
-def run_checks(config: Config):
-    TextColor.enable()
-    info = SystemInfo()
-    err_ctx = ErrorContext()
-    info.collect_os_info(err_ctx, config)
+        if not pacing.presented:
+            self.data["note"] = "no window to present to, offscreen frames only"
+
+    def __check_pass__(
+        self, name: str, intervals: List[float], stats: Dict[str, float]
+    ):
+        if (
+            stats["p99"] > stats["p50"] * FRAME_SPIKE_RATIO
+            and stats["p99"] - stats["p50"] > FRAME_SPIKE_MS
+        ):
+            self.warn(
+                "Uneven {} frame times: p50 {:.2f} ms, p99 {:.2f} ms, "
+                "max {:.2f} ms".format(name, stats["p50"], stats["p99"], stats["max"])
+            )
+        if name == "presented" and self.data["swap_interval"] == 1:
+            missed = sum(1 for t in intervals if t > stats["p50"] * 1.5)
+            if missed > len(intervals) * MISSED_VSYNC_LIMIT:
+                self.warn(
+                    "{} of {} presented frames missed vsync".format(
+                        missed, len(intervals)
+                    )
+                )
 
+
+def load_lib(config: Config):
+    lib.timeout = config.native_timeout
+    session.backend = config.backend
     try:
         lib.load()
     except Exception as e:
@@ -239,11 +580,54 @@ def run_checks(config: Config):
         print("Build helper lib: `mkdir build && cd build && cmake .. && make -j8`")
         exit(1)
 
-    GPUCheck().run(err_ctx, info, config)
-    OpenGLInfoCheck().run(err_ctx, info, config)
-    OpenGLContextCheck().run(err_ctx, info, config)
-    OpenGLFunctionsLoadCheck().run(err_ctx, info, config)
-    OpenGLFunctionsCallCheck().run(err_ctx, info, config)
 
-    info.collect_journal_info(err_ctx, config)
-    info.collect_packages_info(err_ctx, config)
+# check classes by name, their metadata is in `tool.checks`
+CHECK_CLASSES = {cls.__name__: cls for cls in Check.__subclasses__()}
+
+
+def create_checks(config: Config) -> List[Check]:
+    """Builds the execution plan: selected checks plus their prerequisites."""
+    return [CHECK_CLASSES[info.name]() for info in plan_checks(config)]
+
+
+def execute_checks(
+    checks: List[Check],
+    err_ctx: ErrorContext,
+    info: SystemInfo,
+    config: Config,
+    collectors: Iterable[str] = None,
+):
+    """Runs `checks` while the collectors gather system info.
+
+    Only collectors some check takes as input are started when `collectors` is
+    None. A check is skipped right away when one of its prerequisites failed
+    or was skipped itself.
+    """
+    if collectors is None:
+        collectors = {"os"}.union(*(check.inputs for check in checks))
+    info.start_collectors(err_ctx, config, collectors)
+    failed = set()
+    with session:
+        for check in checks:
+            missing = [name for name in check.requires if name in failed]
+            if missing:
+                check.skip("prerequisite {} did not pass".format(", ".join(missing)))
+            else:
+                check.run(err_ctx, info, config)
+            if check.has_failed():
+                failed.add(check.name)
+
+    info.require()
+    info.stop_collectors()
+    if err_ctx.cache_error is not None:
+        print(err_ctx.cache_error)
+
+
+def run_checks(config: Config) -> Tuple[List[Check], SystemInfo]:
+    TextColor.enable()
+    info = SystemInfo()
+    err_ctx = ErrorContext()
+    load_lib(config)
+    checks = create_checks(config)
+    execute_checks(checks, err_ctx, info, config)
+    return checks, info
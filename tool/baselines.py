@@ -0,0 +1,79 @@
+from .system_info import GpuInfo
+from typing import Callable, Dict, List
+import json
+import re
+
+BENCHMARK_METRICS = {
+    "upload_mbps": "buffer upload, MB/s",
+    "mapped_upload_mbps": "mapped buffer upload, MB/s",
+    "readback_mbps": "readback, MB/s",
+    "draw_calls_per_sec": "draw calls/s",
+    "fill_rate_mpix": "fill rate, Mpix/s",
+}
+
+
+def load_baselines(path: str) -> Dict[str, Dict[str, float]]:
+    """Reads `{"<vendor>:<device>" | "<renderer substring>" | "default": {metric: value}}`."""
+    with open(path) as f:
+        baselines = json.load(f)
+    for key, metrics in baselines.items():
+        unknown = set(metrics) - set(BENCHMARK_METRICS)
+        if unknown:
+            raise ValueError(
+                "Unknown metrics for '{}' in {}: {}".format(
+                    key, path, ", ".join(sorted(unknown))
+                )
+            )
+    return {key.lower(): metrics for key, metrics in baselines.items()}
+
+
+# words of GL vendor and renderer strings -> PCI vendor id of the GPU
+GL_VENDOR_IDS = {
+    "nvidia": 0x10DE,
+    "nouveau": 0x10DE,
+    "amd": 0x1002,
+    "ati": 0x1002,
+    "radeon": 0x1002,
+    "intel": 0x8086,
+}
+
+SOFTWARE_RENDERERS = ("llvmpipe", "softpipe", "swrast")
+
+
+def find_gpu(
+    gpus: List[GpuInfo], vendor: str, renderer: str, devices: Callable[[], list] = None
+) -> GpuInfo:
+    """The GPU behind a GL context with the given vendor and renderer strings.
+
+    GPUs of the context's vendor are told apart by `devices`, called only
+    when needed for the EGL device probes (`tool.devices.DeviceInfo`), whose
+    slot has the same renderer. None for software renderers and when no
+    single GPU is left.
+    """
+    text = "{} {}".format(vendor or "", renderer or "").lower()
+    if any(name in text for name in SOFTWARE_RENDERERS):
+        return None
+    vendor_ids = {GL_VENDOR_IDS.get(word) for word in re.findall(r"[a-z]+", text)}
+    candidates = [gpu for gpu in gpus if gpu.vendor_id in vendor_ids]
+    if len(candidates) > 1 and devices is not None:
+        slots = {d.slot for d in devices() if d.code == 0 and d.renderer == renderer}
+        candidates = [gpu for gpu in candidates if gpu.slot in slots]
+    return candidates[0] if len(candidates) == 1 else None
+
+
+def find_baseline(
+    baselines: Dict[str, Dict[str, float]], gpu: GpuInfo, renderer: str
+) -> Dict[str, float]:
+    """Picks the baseline by the PCI id of `gpu` first, then by the longest
+    renderer match, then `default`. None when none of them is in `baselines`.
+    """
+    if gpu is not None and gpu.vendor_id is not None and gpu.device_id is not None:
+        pci_id = "{:04x}:{:04x}".format(gpu.vendor_id, gpu.device_id)
+        if pci_id in baselines:
+            return baselines[pci_id]
+    if renderer:
+        renderer = renderer.lower()
+        matches = [key for key in baselines if key != "default" and key in renderer]
+        if matches:
+            return baselines[max(matches, key=len)]
+    return baselines.get("default")
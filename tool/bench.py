@@ -0,0 +1,240 @@
+from .utils import local_path
+import argparse
+import json
+import statistics
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+# CLI fast paths and how long they may take in-process, in multiples of a bare
+# `python -c pass`, so the budgets hold on slow machines too
+FAST_PATHS = [
+    (["--version"], 2.0),
+    (["--list-checks"], 2.0),
+]
+
+# modules only a real run needs, a fast path importing them is a regression
+HEAVY_MODULES = [
+    "concurrent.futures",
+    "ctypes",
+    "multiprocessing",
+    "socket",
+    "subprocess",
+    "tarfile",
+    "tool.analyser",
+    "tool.devices",
+    "tool.report",
+    "tool.scheduler",
+    "tool.system_info",
+    "tool.watch",
+]
+
+PROBE = """
+import json, os, sys, time
+start = time.perf_counter()
+sys.argv = ["gfxhealthcheck.py"] + {args!r}
+sys.stdout = open(os.devnull, "w")
+try:
+    from tool.__main__ import main
+    main()
+except SystemExit:
+    pass
+elapsed = time.perf_counter() - start
+sys.stderr.write(json.dumps({{"time": elapsed, "modules": sorted(sys.modules)}}))
+"""
+
+
+class Measurement(object):
+    def __init__(self, args: list, budget: float):
+        self.args = args # type: list
+        self.budget = budget # type: float
+        self.inner = [] # type: list
+        self.total = [] # type: list
+        self.modules = [] # type: list
+
+    def heavy(self) -> list:
+        return [m for m in HEAVY_MODULES if m in self.modules]
+
+
+def measure(args: list, budget: float, runs: int) -> Measurement:
+    """Runs the CLI with `args` in `runs` fresh interpreters."""
+    result = Measurement(args, budget)
+    for _ in range(runs):
+        started = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, "-c", PROBE.format(args=args)],
+            cwd=local_path("."),
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            check=True,
+        )
+        result.total.append((time.perf_counter() - started) * 1000)
+        probe = json.loads(proc.stderr.decode().splitlines()[-1])
+        result.inner.append(probe["time"] * 1000)
+        result.modules = probe["modules"]
+    return result
+
+
+class CountingFile(object):
+    """Temporary log file counting its flushes, each one a write system call."""
+
+    def __init__(self):
+        self.file = tempfile.TemporaryFile(mode="w+")
+        self.flushes = 0 # type: int
+
+    def write(self, data: str) -> int:
+        return self.file.write(data)
+
+    def flush(self):
+        self.flushes += 1
+        self.file.flush()
+
+    def read(self) -> str:
+        self.file.seek(0)
+        text = self.file.read()
+        self.file.close()
+        return text
+
+
+class FlushingTee(object):
+    """The former `Tee`: writes and flushes every stream on every write."""
+
+    def __init__(self, *streams):
+        self.streams = streams
+
+    def write(self, data):
+        for stream in self.streams:
+            stream.write(data)
+            stream.flush()
+
+    def flush(self):
+        for stream in self.streams:
+            stream.flush()
+
+
+LINE_RE = re.compile(r"^producer (\d+) line (\d+) x+$")
+
+
+def produce(producer: int, lines: int):
+    for i in range(lines):
+        print("producer {} line {} {}".format(producer, i, "x" * 40))
+
+
+def broken_lines(text: str, producers: int, lines: int) -> int:
+    """Lines not printed whole, in order and exactly once by their producer."""
+    expected = [0] * producers
+    broken = 0
+    for line in text.splitlines():
+        match = LINE_RE.match(line)
+        if match is None:
+            broken += 1
+            continue
+        producer, i = int(match.group(1)), int(match.group(2))
+        if i != expected[producer]:
+            broken += 1
+        expected[producer] = i + 1
+    return broken + sum(lines - n for n in expected if n < lines)
+
+
+def measure_output(producers: int, lines: int, queued: bool):
+    """Prints from `producers` threads through `Output` or `FlushingTee`,
+    returns milliseconds until everything is written, flushes and broken lines."""
+    from .logging import Output, PlainRenderer, Stream
+
+    log = CountingFile()
+    stdout = sys.stdout
+    output = None
+    if queued:
+        output = Output([PlainRenderer(log, commands=True)])
+        sys.stdout = Stream(output, False, stdout)
+    else:
+        sys.stdout = FlushingTee(log)
+    threads = [
+        threading.Thread(target=produce, args=(p, lines)) for p in range(producers)
+    ]
+    started = time.perf_counter()
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if output is not None:
+            output.close()
+    finally:
+        sys.stdout = stdout
+    elapsed = (time.perf_counter() - started) * 1000
+    return elapsed, log.flushes, broken_lines(log.read(), producers, lines)
+
+
+def interpreter_startup(runs: int) -> float:
+    times = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"], check=True)
+        times.append((time.perf_counter() - started) * 1000)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m tool.bench",
+        description="Measure startup time of the CLI fast paths and fail on regressions",
+    )
+    parser.add_argument("--runs", type=int, default=10, help="runs per fast path")
+    parser.add_argument(
+        "--scale",
+        type=float,
+        default=1.0,
+        help="multiply time budgets, for slow machines",
+    )
+    parser.add_argument(
+        "--producers", type=int, default=8, help="threads printing concurrently"
+    )
+    parser.add_argument(
+        "--lines", type=int, default=5000, help="lines printed by each thread"
+    )
+    args = parser.parse_args()
+
+    runs = max(1, args.runs)
+    startup = interpreter_startup(runs)
+    print(" python startup: {:.1f} ms".format(startup))
+    failed = False
+    for path_args, factor in FAST_PATHS:
+        m = measure(path_args, factor * args.scale * startup, runs)
+        inner = statistics.median(m.inner)
+        print(
+            " {:<16} {:>7.1f} ms in-process, {:>7.1f} ms total, "
+            "budget {:.0f} ms ({:g}x startup)".format(
+                " ".join(path_args),
+                inner,
+                statistics.median(m.total),
+                m.budget,
+                factor * args.scale,
+            )
+        )
+        if inner > m.budget:
+            print("   over budget")
+            failed = True
+        for module in m.heavy():
+            print("   imports '{}'".format(module))
+            failed = True
+
+    producers, lines = max(1, args.producers), max(1, args.lines)
+    print(" output, {} threads printing {} lines each:".format(producers, lines))
+    for name, queued in (("flush per write", False), ("tool.logging", True)):
+        elapsed, flushes, broken = measure_output(producers, lines, queued)
+        print(
+            "   {:<16} {:>7.1f} ms, {:>6} flushes, {} broken lines".format(
+                name, elapsed, flushes, broken
+            )
+        )
+        if queued and broken:
+            failed = True
+    exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
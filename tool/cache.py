@@ -0,0 +1,127 @@
+from typing import Callable, List
+import functools
+import hashlib
+import os
+import pickle
+import tempfile
+import time
+
+CACHE_VERSION = 3
+
+FINGERPRINT_PATHS = [
+    "/var/lib/dpkg/status",
+    "/etc/X11/xorg.conf",
+    "/etc/X11/xorg.conf.d",
+    "/etc/modprobe.d",
+]
+
+
+def loaded_modules() -> List[str]:
+    try:
+        with open("/proc/modules") as f:
+            return sorted(line.split(" ", 1)[0] for line in f)
+    except OSError:
+        return []
+
+
+def fingerprint() -> str:
+    """Cheap summary of everything the cached probes depend on."""
+    uname = os.uname()
+    parts = [
+        str(CACHE_VERSION),
+        uname.sysname,
+        uname.release,
+        uname.machine,
+        os.environ.get("DISPLAY", ""),
+    ]
+    for path in FINGERPRINT_PATHS:
+        try:
+            parts.append("{}={}".format(path, os.stat(path).st_mtime_ns))
+        except OSError:
+            parts.append("{}=-".format(path))
+    parts.extend(loaded_modules())
+    return hashlib.sha1("\n".join(parts).encode()).hexdigest()
+
+
+class Cache(object):
+    """On-disk cache of parsed probe results.
+
+    Entries are dropped when the system fingerprint changes or when they are
+    older than `ttl` seconds. With `refresh` entries are rewritten but never read.
+    """
+
+    def __init__(self, path: str, ttl: int, refresh: bool = False):
+        self.path = path # type: str
+        self.ttl = ttl # type: int
+        self.refresh = refresh # type: bool
+        self.fingerprint = fingerprint() # type: str
+        os.makedirs(self.path, exist_ok=True)
+        self.evict()
+
+    def get(self, key: str):
+        if self.refresh:
+            return None
+        try:
+            with open(self.__entry_path__(key), "rb") as f:
+                entry = pickle.load(f)
+        except Exception:
+            return None
+        if entry.get("fingerprint") != self.fingerprint or self.__expired__(entry):
+            return None
+        return entry.get("value")
+
+    def put(self, key: str, value):
+        entry = {"fingerprint": self.fingerprint, "time": time.time(), "value": value}
+        fd, tmp_path = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.__entry_path__(key))
+        except Exception:
+            os.remove(tmp_path)
+            raise
+
+    def evict(self):
+        now = time.time()
+        for name in os.listdir(self.path):
+            file_name = os.path.join(self.path, name)
+            try:
+                if now - os.stat(file_name).st_mtime > self.ttl:
+                    os.remove(file_name)
+            except OSError:
+                pass
+
+    def __entry_path__(self, key: str) -> str:
+        return os.path.join(self.path, key + ".pickle")
+
+    def __expired__(self, entry: dict) -> bool:
+        return time.time() - entry.get("time", 0) > self.ttl
+
+
+def cached(attr: str, key: Callable = None) -> Callable:
+    """Makes a `SystemInfo` collector reuse `attr` from `self.cache` when possible.
+
+    `key(config)` can name a separate entry for collector variants, `attr` is
+    used when it is omitted or returns None.
+    """
+
+    def decorator(collect: Callable) -> Callable:
+        @functools.wraps(collect)
+        def wrapper(self, err_ctx, config):
+            entry = (key and key(config)) or attr
+            if self.cache is not None:
+                value = self.cache.get(entry)
+                if value is not None:
+                    setattr(self, attr, value)
+                    return
+            collect(self, err_ctx, config)
+            value = getattr(self, attr)
+            if self.cache is not None and value is not None:
+                try:
+                    self.cache.put(entry, value)
+                except Exception as e:
+                    err_ctx.cache_error = str(e)
+
+        return wrapper
+
+    return decorator
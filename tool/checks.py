@@ -0,0 +1,133 @@
+from .config import Config
+from typing import Dict, List, Tuple
+
+
+class CheckInfo(object):
+    """Name, label, collector inputs and prerequisite checks of a `Check`.
+
+    Kept apart from `tool.analyser`, so that planning and listing checks
+    imports neither the native lib nor the collectors.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        label: str,
+        inputs: Tuple[str, ...] = (),
+        requires: Tuple[str, ...] = (),
+    ):
+        self.name = name # type: str
+        self.label = label # type: str
+        self.inputs = inputs # type: Tuple[str, ...]
+        self.requires = requires # type: Tuple[str, ...]
+
+
+# every check in run order, prerequisites before their dependents
+CHECKS = [
+    CheckInfo("GPUCheck", "Checking GPU", inputs=("gpu",)),
+    CheckInfo("OpenGLInfoCheck", "Checking OpenGL info", inputs=("opengl",)),
+    CheckInfo("OpenGLContextCheck", "Checking OpenGL context"),
+    CheckInfo(
+        "OpenGLFunctionsLoadCheck",
+        "Checking OpenGL functions loading",
+        inputs=("opengl",),
+        requires=("OpenGLContextCheck",),
+    ),
+    CheckInfo(
+        "OpenGLFunctionsCallCheck",
+        "Checking OpenGL basic function calls",
+        requires=("OpenGLFunctionsLoadCheck",),
+    ),
+    CheckInfo(
+        "RenderCheck",
+        "Checking rendering correctness",
+        requires=("OpenGLFunctionsLoadCheck",),
+    ),
+    CheckInfo("GPUDevicesCheck", "Checking OpenGL on every GPU", inputs=("gpu",)),
+    CheckInfo("KernelLogCheck", "Checking kernel log", inputs=("journal",)),
+    CheckInfo(
+        "PackagesCheck", "Checking installed packages", inputs=("packages", "gpu")
+    ),
+    CheckInfo(
+        "DriverConfigCheck",
+        "Checking driver configuration",
+        inputs=("driver_config", "gpu"),
+    ),
+    CheckInfo(
+        "GPUBenchmarkCheck",
+        "Checking GPU performance",
+        inputs=("gpu", "opengl"),
+        requires=("OpenGLFunctionsLoadCheck",),
+    ),
+    CheckInfo(
+        "FramePacingCheck",
+        "Checking frame pacing",
+        inputs=("opengl",),
+        requires=("OpenGLFunctionsLoadCheck",),
+    ),
+]
+
+CHECKS_BY_NAME = {info.name: info for info in CHECKS} # type: Dict[str, CheckInfo]
+
+# run only when enabled by an option or selected with --only
+OPTIONAL_CHECKS = {
+    "GPUBenchmarkCheck": "benchmark",
+    "FramePacingCheck": "frame_pacing",
+}
+
+
+def find_check(name: str) -> CheckInfo:
+    """Check by name, case-insensitive, the 'Check' suffix is optional."""
+    key = name.lower()
+    for info in CHECKS:
+        full = info.name.lower()
+        if key in (full, full[: -len("check")]):
+            return info
+    raise ValueError(
+        "Unknown check '{}', choose from: {}".format(
+            name, ", ".join(info.name for info in CHECKS)
+        )
+    )
+
+
+def plan_checks(config: Config) -> List[CheckInfo]:
+    """The execution plan: selected checks plus their prerequisites, in run order."""
+    try:
+        only = {find_check(name).name for name in config.only}
+        skip = {find_check(name).name for name in config.skip}
+    except ValueError as e:
+        print(e)
+        exit(2)
+
+    selected = set()
+
+    def select(name: str):
+        if name in selected or name in skip:
+            return
+        selected.add(name)
+        for dep in CHECKS_BY_NAME[name].requires:
+            select(dep)
+
+    for info in CHECKS:
+        if only:
+            if info.name in only:
+                select(info.name)
+        elif info.name not in OPTIONAL_CHECKS or getattr(
+            config, OPTIONAL_CHECKS[info.name]
+        ):
+            select(info.name)
+    return [info for info in CHECKS if info.name in selected]
+
+
+def format_checks(checks: List[CheckInfo]) -> str:
+    lines = []
+    for check in checks:
+        lines.append(
+            " {:<28} {:<36} {:<20} {}".format(
+                check.name,
+                check.label,
+                ", ".join(check.inputs) or "-",
+                ", ".join(check.requires) or "-",
+            )
+        )
+    return "\n".join(lines)
@@ -1,14 +1,58 @@
-from .utils import force_mkdir
+from . import __version__
 import argparse
 import os
 import tempfile
 
+# true only for type checkers, --version imports neither typing nor tool.report
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from .report import ReportWriter
+    from typing import List
+
 
 class Config(object):
     def __init__(self):
         self.report_dir = tempfile.gettempdir() # type: str
         self.temp_dir = tempfile.gettempdir() # type: str
         self.no_clear = False # type: bool
+        self.jobs = 4 # type: int
+        self.cache_dir = os.path.join(
+            os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")),
+            "gfxhealthcheck",
+        ) # type: str
+        self.cache_ttl = 24 * 60 * 60 # type: int
+        self.no_cache = False # type: bool
+        self.history_db = os.path.join(
+            os.environ.get("XDG_DATA_HOME", os.path.expanduser("~/.local/share")),
+            "gfxhealthcheck",
+            "history.sqlite",
+        ) # type: str
+        self.no_history = False # type: bool
+        self.refresh = False # type: bool
+        self.compression = "gz" # type: str
+        self.compression_level = None # type: int
+        self.max_output = 256 * 1024 * 1024 # type: int
+        self.results = None # type: str
+        self.format = "jsonl" # type: str
+        self.quiet = False # type: bool
+        self.profile = False # type: bool
+        self.glxinfo_full = False # type: bool
+        self.benchmark = False # type: bool
+        self.baselines = None # type: str
+        self.benchmark_tolerance = 0.2 # type: float
+        self.frame_pacing = False # type: bool
+        self.frames = 120 # type: int
+        self.render_size = 512 # type: int
+        self.render_mismatch = 0.1 # type: float
+        self.native_timeout = 30.0 # type: float
+        self.backend = "auto" # type: str
+        self.list_checks = False # type: bool
+        self.only = [] # type: List[str]
+        self.skip = [] # type: List[str]
+        self.watch = False # type: bool
+        self.watch_interval = 5.0 # type: float
+        self.socket = None # type: str
+        self.report = None # type: ReportWriter
 
 
 def parse_args() -> Config:
@@ -18,6 +62,24 @@ def parse_args() -> Config:
         description="A tool to collect and analyse different gpu related info and help fix gfx related problems and setup system properly",
         formatter_class=argparse.ArgumentDefaultsHelpFormatter,
     )
+    parser.add_argument("--version", action="version", version="%(prog)s " + __version__)
+    parser.add_argument("--list-checks", action='store_true', help="print the checks that would run with the given options and exit")
+    parser.add_argument(
+        "--only",
+        required=False,
+        nargs="+",
+        metavar="CHECK",
+        default=config.only,
+        help="run only these checks and their prerequisites, see --list-checks",
+    )
+    parser.add_argument(
+        "--skip",
+        required=False,
+        nargs="+",
+        metavar="CHECK",
+        default=config.skip,
+        help="don't run these checks",
+    )
     parser.add_argument(
         "--report-dir",
         required=False,
@@ -33,14 +95,181 @@ def parse_args() -> Config:
         help="directory to store all temporary files",
     )
     parser.add_argument("--no-clear", action='store_true', help="dont clear TEMP_DIR after finish")
+    parser.add_argument(
+        "--jobs",
+        required=False,
+        type=int,
+        default=config.jobs,
+        help="number of info collectors to run in parallel",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        required=False,
+        type=str,
+        default=config.cache_dir,
+        help="directory to cache parsed probe results in",
+    )
+    parser.add_argument(
+        "--cache-ttl",
+        required=False,
+        type=int,
+        default=config.cache_ttl,
+        help="seconds after which cached probe results expire",
+    )
+    parser.add_argument(
+        "--history-db",
+        required=False,
+        type=str,
+        default=config.history_db,
+        help="database every run is appended to and compared against",
+    )
+    parser.add_argument("--no-history", action='store_true', help="dont record the run nor compare it with earlier runs")
+    parser.add_argument(
+        "--compression",
+        required=False,
+        choices=["gz", "xz", "zst"],
+        default=config.compression,
+        help="report archive compression",
+    )
+    parser.add_argument(
+        "--compression-level",
+        required=False,
+        type=int,
+        default=config.compression_level,
+        help="report archive compression level, codec default when omitted",
+    )
+    parser.add_argument(
+        "--max-output",
+        required=False,
+        type=int,
+        default=config.max_output,
+        help="bytes of output to read from a single command at most",
+    )
+    parser.add_argument(
+        "--results",
+        required=False,
+        type=str,
+        default=config.results,
+        help="file to append machine-readable check results to, '-' for stdout",
+    )
+    parser.add_argument(
+        "--format",
+        required=False,
+        choices=["jsonl", "bin"],
+        default=config.format,
+        help="format of the RESULTS file: JSON Lines or zlib-compressed binary frames",
+    )
+    parser.add_argument("--quiet", action='store_true', help="write progress only to the log, never prompt for sudo")
+    parser.add_argument("--profile", action='store_true', help="print timings of checks, commands and native calls, save them into the report")
+    parser.add_argument("--glxinfo-full", action='store_true', help="collect extensions and limits with full `glxinfo -l` instead of `glxinfo -B`")
+    parser.add_argument("--benchmark", action='store_true', help="measure upload/readback bandwidth, draw calls and fill rate")
+    parser.add_argument(
+        "--baselines",
+        required=False,
+        type=str,
+        default=config.baselines,
+        help="json file with expected benchmark results per PCI id or renderer",
+    )
+    parser.add_argument(
+        "--benchmark-tolerance",
+        required=False,
+        type=float,
+        default=config.benchmark_tolerance,
+        help="fraction below baseline reported as a regression",
+    )
+    parser.add_argument("--frame-pacing", action='store_true', help="measure frame times offscreen and, with a display, presented with vsync")
+    parser.add_argument(
+        "--frames",
+        required=False,
+        type=int,
+        default=config.frames,
+        help="frames rendered per pass of --frame-pacing",
+    )
+    parser.add_argument(
+        "--render-size",
+        required=False,
+        type=int,
+        default=config.render_size,
+        help="width and height of the render correctness scenes, a multiple of 8",
+    )
+    parser.add_argument(
+        "--render-mismatch",
+        required=False,
+        type=float,
+        default=config.render_mismatch,
+        help="percent of pixels a scene may differ from its golden image",
+    )
+    parser.add_argument(
+        "--native-timeout",
+        required=False,
+        type=float,
+        default=config.native_timeout,
+        help="seconds a native GL call may take before its worker is killed",
+    )
+    parser.add_argument(
+        "--backend",
+        required=False,
+        choices=["auto", "glx", "egl"],
+        default=config.backend,
+        help="GL context of the checks: GLX window, headless EGL, or auto (EGL when DISPLAY is not set)",
+    )
+    parser.add_argument("--watch", action='store_true', help="keep running and re-run checks affected by driver, package or config changes")
+    parser.add_argument(
+        "--watch-interval",
+        required=False,
+        type=float,
+        default=config.watch_interval,
+        help="seconds between polls of watched paths in --watch mode",
+    )
+    parser.add_argument(
+        "--socket",
+        required=False,
+        type=str,
+        default=config.socket,
+        help="UNIX socket to publish results to in --watch mode",
+    )
+    parser.add_argument("--no-cache", action='store_true', help="dont read or write cached probe results")
+    parser.add_argument("--refresh", action='store_true', help="ignore cached probe results and store fresh ones")
     args = parser.parse_args()
     config.report_dir = args.report_dir
     config.temp_dir = os.path.join(args.temp_dir, "gfx-health-report")
     config.no_clear = args.no_clear
+    config.jobs = max(1, args.jobs)
+    config.cache_dir = args.cache_dir
+    config.cache_ttl = args.cache_ttl
+    config.no_cache = args.no_cache
+    config.refresh = args.refresh
+    config.history_db = args.history_db
+    config.no_history = args.no_history
+    config.compression = args.compression
+    config.compression_level = args.compression_level
+    config.max_output = args.max_output
+    config.results = args.results
+    config.format = args.format
+    config.quiet = args.quiet
+    config.profile = args.profile
+    config.glxinfo_full = args.glxinfo_full
+    config.benchmark = args.benchmark
+    config.baselines = args.baselines
+    config.benchmark_tolerance = args.benchmark_tolerance
+    config.frame_pacing = args.frame_pacing
+    config.frames = max(2, args.frames)
+    config.render_size = max(8, args.render_size // 8 * 8)
+    config.render_mismatch = args.render_mismatch
+    config.native_timeout = args.native_timeout
+    config.backend = args.backend
+    config.list_checks = args.list_checks
+    config.only = args.only
+    config.skip = args.skip
+    config.watch = args.watch
+    config.watch_interval = max(0.1, args.watch_interval)
+    config.socket = args.socket
     return config
 
 
 def create_dirs(config: Config):
+    from .utils import force_mkdir
+
     try:
         dirs = {config.temp_dir}
         for dir in dirs:
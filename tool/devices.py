@@ -0,0 +1,103 @@
+from .lib import Lib
+from typing import List
+import multiprocessing
+import os
+import time
+
+DRM_CLASS_DIR = "/sys/class/drm"
+
+# seconds for enumerating and probing all devices
+PROBE_TIMEOUT = 30
+
+# loaded once in every worker process, never in the parent
+lib = Lib()
+
+
+class DeviceInfo(object):
+    """Result of probing one EGL device, plain values so it can be pickled."""
+
+    def __init__(self, index: int):
+        self.index = index # type: int
+        self.slot = None # type: str
+        self.drm_file = None # type: str
+        self.software = False # type: bool
+        self.code = 0 # type: int
+        self.error = None # type: str
+        self.vendor = None # type: str
+        self.renderer = None # type: str
+        self.version = None # type: str
+        self.glsl_version = None # type: str
+        self.major = 0 # type: int
+        self.minor = 0 # type: int
+        self.rendered = False # type: bool
+
+    @staticmethod
+    def from_probe(index: int, res: Lib.Result, probe: Lib.DeviceProbe) -> "DeviceInfo":
+        info = DeviceInfo(index)
+        info.drm_file = probe.drmFile.decode() or None
+        info.slot = drm_slot(info.drm_file) if info.drm_file else None
+        info.software = bool(probe.software)
+        info.code = res.code
+        info.error = res.message.decode() if res.code != 0 else None
+        info.vendor = probe.vendor.decode()
+        info.renderer = probe.renderer.decode()
+        info.version = probe.version.decode()
+        info.glsl_version = probe.glslVersion.decode()
+        info.major = probe.major
+        info.minor = probe.minor
+        info.rendered = bool(probe.rendered)
+        return info
+
+
+def drm_slot(drm_file: str) -> str:
+    """PCI slot of a `/dev/dri/cardN` node, formatted like `GpuInfo.slot`."""
+    device = os.path.join(DRM_CLASS_DIR, os.path.basename(drm_file), "device")
+    if not os.path.exists(os.path.join(device, "vendor")):
+        return None
+    slot = os.path.basename(os.path.realpath(device))
+    if slot.startswith("0000:"):
+        slot = slot[len("0000:") :]
+    return slot
+
+
+def worker_lib() -> Lib:
+    if lib.lib is None:
+        lib.load()
+    return lib
+
+
+def count_devices() -> int:
+    return worker_lib().eglDeviceCount()
+
+
+def probe_device(index: int) -> DeviceInfo:
+    res, probe = worker_lib().probeEglDevice(index)
+    return DeviceInfo.from_probe(index, res, probe)
+
+
+def probe_devices(jobs: int, timeout: float = PROBE_TIMEOUT) -> List[DeviceInfo]:
+    """Probes every EGL device in its own context, in parallel worker processes.
+
+    Every process gets its own GL function pointers and driver state, so
+    devices don't interfere with each other nor with the checks' GLX session.
+    A device that doesn't answer before the deadline is reported as failed.
+    """
+    deadline = time.monotonic() + timeout
+    pool = multiprocessing.get_context("spawn").Pool(processes=jobs)
+    try:
+        count = pool.apply_async(count_devices).get(timeout)
+        if count < 0:
+            raise RuntimeError("EGL device enumeration is not supported")
+        pending = [(i, pool.apply_async(probe_device, (i,))) for i in range(count)]
+        devices = []
+        for index, result in pending:
+            try:
+                devices.append(result.get(max(0.0, deadline - time.monotonic())))
+            except multiprocessing.TimeoutError:
+                device = DeviceInfo(index)
+                device.code = -1
+                device.error = "EGL device probe timed out after {}s".format(timeout)
+                devices.append(device)
+        return devices
+    finally:
+        pool.terminate()
@@ -0,0 +1,236 @@
+from typing import Dict, Iterable, List, Tuple
+import os
+import re
+import shlex
+
+# searched in this order, a file name found in an earlier directory hides the
+# same name in later ones, like kmod does
+MODPROBE_DIRS = [
+    "etc/modprobe.d",
+    "run/modprobe.d",
+    "usr/local/lib/modprobe.d",
+    "usr/lib/modprobe.d",
+    "lib/modprobe.d",
+]
+KERNEL_CMDLINE = "proc/cmdline"
+
+XORG_CONF = "etc/X11/xorg.conf"
+XORG_CONF_DIRS = ["etc/X11/xorg.conf.d", "usr/share/X11/xorg.conf.d"]
+
+# kernel modules an Xorg video driver can run on, drivers not listed here
+# (modesetting, fbdev, vesa) work on top of any kernel driver
+XORG_KERNEL_MODULES = {
+    "amdgpu": ("amdgpu",),
+    "ati": ("radeon", "amdgpu"),
+    "intel": ("i915",),
+    "nouveau": ("nouveau",),
+    "nvidia": ("nvidia",),
+    "qxl": ("qxl",),
+    "radeon": ("radeon",),
+    "vmware": ("vmwgfx",),
+}
+
+# fbdev modules distributions blacklist by default, never the one a GPU needs
+FRAMEBUFFER_MODULES = ("nvidiafb", "rivafb", "radeonfb", "intelfb", "i810fb")
+
+# `install <module> /bin/false` and similar keep a module from ever loading
+DISABLING_COMMANDS = ("false", "true")
+
+BUS_ID_RE = re.compile(r"^PCI:(\d+)(?:@(\d+))?:(\d+):(\d+)$", re.IGNORECASE)
+
+
+def module_name(name: str) -> str:
+    """kmod treats dashes and underscores in module names the same."""
+    return name.replace("-", "_")
+
+
+def bus_id_slot(bus_id: str) -> str:
+    """Xorg `PCI:9:0:0` BusID (decimal) as a `GpuInfo.slot` like `09:00.0`."""
+    match = BUS_ID_RE.match(bus_id.strip())
+    if match is None:
+        return None
+    bus, domain, device, function = match.groups()
+    slot = "{:02x}:{:02x}.{:x}".format(int(bus), int(device), int(function))
+    if domain is not None and int(domain) != 0:
+        slot = "{:04x}:{}".format(int(domain), slot)
+    return slot
+
+
+class XorgDevice(object):
+    def __init__(self, source: str):
+        self.source = source # type: str
+        self.identifier = None # type: str
+        self.driver = None # type: str
+        self.slot = None # type: str
+
+
+class DriverConfig(object):
+    """Index of modprobe.d and Xorg configuration, keyed by module and PCI slot.
+
+    Sources are `file:line` strings, so findings point at the line to edit.
+    """
+
+    def __init__(self):
+        self.files = [] # type: List[str]
+        self.blacklisted = {} # type: Dict[str, str]
+        self.disabled = {} # type: Dict[str, str]
+        self.installs = {} # type: Dict[str, Tuple[str, str]]
+        self.options = {} # type: Dict[str, List[Tuple[str, str]]]
+        self.aliases = {} # type: Dict[str, List[Tuple[str, str]]]
+        self.xorg_devices = [] # type: List[XorgDevice]
+        self.xorg_by_slot = {} # type: Dict[str, XorgDevice]
+        self.xorg_unbound = [] # type: List[XorgDevice]
+
+    def blacklist_source(self, module: str) -> str:
+        """Where a module is blacklisted or disabled by an install command."""
+        module = module_name(module)
+        return self.disabled.get(module) or self.blacklisted.get(module)
+
+    def module_options(self, module: str) -> List[Tuple[str, str]]:
+        return self.options.get(module_name(module), [])
+
+    def xorg_device(self, slot: str) -> XorgDevice:
+        """Device section bound to `slot` by BusID, or the only one without BusID."""
+        device = self.xorg_by_slot.get(slot)
+        if device is not None:
+            return device
+        return self.xorg_unbound[0] if len(self.xorg_unbound) == 1 else None
+
+    def add_modprobe_line(self, words: List[str], source: str):
+        if len(words) < 2:
+            return
+        command, name = words[0], words[1]
+        if command == "blacklist":
+            self.blacklisted.setdefault(module_name(name), source)
+        elif command == "install":
+            # only the first install command of a module is used
+            module = module_name(name)
+            if module not in self.installs:
+                self.installs[module] = (" ".join(words[2:]), source)
+                program = os.path.basename(words[2]) if len(words) > 2 else ""
+                if program in DISABLING_COMMANDS and len(words) == 3:
+                    self.disabled.setdefault(module, source)
+        elif command == "options":
+            opts = " ".join(words[2:])
+            self.options.setdefault(module_name(name), []).append((opts, source))
+        elif command == "alias" and len(words) > 2:
+            self.aliases.setdefault(name, []).append((module_name(words[2]), source))
+
+    def add_cmdline(self, cmdline: str, source: str):
+        for arg in cmdline.split():
+            key, _, value = arg.partition("=")
+            if key in ("modprobe.blacklist", "module_blacklist"):
+                for name in value.split(","):
+                    if name:
+                        self.disabled.setdefault(module_name(name), source)
+
+    def add_xorg_device(self, device: XorgDevice):
+        self.xorg_devices.append(device)
+        if not device.driver:
+            return
+        if device.slot is not None:
+            self.xorg_by_slot.setdefault(device.slot, device)
+        else:
+            self.xorg_unbound.append(device)
+
+    @staticmethod
+    def from_root(root: str = "/") -> "DriverConfig":
+        """Reads every config file under `root` once, a fixture tree works too."""
+        config = DriverConfig()
+        for path in modprobe_files(root):
+            config.files.append(path)
+            for words, line in config_lines(path):
+                config.add_modprobe_line(words, "{}:{}".format(path, line))
+        cmdline = os.path.join(root, KERNEL_CMDLINE)
+        try:
+            with open(cmdline) as f:
+                config.add_cmdline(f.read(), cmdline)
+        except OSError:
+            pass
+        for path in xorg_files(root):
+            config.files.append(path)
+            for device in xorg_devices(path):
+                config.add_xorg_device(device)
+        return config
+
+
+def list_conf_files(directory: str) -> List[str]:
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return []
+    return sorted(n for n in names if n.endswith(".conf"))
+
+
+def modprobe_files(root: str) -> List[str]:
+    """modprobe.d files in the order kmod reads them: by file name across all
+    directories, earlier directories hiding later ones."""
+    paths = {} # type: Dict[str, str]
+    for directory in MODPROBE_DIRS:
+        directory = os.path.join(root, directory)
+        for name in list_conf_files(directory):
+            paths.setdefault(name, os.path.join(directory, name))
+    return [paths[name] for name in sorted(paths)]
+
+
+def xorg_files(root: str) -> List[str]:
+    paths = [os.path.join(root, XORG_CONF)]
+    for directory in XORG_CONF_DIRS:
+        directory = os.path.join(root, directory)
+        paths.extend(os.path.join(directory, n) for n in list_conf_files(directory))
+    return [p for p in paths if os.path.isfile(p)]
+
+
+def config_lines(path: str) -> Iterable[Tuple[List[str], int]]:
+    """Words of each logical line, `\\` continues lines, `#` starts comments."""
+    try:
+        with open(path, errors="replace") as f:
+            pending = ""
+            start = 0
+            for number, line in enumerate(f, 1):
+                line = line.rstrip("\n")
+                if not pending:
+                    start = number
+                if line.endswith("\\"):
+                    pending += line[:-1] + " "
+                    continue
+                line = (pending + line).split("#", 1)[0]
+                pending = ""
+                if line.strip():
+                    yield line.split(), start
+    except OSError:
+        return
+
+
+def xorg_devices(path: str) -> List[XorgDevice]:
+    """Device sections of an Xorg config file."""
+    devices = []
+    device = None
+    try:
+        with open(path, errors="replace") as f:
+            for number, line in enumerate(f, 1):
+                try:
+                    words = shlex.split(line, comments=True)
+                except ValueError:
+                    continue
+                if not words:
+                    continue
+                key = words[0].lower()
+                if key == "section" and len(words) > 1:
+                    if words[1].lower() == "device":
+                        device = XorgDevice("{}:{}".format(path, number))
+                elif key == "endsection":
+                    if device is not None:
+                        devices.append(device)
+                    device = None
+                elif device is not None and len(words) > 1:
+                    if key == "identifier":
+                        device.identifier = words[1]
+                    elif key == "driver":
+                        device.driver = words[1]
+                        device.source = "{}:{}".format(path, number)
+                    elif key == "busid":
+                        device.slot = bus_id_slot(words[1])
+    except OSError:
+        pass
+    return devices
@@ -0,0 +1,264 @@
+from .logging import TextColor
+from .results import read_results
+from .utils import local_path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+import argparse
+import os
+import shlex
+import subprocess
+import sys
+import tempfile
+
+
+class Transport(object):
+    """Runs `gfxhealthcheck.py` with the given arguments on a host."""
+
+    def command(self, host: str, args: List[str]) -> List[str]:
+        raise NotImplementedError("Subclasses must implement command()")
+
+    def run(
+        self, host: str, args: List[str], timeout: float
+    ) -> subprocess.CompletedProcess:
+        return subprocess.run(
+            self.command(host, args),
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+            timeout=timeout,
+        )
+
+
+class LocalTransport(Transport):
+    """Runs every host locally, each one in its own temp, report and cache
+    directory. The runs keep no history, the fleet records it per host."""
+
+    def __init__(self):
+        self.work_dir = tempfile.mkdtemp(prefix="ghc_fleet_")
+
+    def command(self, host: str, args: List[str]) -> List[str]:
+        host_dir = os.path.join(self.work_dir, host)
+        os.makedirs(host_dir, exist_ok=True)
+        return [
+            sys.executable,
+            local_path("gfxhealthcheck.py"),
+            "--temp-dir",
+            host_dir,
+            "--report-dir",
+            host_dir,
+            "--cache-dir",
+            os.path.join(host_dir, "cache"),
+            "--no-history",
+            *args,
+        ]
+
+
+class SshTransport(Transport):
+    def __init__(self, remote_path: str, ssh_options: List[str] = ()):
+        self.remote_path = remote_path # type: str
+        self.ssh_options = list(ssh_options) # type: List[str]
+
+    def command(self, host: str, args: List[str]) -> List[str]:
+        remote = " ".join(
+            shlex.quote(x) for x in ["python3", self.remote_path, *args]
+        )
+        return ["ssh", "-o", "BatchMode=yes", *self.ssh_options, host, remote]
+
+
+class HostResult(object):
+    def __init__(self, host: str):
+        self.host = host # type: str
+        self.checks = [] # type: List[dict]
+        self.record = None # type: dict
+        self.error = None # type: str
+
+    def is_ok(self) -> bool:
+        return self.error is None and all(not c["messages"] for c in self.checks)
+
+
+def check_host(
+    transport: Transport, host: str, args: List[str], timeout: float
+) -> HostResult:
+    result = HostResult(host)
+    try:
+        proc = transport.run(
+            host, [*args, "--quiet", "--results", "-", "--format", "jsonl"], timeout
+        )
+        records = read_results(proc.stdout.encode())
+        if records:
+            result.record = records[-1]
+            result.checks = records[-1]["checks"]
+        else:
+            stderr = proc.stderr.strip().splitlines()
+            result.error = "no results, exit code {}: {}".format(
+                proc.returncode, stderr[-1] if stderr else ""
+            )
+    except subprocess.TimeoutExpired:
+        result.error = "timed out after {} seconds".format(timeout)
+    except Exception as e:
+        result.error = str(e)
+    return result
+
+
+def run_fleet(
+    transport: Transport,
+    hosts: List[str],
+    args: List[str],
+    jobs: int,
+    timeout: float,
+) -> List[HostResult]:
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = [
+            executor.submit(check_host, transport, host, args, timeout)
+            for host in hosts
+        ]
+        return [f.result() for f in futures]
+
+
+def format_fleet_summary(results: List[HostResult]) -> str:
+    failed = {} # type: Dict[str, List[str]]
+    warned = {} # type: Dict[str, List[str]]
+    messages = {} # type: Dict[str, Dict[tuple, List[str]]]
+    labels = [] # type: List[str]
+    for result in results:
+        for check in result.checks:
+            label = check["label"]
+            if label not in labels:
+                labels.append(label)
+            kinds = {msg[0] for msg in check["messages"]}
+            if "fail" in kinds:
+                failed.setdefault(label, []).append(result.host)
+            elif kinds:
+                warned.setdefault(label, []).append(result.host)
+            for msg in check["messages"]:
+                by_message = messages.setdefault(label, {})
+                by_message.setdefault(tuple(msg), []).append(result.host)
+
+    unreachable = [r for r in results if r.error is not None]
+    ok = sum(1 for r in results if r.is_ok())
+    lines = [
+        " {} hosts: {} ok, {} with problems, {} unreachable".format(
+            len(results), ok, len(results) - ok - len(unreachable), len(unreachable)
+        )
+    ]
+    for label in labels:
+        n_failed, n_warned = len(failed.get(label, [])), len(warned.get(label, []))
+        if n_failed:
+            icon = TextColor.red("❌")
+        elif n_warned:
+            icon = TextColor.yellow("⚠️")
+        else:
+            icon = TextColor.green("✔")
+        lines.append(
+            " {}  {}: {} failed, {} warned".format(icon, label, n_failed, n_warned)
+        )
+        by_message = messages.get(label, {})
+        for msg, hosts in sorted(by_message.items(), key=lambda x: -len(x[1])):
+            lines.append(
+                "     ↳ {} x{} {} ({})".format(
+                    msg[0], len(hosts), msg[1], ", ".join(sorted(hosts))
+                )
+            )
+    for result in unreachable:
+        lines.append(
+            " {}  {}: {}".format(TextColor.red("❌"), result.host, result.error)
+        )
+    return "\n".join(lines)
+
+
+def record_fleet_history(path: str, results: List[HostResult]):
+    """Appends host records to the history and prints their regressions.
+
+    Records are keyed by the fleet host, not the hostname they report, which
+    is the same for every host of a `LocalTransport`.
+    """
+    from .history import HistoryStore, diff_records
+
+    with HistoryStore(path) as store:
+        for result in results:
+            if result.record is None:
+                continue
+            record = dict(result.record, host=result.host)
+            _, previous = store.last_good(record["host"], record["time"])
+            store.add(record)
+            if previous is None:
+                continue
+            for kind, message in diff_records(previous, record):
+                if kind == "warn":
+                    print(
+                        " {}  {}: {}".format(
+                            TextColor.yellow("⚠️"), result.host, message
+                        )
+                    )
+
+
+def parse_fleet_args(argv: List[str]):
+    parser = argparse.ArgumentParser(
+        prog="GfxHealthCheck fleet",
+        description="Run the health check on many hosts and aggregate the results",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("hosts", nargs="*", help="hosts to check")
+    parser.add_argument("--hosts-file", type=str, help="file with one host per line")
+    parser.add_argument(
+        "--transport",
+        choices=["local", "ssh"],
+        default="local",
+        help="how to reach hosts, 'local' runs every host on this machine",
+    )
+    parser.add_argument(
+        "--remote-path",
+        type=str,
+        default="gfxhealthcheck/gfxhealthcheck.py",
+        help="path to gfxhealthcheck.py on remote hosts",
+    )
+    parser.add_argument(
+        "--jobs", type=int, default=16, help="hosts to check concurrently"
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=300, help="seconds to wait for a single host"
+    )
+    parser.add_argument(
+        "--history-db",
+        type=str,
+        help="append every host's results to this history database",
+    )
+    parser.epilog = "arguments after '--' are passed to every run"
+    return parser.parse_args(argv)
+
+
+def main():
+    argv = sys.argv[1:]
+    extra = [] # type: List[str]
+    if "--" in argv:
+        extra = argv[argv.index("--") + 1 :]
+        argv = argv[: argv.index("--")]
+    args = parse_fleet_args(argv)
+    hosts = list(args.hosts)
+    if args.hosts_file:
+        with open(args.hosts_file) as f:
+            for line in f:
+                if line.strip() and not line.startswith("#"):
+                    hosts.append(line.strip())
+    if not hosts:
+        print("No hosts given")
+        exit(1)
+
+    if args.transport == "ssh":
+        transport = SshTransport(args.remote_path)
+    else:
+        transport = LocalTransport()
+
+    TextColor.enable()
+    results = run_fleet(transport, hosts, extra, max(1, args.jobs), args.timeout)
+    print(format_fleet_summary(results))
+    if args.history_db:
+        record_fleet_history(args.history_db, results)
+    if isinstance(transport, LocalTransport):
+        print("reports: {}".format(transport.work_dir))
+    exit(0 if all(r.is_ok() for r in results) else 2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,396 @@
+from .config import Config
+from .logging import TextColor
+from .results import load_results
+from typing import List, Tuple
+import argparse
+import json
+import os
+import sqlite3
+import time
+import zlib
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    host TEXT NOT NULL,
+    time REAL NOT NULL,
+    status TEXT NOT NULL,
+    kernel TEXT,
+    renderer TEXT,
+    gl_major INTEGER,
+    gl_minor INTEGER,
+    record BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_host_time ON runs (host, time);
+CREATE TABLE IF NOT EXISTS gpus (
+    run_id INTEGER NOT NULL,
+    slot TEXT NOT NULL,
+    pci_id TEXT,
+    driver TEXT,
+    PRIMARY KEY (run_id, slot)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS gpus_pci_id ON gpus (pci_id, run_id);
+CREATE TABLE IF NOT EXISTS checks (
+    run_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    status TEXT NOT NULL,
+    duration REAL,
+    PRIMARY KEY (run_id, name)
+) WITHOUT ROWID;
+"""
+
+STATUS_ORDER = ["skip", "ok", "warn", "fail"]
+
+SOFTWARE_RENDERERS = ("llvmpipe", "softpipe", "swrast")
+
+# a check slowed down when it takes SLOWDOWN_FACTOR times and SLOWDOWN_MIN s longer
+SLOWDOWN_FACTOR = 2.0
+SLOWDOWN_MIN = 0.5
+
+
+def run_status(record: dict) -> str:
+    statuses = [check["status"] for check in record["checks"]]
+    return max(statuses, key=STATUS_ORDER.index, default="ok")
+
+
+def pci_id(gpu: dict) -> str:
+    if gpu.get("vendor_id") is None or gpu.get("device_id") is None:
+        return None
+    return "{:04x}:{:04x}".format(gpu["vendor_id"], gpu["device_id"])
+
+
+def gl_version(record: dict) -> Tuple[int, int]:
+    gl = record["system"].get("opengl") or {}
+    version = gl.get("version") or {}
+    if version.get("major") is None or version.get("minor") is None:
+        return None
+    return version["major"], version["minor"]
+
+
+def renderer(record: dict) -> str:
+    gl = record["system"].get("opengl") or {}
+    return gl.get("renderer")
+
+
+def is_software(renderer: str) -> bool:
+    return any(name in renderer.lower() for name in SOFTWARE_RENDERERS)
+
+
+class HistoryStore(object):
+    """Append-only SQLite store of run records.
+
+    Runs are indexed by host and time, GPUs by PCI id, so finding the last
+    good run of a host or the runs of one GPU model doesn't scan the history.
+    Full records are kept zlib-compressed next to the indexed columns.
+    """
+
+    def __init__(self, path: str):
+        self.path = path # type: str
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path, timeout=10)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+
+    def __enter__(self) -> "HistoryStore":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def add(self, record: dict) -> int:
+        version = gl_version(record) or (None, None)
+        with self.db:
+            cursor = self.db.execute(
+                "INSERT INTO runs"
+                " (host, time, status, kernel, renderer, gl_major, gl_minor, record)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    record["host"],
+                    record["time"],
+                    run_status(record),
+                    record["system"].get("os_version"),
+                    renderer(record),
+                    version[0],
+                    version[1],
+                    zlib.compress(json.dumps(record, separators=(",", ":")).encode()),
+                ),
+            )
+            run_id = cursor.lastrowid
+            self.db.executemany(
+                "INSERT OR IGNORE INTO gpus (run_id, slot, pci_id, driver)"
+                " VALUES (?, ?, ?, ?)",
+                [
+                    (run_id, gpu["slot"], pci_id(gpu), gpu.get("kernel_module_in_use"))
+                    for gpu in record["system"].get("gpus") or []
+                    if gpu.get("slot") is not None
+                ],
+            )
+            self.db.executemany(
+                "INSERT OR IGNORE INTO checks (run_id, name, status, duration)"
+                " VALUES (?, ?, ?, ?)",
+                [
+                    (run_id, check["name"], check["status"], check["duration"])
+                    for check in record["checks"]
+                ],
+            )
+        return run_id
+
+    def record(self, run_id: int) -> dict:
+        row = self.db.execute(
+            "SELECT record FROM runs WHERE id = ?", (run_id,)
+        ).fetchone()
+        return None if row is None else json.loads(zlib.decompress(row[0]).decode())
+
+    def last_good(self, host: str, before: float = None) -> Tuple[int, dict]:
+        """Latest run of `host` without failed checks, older than `before`."""
+        row = self.db.execute(
+            "SELECT id, record FROM runs"
+            " WHERE host = ? AND time < ? AND status != 'fail'"
+            " ORDER BY time DESC LIMIT 1",
+            (host, time.time() + 1 if before is None else before),
+        ).fetchone()
+        if row is None:
+            return None, None
+        return row["id"], json.loads(zlib.decompress(row["record"]).decode())
+
+    def runs(
+        self, host: str = None, pci_id: str = None, limit: int = 20
+    ) -> List[sqlite3.Row]:
+        """Latest runs, newest first, optionally of one host or GPU PCI id."""
+        query = (
+            "SELECT id, host, time, status, kernel, renderer, gl_major, gl_minor,"
+            " (SELECT group_concat(slot || ' ' || ifnull(driver, '-'), ', ')"
+            "  FROM gpus WHERE run_id = runs.id) AS gpus"
+            " FROM runs"
+        )
+        where, params = [], [] # type: List[str], list
+        if host is not None:
+            where.append("host = ?")
+            params.append(host)
+        if pci_id is not None:
+            where.append("id IN (SELECT run_id FROM gpus WHERE pci_id = ?)")
+            params.append(pci_id.lower())
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += " ORDER BY time DESC LIMIT ?"
+        params.append(limit)
+        return self.db.execute(query, params).fetchall()
+
+    def close(self):
+        self.db.close()
+
+
+def diff_records(previous: dict, current: dict) -> List[Tuple[str, str]]:
+    """Changes from a good run to the current one, 'warn' for regressions."""
+    changes = [] # type: List[Tuple[str, str]]
+    prev_sys, cur_sys = previous["system"], current["system"]
+    if prev_sys.get("os_version") != cur_sys.get("os_version"):
+        changes.append(
+            (
+                "info",
+                "Kernel changed: {} -> {}".format(
+                    prev_sys.get("os_version"), cur_sys.get("os_version")
+                ),
+            )
+        )
+
+    prev_gpus = {g["slot"]: g for g in prev_sys.get("gpus") or []}
+    cur_gpus = {g["slot"]: g for g in cur_sys.get("gpus") or []}
+    for slot in sorted(set(prev_gpus) | set(cur_gpus)):
+        prev, cur = prev_gpus.get(slot), cur_gpus.get(slot)
+        if cur is None:
+            message = "GPU {} '{}' is gone".format(slot, prev["description"])
+            changes.append(("warn", message))
+        elif prev is None:
+            message = "GPU {} '{}' appeared".format(slot, cur["description"])
+            changes.append(("info", message))
+        elif pci_id(prev) != pci_id(cur):
+            changes.append(
+                (
+                    "warn",
+                    "GPU {} replaced: {} -> {}".format(slot, pci_id(prev), pci_id(cur)),
+                )
+            )
+        elif prev.get("kernel_module_in_use") != cur.get("kernel_module_in_use"):
+            changes.append(
+                (
+                    "warn",
+                    "GPU {} driver changed: {} -> {}".format(
+                        slot,
+                        prev.get("kernel_module_in_use"),
+                        cur.get("kernel_module_in_use"),
+                    ),
+                )
+            )
+
+    prev_renderer, cur_renderer = renderer(previous), renderer(current)
+    if prev_renderer and cur_renderer and prev_renderer != cur_renderer:
+        if is_software(cur_renderer) and not is_software(prev_renderer):
+            changes.append(
+                (
+                    "warn",
+                    "Renderer dropped to software: '{}', was '{}'".format(
+                        cur_renderer, prev_renderer
+                    ),
+                )
+            )
+        else:
+            changes.append(
+                (
+                    "info",
+                    "Renderer changed: '{}' -> '{}'".format(
+                        prev_renderer, cur_renderer
+                    ),
+                )
+            )
+
+    prev_version, cur_version = gl_version(previous), gl_version(current)
+    if prev_version is not None and (cur_version is None or cur_version < prev_version):
+        changes.append(
+            (
+                "warn",
+                "OpenGL version downgraded: {}.{} -> {}".format(
+                    prev_version[0],
+                    prev_version[1],
+                    "{}.{}".format(*cur_version) if cur_version else "unknown",
+                ),
+            )
+        )
+
+    prev_checks = {c["name"]: c for c in previous["checks"]}
+    for check in current["checks"]:
+        prev = prev_checks.get(check["name"])
+        if prev is None:
+            continue
+        if check["status"] == "fail" and prev["status"] != "fail":
+            changes.append(("warn", "{} started failing".format(check["label"])))
+        before, after = prev["duration"], check["duration"]
+        if before is not None and after is not None:
+            if after > before * SLOWDOWN_FACTOR and after - before > SLOWDOWN_MIN:
+                changes.append(
+                    (
+                        "warn",
+                        "{} slowed down: {:.2f}s -> {:.2f}s".format(
+                            check["label"], before, after
+                        ),
+                    )
+                )
+    return changes
+
+
+def format_changes(
+    previous_id: int, previous: dict, changes: List[Tuple[str, str]]
+) -> str:
+    lines = [
+        " Changes since the last good run #{} at {}:".format(
+            previous_id,
+            time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(previous["time"])),
+        )
+    ]
+    for kind, message in changes:
+        icon = TextColor.yellow("⚠️") if kind == "warn" else "•"
+        lines.append("     ↳ {} {}".format(icon, message))
+    return "\n".join(lines)
+
+
+def record_history(config: Config, record: dict) -> List[Tuple[str, str]]:
+    """Appends `record` to the history and prints changes since the last good run."""
+    try:
+        with HistoryStore(config.history_db) as store:
+            previous_id, previous = store.last_good(record["host"], record["time"])
+            store.add(record)
+    except (OSError, sqlite3.Error) as e:
+        print("Failed to update history {}: {}".format(config.history_db, e))
+        return []
+    if previous is None:
+        return []
+
+    changes = diff_records(previous, record)
+    if changes:
+        text = format_changes(previous_id, previous, changes)
+        print(text)
+        if config.report is not None:
+            config.report.add_text("history.txt", text)
+    return changes
+
+
+def format_runs(runs: List[sqlite3.Row]) -> str:
+    lines = []
+    for run in runs:
+        lines.append(
+            " #{:<6} {}  {:<16} {:<5} {:<5} {:<40} {}".format(
+                run["id"],
+                time.strftime("%Y-%m-%d %H:%M", time.localtime(run["time"])),
+                run["host"][:16],
+                run["status"],
+                "{}.{}".format(run["gl_major"], run["gl_minor"])
+                if run["gl_major"] is not None
+                else "-",
+                (run["renderer"] or "-")[:40],
+                run["gpus"] or "-",
+            )
+        )
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m tool.history",
+        description="Query the history of health check runs",
+    )
+    parser.add_argument(
+        "--db", type=str, default=Config().history_db, help="history database"
+    )
+    commands = parser.add_subparsers(dest="command")
+    log = commands.add_parser("log", help="list latest runs")
+    log.add_argument("--host", type=str, help="only runs of this host")
+    log.add_argument("--pci-id", type=str, help="only runs with this GPU, vvvv:dddd")
+    log.add_argument("--limit", type=int, default=20)
+    diff = commands.add_parser(
+        "diff", help="compare a run with the last good one before it"
+    )
+    diff.add_argument(
+        "run", type=int, nargs="?", help="run id, the latest when omitted"
+    )
+    append = commands.add_parser("import", help="append records from --results files")
+    append.add_argument("files", nargs="+")
+    args = parser.parse_args()
+
+    TextColor.enable()
+    with HistoryStore(args.db) as store:
+        if args.command == "import":
+            count = 0
+            for path in args.files:
+                for record in load_results(path):
+                    store.add(record)
+                    count += 1
+            print("imported {} runs".format(count))
+        elif args.command == "diff":
+            if args.run is None:
+                runs = store.runs(limit=1)
+                if not runs:
+                    print("history is empty")
+                    exit(1)
+                args.run = runs[0]["id"]
+            record = store.record(args.run)
+            if record is None:
+                print("no run #{}".format(args.run))
+                exit(1)
+            previous_id, previous = store.last_good(record["host"], record["time"])
+            if previous is None:
+                print("no good run of {} before #{}".format(record["host"], args.run))
+                exit(1)
+            changes = diff_records(previous, record)
+            if changes:
+                print(format_changes(previous_id, previous, changes))
+            else:
+                print(" no changes")
+        else:
+            print(format_runs(store.runs(args.host, args.pci_id, args.limit)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+from typing import Dict, List
+import re
+
+
+class Signature(object):
+    def __init__(self, name: str, level: str, message: str, pattern: str):
+        self.name = name # type: str
+        self.level = level # type: str
+        self.message = message # type: str
+        self.pattern = pattern # type: str
+
+
+# patterns must not contain capturing groups, they are merged into one regex
+SIGNATURES = [
+    Signature(
+        "gpu_off_bus", "fail", "GPU has fallen off the bus", r"GPU has fallen off the bus"
+    ),
+    Signature("nvidia_xid", "warn", "NVIDIA Xid error", r"NVRM: Xid \(.*?\): \d+"),
+    Signature(
+        "gpu_hang",
+        "warn",
+        "GPU hang",
+        r"GPU HANG|[Gg][Pp][Uu] hang|ring \S+ timeout|GPU reset begin",
+    ),
+    Signature(
+        "fence_timeout",
+        "warn",
+        "DRM fence timeout",
+        r"[Ff]ence fallback timer expired|flip_done timed out|fence.{0,40}timed? ?out",
+    ),
+    Signature(
+        "nouveau_fault",
+        "warn",
+        "nouveau fault",
+        r"nouveau \S+: (?:fifo|gr|mmu|DRM): .*?(?:fault|TRAP|error|failed)",
+    ),
+    Signature(
+        "amdgpu_fault",
+        "warn",
+        "amdgpu fault",
+        r"amdgpu \S+: .*?(?:page fault|PROTECTION_FAULT|GPU fault)",
+    ),
+    Signature(
+        "firmware_load",
+        "warn",
+        "GPU firmware load failure",
+        r"Direct firmware load for \S+ failed|[Ff]ailed to load firmware",
+    ),
+]
+
+# `[  123.456789] ...` from dmesg and journalctl -o short-monotonic
+TIMESTAMP_RE = re.compile(r"\[\s*(\d+\.\d+)\]")
+
+SAMPLE_LIMIT = 200
+
+
+class SignatureStats(object):
+    def __init__(self, signature: Signature):
+        self.signature = signature # type: Signature
+        self.count = 0 # type: int
+        self.first_time = None # type: str
+        self.last_time = None # type: str
+        self.sample = None # type: str
+
+
+class KernelLogAnalyzer(object):
+    """Matches kernel log lines against all signatures with one combined regex.
+
+    Only counters, timestamps and the first matching line of every signature
+    are kept, so memory does not depend on the log size.
+    """
+
+    def __init__(self, signatures: List[Signature] = SIGNATURES):
+        self.signatures = {s.name: s for s in signatures} # type: Dict[str, Signature]
+        self.regex = re.compile(
+            "|".join("(?P<{}>{})".format(s.name, s.pattern) for s in signatures)
+        )
+        self.stats = {} # type: Dict[str, SignatureStats]
+        self.lines = 0 # type: int
+
+    def feed(self, line: str) -> bool:
+        """Analyzes one line, returns False so `Capture` doesn't keep it."""
+        self.lines += 1
+        match = self.regex.search(line)
+        if match is None:
+            return False
+
+        stats = self.stats.get(match.lastgroup)
+        if stats is None:
+            stats = SignatureStats(self.signatures[match.lastgroup])
+            stats.sample = line.strip()[:SAMPLE_LIMIT]
+            self.stats[match.lastgroup] = stats
+        stats.count += 1
+        timestamp = TIMESTAMP_RE.match(line)
+        if timestamp is not None:
+            stats.last_time = timestamp.group(1)
+            if stats.first_time is None:
+                stats.first_time = stats.last_time
+        return False
+
+    def found(self) -> List[SignatureStats]:
+        order = list(self.signatures)
+        return sorted(
+            self.stats.values(), key=lambda s: order.index(s.signature.name)
+        )
@@ -1,6 +1,70 @@
+from .profile import profiled
 from .utils import local_path
-from typing import Tuple
+from typing import Any, List, Tuple
 import ctypes
+import os
+
+
+class NativeError(RuntimeError):
+    """A native call crashed or ran out of time."""
+
+
+GL_ERRORS = {
+    0x0500: "GL_INVALID_ENUM",
+    0x0501: "GL_INVALID_VALUE",
+    0x0502: "GL_INVALID_OPERATION",
+    0x0503: "GL_STACK_OVERFLOW",
+    0x0504: "GL_STACK_UNDERFLOW",
+    0x0505: "GL_OUT_OF_MEMORY",
+    0x0506: "GL_INVALID_FRAMEBUFFER_OPERATION",
+}
+
+# native calls creating, loading and destroying the context of each backend
+BACKENDS = {
+    "glx": ("createGlxContext", "gladLoadFunctions", "destroyGlxContext"),
+    "egl": ("createEglContext", "gladLoadEglFunctions", "destroyEglContext"),
+}
+
+
+def resolve_backend(backend: str) -> str:
+    """`auto` is GLX on an X display and headless EGL without one."""
+    if backend == "auto":
+        return "glx" if os.environ.get("DISPLAY") else "egl"
+    return backend
+
+
+GL_PROBE_STRING_SIZE = 256
+GL_PROBE_MAX_ERRORS = 64
+GL_PROBE_LOG_SIZE = 512
+GL_PROBE_TEXT_SIZE = 128
+
+# GlProbe limits, named like glGetIntegerv enums
+GL_PROBE_LIMITS = [
+    "maxTextureSize",
+    "max3DTextureSize",
+    "maxCubeMapTextureSize",
+    "maxRenderbufferSize",
+    "maxViewportDims",
+    "maxSamples",
+    "maxColorAttachments",
+    "maxDrawBuffers",
+    "maxVertexAttribs",
+    "maxTextureImageUnits",
+    "maxUniformBlockSize",
+    "maxShaderStorageBlockSize",
+    "maxComputeWorkGroupInvocations",
+]
+
+
+class GlProbeError(ctypes.Structure):
+    """Failed statement of the basic function test, `error` is 0 for shader
+    compile and link failures."""
+
+    _fields_ = [
+        ("statement", ctypes.c_int),
+        ("error", ctypes.c_uint),
+        ("text", ctypes.c_char * GL_PROBE_TEXT_SIZE),
+    ]
 
 
 class Lib(object):
@@ -11,8 +75,129 @@ class Lib(object):
             ("message", ctypes.c_char_p),
         ]
 
+    class BenchmarkResult(ctypes.Structure):
+        _fields_ = [
+            ("uploadMBps", ctypes.c_double),
+            ("mappedUploadMBps", ctypes.c_double),
+            ("readbackMBps", ctypes.c_double),
+            ("drawCallsPerSec", ctypes.c_double),
+            ("fillRateMPixPerSec", ctypes.c_double),
+            ("gpuTimers", ctypes.c_int),
+        ]
+
+    class FramePacingResult(ctypes.Structure):
+        _fields_ = [
+            ("frames", ctypes.c_int),
+            ("gpuTimers", ctypes.c_int),
+            ("presented", ctypes.c_int),
+            ("swapInterval", ctypes.c_int),
+        ]
+
+    class GlProbe(ctypes.Structure):
+        _fields_ = [
+            ("major", ctypes.c_int),
+            ("minor", ctypes.c_int),
+            ("vendor", ctypes.c_char * GL_PROBE_STRING_SIZE),
+            ("renderer", ctypes.c_char * GL_PROBE_STRING_SIZE),
+            ("version", ctypes.c_char * GL_PROBE_STRING_SIZE),
+            ("glslVersion", ctypes.c_char * GL_PROBE_STRING_SIZE),
+        ] + [
+            (name, ctypes.c_int * 2 if name == "maxViewportDims" else ctypes.c_int)
+            for name in GL_PROBE_LIMITS
+        ] + [
+            ("statements", ctypes.c_int),
+            ("errorCount", ctypes.c_int),
+            ("errors", GlProbeError * GL_PROBE_MAX_ERRORS),
+            ("infoLog", ctypes.c_char * GL_PROBE_LOG_SIZE),
+        ]
+
+    class DeviceProbe(ctypes.Structure):
+        _fields_ = [
+            ("drmFile", ctypes.c_char * 256),
+            ("vendor", ctypes.c_char * 256),
+            ("renderer", ctypes.c_char * 256),
+            ("version", ctypes.c_char * 256),
+            ("glslVersion", ctypes.c_char * 256),
+            ("major", ctypes.c_int),
+            ("minor", ctypes.c_int),
+            ("software", ctypes.c_int),
+            ("rendered", ctypes.c_int),
+        ]
+
+    class Session(object):
+        """GL context shared by checks, used as a context manager.
+
+        The context is created and the functions are loaded at most once, on
+        first use; the cached results are returned to every later caller.
+        A context lost with a crashed worker process stays failed. `backend`
+        is one of `BACKENDS` or `auto`, resolved when the context is created.
+        """
+
+        def __init__(self, lib: "Lib", w: int, h: int, backend: str = "auto"):
+            self.lib = lib # type: Lib
+            self.w = w # type: int
+            self.h = h # type: int
+            self.backend = backend # type: str
+            self.context = None # type: Lib.Result
+            self.functions = None # type: Lib.Result
+            self.probe = None # type: Tuple[Lib.Result, Lib.GlProbe]
+            self.restarts = 0 # type: int
+
+        def __enter__(self) -> "Lib.Session":
+            return self
+
+        def __exit__(self, exc_type, exc_value, traceback):
+            self.close()
+
+        def create_context(self) -> "Lib.Result":
+            if self.context is None:
+                self.restarts = self.lib.restarts
+                self.backend = resolve_backend(self.backend)
+                create = getattr(self.lib, BACKENDS[self.backend][0])
+                self.context = self.__guard__(create, self.w, self.h)
+            elif self.context.code == 0 and self.restarts != self.lib.restarts:
+                self.context = Lib.Result(-1, b"GL context lost with crashed worker")
+            return self.context
+
+        def load_functions(self) -> "Lib.Result":
+            res = self.create_context()
+            if res.code != 0:
+                return res
+            if self.functions is None:
+                load = getattr(self.lib, BACKENDS[self.backend][1])
+                self.functions = self.__guard__(load)
+            return self.functions
+
+        def probe_context(self) -> Tuple["Lib.Result", "Lib.GlProbe"]:
+            """`Lib.probeOpenGL` of the loaded context, probed once."""
+            res = self.load_functions()
+            if res.code != 0:
+                return res, None
+            if self.probe is None:
+                try:
+                    self.probe = self.lib.probeOpenGL()
+                except NativeError as e:
+                    return Lib.Result(-1, str(e).encode()), None
+            return self.probe
+
+        def close(self) -> "Lib.Result":
+            res = None
+            if self.context is not None and self.create_context().code == 0:
+                res = self.__guard__(getattr(self.lib, BACKENDS[self.backend][2]))
+            self.context = None
+            self.functions = None
+            self.probe = None
+            return res
+
+        def __guard__(self, func, *args) -> "Lib.Result":
+            try:
+                return func(*args)
+            except NativeError as e:
+                return Lib.Result(-1, str(e).encode())
+
     def __init__(self):
         self.lib = None
+        self.restarts = 0 # type: int
 
     def load(self):
         lib_path = local_path("bin/libGfxHealthCheck.so")
@@ -21,31 +206,135 @@ class Lib(object):
         self.lib.createGlxContext.restype = Lib.Result
         self.lib.destroyGlxContext.argtypes = []
         self.lib.destroyGlxContext.restype = Lib.Result
+        self.lib.hasGlxContext.argtypes = []
+        self.lib.hasGlxContext.restype = ctypes.c_int
         self.lib.gladLoadFunctions.argtypes = []
         self.lib.gladLoadFunctions.restype = Lib.Result
-        self.lib.gladGetMajorVersion.argtypes = []
-        self.lib.gladGetMajorVersion.restype = ctypes.c_int
-        self.lib.gladGetMinorVersion.argtypes = []
-        self.lib.gladGetMinorVersion.restype = ctypes.c_int
-        self.lib.getOpenGLVersionString.argtypes = []
-        self.lib.getOpenGLVersionString.restype = Lib.Result
-        self.lib.testBasicOpenGlFunctions.argtypes = []
-        self.lib.testBasicOpenGlFunctions.restype = Lib.Result
+        self.lib.createEglContext.argtypes = [ctypes.c_int, ctypes.c_int]
+        self.lib.createEglContext.restype = Lib.Result
+        self.lib.destroyEglContext.argtypes = []
+        self.lib.destroyEglContext.restype = Lib.Result
+        self.lib.hasEglContext.argtypes = []
+        self.lib.hasEglContext.restype = ctypes.c_int
+        self.lib.gladLoadEglFunctions.argtypes = []
+        self.lib.gladLoadEglFunctions.restype = Lib.Result
+        self.lib.probeOpenGL.argtypes = [ctypes.POINTER(Lib.GlProbe)]
+        self.lib.probeOpenGL.restype = Lib.Result
+        self.lib.runGpuBenchmark.argtypes = [ctypes.POINTER(Lib.BenchmarkResult)]
+        self.lib.runGpuBenchmark.restype = Lib.Result
+        self.lib.runFramePacing.argtypes = [
+            ctypes.c_int,
+            ctypes.c_int,
+            ctypes.POINTER(Lib.FramePacingResult),
+            ctypes.POINTER(ctypes.c_double),
+            ctypes.POINTER(ctypes.c_double),
+            ctypes.POINTER(ctypes.c_double),
+        ]
+        self.lib.runFramePacing.restype = Lib.Result
+        self.lib.renderScene.argtypes = [
+            ctypes.c_int,
+            ctypes.c_int,
+            ctypes.c_int,
+            ctypes.POINTER(ctypes.c_ubyte),
+        ]
+        self.lib.renderScene.restype = Lib.Result
+        self.lib.eglDeviceCount.argtypes = []
+        self.lib.eglDeviceCount.restype = ctypes.c_int
+        self.lib.probeEglDevice.argtypes = [ctypes.c_int, ctypes.POINTER(Lib.DeviceProbe)]
+        self.lib.probeEglDevice.restype = Lib.Result
 
+    @profiled("native")
     def createGlxContext(self, w: int, h: int) -> Result:
         return self.lib.createGlxContext(w, h)
 
+    @profiled("native")
     def destroyGlxContext(self) -> int:
         return self.lib.destroyGlxContext()
 
+    @profiled("native")
+    def hasGlxContext(self) -> bool:
+        return bool(self.lib.hasGlxContext())
+
+    @profiled("native")
+    def createEglContext(self, w: int, h: int) -> Result:
+        return self.lib.createEglContext(w, h)
+
+    @profiled("native")
+    def destroyEglContext(self) -> Result:
+        return self.lib.destroyEglContext()
+
+    @profiled("native")
+    def hasEglContext(self) -> bool:
+        return bool(self.lib.hasEglContext())
+
+    def session(self, w: int = 1, h: int = 1, backend: str = "auto") -> "Lib.Session":
+        return Lib.Session(self, w, h, backend)
+
+    @profiled("native")
     def gladLoadFunctions(self) -> int:
         return self.lib.gladLoadFunctions()
 
-    def gladGetVersion(self) -> Tuple[int, int]:
-        return self.lib.gladGetMajorVersion(), self.lib.gladGetMinorVersion()
+    @profiled("native")
+    def gladLoadEglFunctions(self) -> Result:
+        return self.lib.gladLoadEglFunctions()
+
+    @profiled("native")
+    def probeOpenGL(self, buffer=None) -> Tuple[Result, GlProbe]:
+        """Versions, strings, limits and basic function test errors of the
+        current context, filled by one native call into the returned struct.
+
+        The struct is laid over `buffer` when given, e.g. memory shared with
+        the caller of a worker process, which reads it in place.
+        """
+        if buffer is None:
+            probe = Lib.GlProbe()
+        else:
+            probe = Lib.GlProbe.from_buffer(buffer)
+        return self.lib.probeOpenGL(ctypes.byref(probe)), probe
+
+    @profiled("native")
+    def runGpuBenchmark(self) -> Tuple[Result, BenchmarkResult]:
+        bench = Lib.BenchmarkResult()
+        return self.lib.runGpuBenchmark(ctypes.byref(bench)), bench
+
+    @profiled("native")
+    def runFramePacing(
+        self, frames: int, present: bool
+    ) -> Tuple[Result, FramePacingResult, List[float], List[float], List[float]]:
+        """Per-frame CPU submit, GPU and frame interval times in milliseconds,
+        offscreen frames first, then frames presented to the window."""
+        pacing = Lib.FramePacingResult()
+        cpu = (ctypes.c_double * (2 * frames))()
+        gpu = (ctypes.c_double * (2 * frames))()
+        interval = (ctypes.c_double * (2 * frames))()
+        res = self.lib.runFramePacing(
+            frames, int(present), ctypes.byref(pacing), cpu, gpu, interval
+        )
+        count = frames * (2 if pacing.presented else 1)
+        return res, pacing, cpu[:count], gpu[:count], interval[:count]
+
+    @profiled("native")
+    def renderScene(
+        self, scene: int, w: int, h: int, buffer=None
+    ) -> Tuple[Result, Any]:
+        """RGBA pixels of a scene, read back by the native call straight into
+        the returned buffer, rows bottom to top.
+
+        The pixels go into `buffer` when given, e.g. memory shared with the
+        caller of a worker, else into a new bytearray.
+        """
+        if buffer is None:
+            buffer = bytearray(w * h * 4)
+        view = (ctypes.c_ubyte * (w * h * 4)).from_buffer(buffer)
+        res = self.lib.renderScene(scene, w, h, view)
+        del view
+        return res, buffer
+
+    @profiled("native")
+    def eglDeviceCount(self) -> int:
+        return self.lib.eglDeviceCount()
 
-    def getOpenGLVersionString(self) -> Result:
-        return self.lib.getOpenGLVersionString()
-    
-    def testBasicOpenGlFunctions(self) -> Result:
-        return self.lib.testBasicOpenGlFunctions()
+    @profiled("native")
+    def probeEglDevice(self, index: int) -> Tuple[Result, DeviceProbe]:
+        probe = Lib.DeviceProbe()
+        return self.lib.probeEglDevice(index, ctypes.byref(probe)), probe
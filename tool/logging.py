@@ -1,4 +1,9 @@
+from typing import List
+import atexit
+import collections
+import re
 import sys
+import threading
 
 
 class TextColor:
@@ -34,20 +39,271 @@ class TextColor:
         return TextColor.YELLOW + text + TextColor.RESET
 
 
-class Tee:
-    def __init__(self, *streams):
-        self.streams = streams
+# event kinds, an event is a (kind, error, value) tuple
+STARTED = 0 # value is the check label
+DONE = 1 # value is the check summary, colored, ending with a newline
+TEXT = 2 # value is printed text, whole lines unless flushed
+COMMAND = 3 # value is a finished command and its stderr, for the log file
+FLUSH = 4 # value is a threading.Event set once everything before is written
 
-    def write(self, data):
-        for stream in self.streams:
-            stream.write(data)
+# while events keep coming, streams are written and flushed at most this often
+FLUSH_INTERVAL = 0.05
+# how long `flush` waits for the writer thread
+FLUSH_TIMEOUT = 5.0
+
+ANSI_RE = re.compile(r"\033\[[0-9;]*m")
+
+
+def strip_colors(text: str) -> str:
+    return ANSI_RE.sub("", text) if "\033" in text else text
+
+
+class PlainRenderer(object):
+    """Renders events for a log file or a redirected stdout: no colors, no
+    progress line, commands only when `commands` is set."""
+
+    def __init__(self, stream, errors=None, commands: bool = False):
+        self.stream = stream
+        self.errors = errors or stream
+        self.commands = commands # type: bool
+        self.parts = [] # type: list
+
+    def render(self, kind: int, error: bool, value):
+        if kind == DONE or kind == TEXT or (kind == COMMAND and self.commands):
+            self.add(self.errors if error else self.stream, strip_colors(value))
+
+    def add(self, stream, text: str):
+        if self.parts and self.parts[-1][0] is stream:
+            self.parts[-1][1].append(text)
+        else:
+            self.parts.append((stream, [text]))
+
+    def commit(self):
+        """Writes what was rendered since the last commit, one write and one
+        flush per run of text for the same stream."""
+        parts, self.parts = self.parts, []
+        for stream, texts in parts:
+            stream.write("".join(texts))
             stream.flush()
 
+
+class TerminalRenderer(PlainRenderer):
+    """Renders events for a terminal: the running check is shown on a progress
+    line that is cleared before anything else is printed and drawn again after."""
+
+    def __init__(self, stream, errors=None):
+        super(TerminalRenderer, self).__init__(stream, errors)
+        self.status = "" # type: str
+
+    def render(self, kind: int, error: bool, value):
+        if kind == COMMAND:
+            return
+        if self.status:
+            # the hourglass is two columns wide
+            self.add(self.stream, "\r" + " " * (len(self.status) + 1) + "\r")
+        if kind == STARTED:
+            self.status = " ⏳ {} ".format(value)
+        elif kind == DONE:
+            self.status = ""
+            self.add(self.stream, value)
+        else:
+            self.add(self.errors if error else self.stream, value)
+            if not value.endswith("\n"):
+                # an unfinished line stays, the progress line would append to it
+                self.status = ""
+        if self.status:
+            self.add(self.stream, self.status)
+
+
+def console_renderer(stdout, stderr) -> PlainRenderer:
+    try:
+        tty = stdout.isatty()
+    except (AttributeError, ValueError):
+        tty = False
+    return TerminalRenderer(stdout, stderr) if tty else PlainRenderer(stdout, stderr)
+
+
+class Output(object):
+    """Console and log output written by a single thread.
+
+    Producers only append events to a deque, which takes no lock in CPython.
+    The writer thread renders each batch of queued events for every renderer
+    and writes and flushes every stream once per batch. While events keep
+    coming it waits FLUSH_INTERVAL between batches, when idle it sleeps until
+    the next event.
+    """
+
+    def __init__(self, renderers: List[PlainRenderer]):
+        self.renderers = renderers # type: List[PlainRenderer]
+        self.events = collections.deque() # type: collections.deque
+        self.wake = threading.Event()
+        self.idle = False # type: bool
+        self.closed = False # type: bool
+        self.thread = threading.Thread(target=self.__loop__, name="output")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def put(self, kind: int, error: bool, value):
+        if self.closed:
+            self.__write__([(kind, error, value)])
+            return
+        self.events.append((kind, error, value))
+        # checked after appending: either the writer sees the event before it
+        # goes idle or this sees it idle
+        if self.idle:
+            self.wake.set()
+
     def flush(self):
-        for stream in self.streams:
-            stream.flush()
+        """Waits until everything put so far is written."""
+        if self.closed or threading.current_thread() is self.thread:
+            return
+        barrier = threading.Event()
+        self.events.append((FLUSH, False, barrier))
+        self.wake.set()
+        barrier.wait(FLUSH_TIMEOUT)
+
+    def close(self):
+        """Writes the remaining events, later ones are written by the caller."""
+        if self.closed:
+            return
+        self.closed = True
+        self.wake.set()
+        self.thread.join(FLUSH_TIMEOUT)
+        self.__drain__()
+
+    def __loop__(self):
+        while not self.closed:
+            self.wake.clear()
+            self.__drain__()
+            self.wake.wait(FLUSH_INTERVAL)
+            if not self.events:
+                self.idle = True
+                if not self.events and not self.closed:
+                    self.wake.wait()
+                self.idle = False
+
+    def __drain__(self):
+        batch = []
+        try:
+            while True:
+                batch.append(self.events.popleft())
+        except IndexError:
+            pass
+        if batch:
+            self.__write__(batch)
+
+    def __write__(self, batch: list):
+        barriers = []
+        for kind, error, value in batch:
+            if kind == FLUSH:
+                barriers.append(value)
+                continue
+            for renderer in self.renderers:
+                renderer.render(kind, error, value)
+        for renderer in self.renderers:
+            try:
+                renderer.commit()
+            except (OSError, ValueError):
+                # closed or broken stream, like a pipe to a finished `head`
+                pass
+        for barrier in barriers:
+            barrier.set()
 
 
-def init_file_logger(log_file):
-    sys.stdout = Tee(sys.stdout, log_file)
-    sys.stderr = Tee(sys.stderr, log_file)
+class Stream(object):
+    """File-like stdout or stderr sending whole lines to an `Output`.
+
+    Every thread assembles its own lines, so lines of concurrent threads never
+    interleave. An unfinished line is only sent by `flush`.
+    """
+
+    def __init__(self, output: Output, error: bool, original):
+        self.output = output # type: Output
+        self.error = error # type: bool
+        self.original = original
+        self.local = threading.local()
+
+    @property
+    def encoding(self) -> str:
+        return getattr(self.original, "encoding", "utf-8")
+
+    def isatty(self) -> bool:
+        return self.original.isatty()
+
+    def write(self, data: str) -> int:
+        pending = getattr(self.local, "partial", "") + data
+        end = pending.rfind("\n") + 1
+        if end:
+            self.output.put(TEXT, self.error, pending[:end])
+        self.local.partial = pending[end:]
+        return len(data)
+
+    def flush(self):
+        partial = getattr(self.local, "partial", "")
+        if partial:
+            self.local.partial = ""
+            self.output.put(TEXT, self.error, partial)
+        self.output.flush()
+
+
+output = None # type: Output
+
+
+def emit(kind: int, value, error: bool = False):
+    """Sends an event to the `Output`, or prints it directly without one."""
+    if output is not None:
+        output.put(kind, error, value)
+    elif kind == DONE or kind == TEXT:
+        (sys.stderr if error else sys.stdout).write(value)
+
+
+def check_started(label: str):
+    emit(STARTED, label)
+
+
+def check_done(summary: str):
+    emit(DONE, summary)
+
+
+def log_command(command: List[str], returncode: int, seconds: float, stderr: str):
+    """Records a finished command and its stderr in the log file only."""
+    text = "$ {} -> exit {} in {:.2f}s\n".format(" ".join(command), returncode, seconds)
+    text += "".join("  | {}\n".format(line) for line in stderr.splitlines())
+    emit(COMMAND, text)
+
+
+def init_file_logger(log_file, quiet: bool = False):
+    """Routes stdout and stderr through an `Output` writing the log file and,
+    unless `quiet`, the console."""
+    global output
+    renderers = [PlainRenderer(log_file, commands=True)]
+    if not quiet:
+        renderers.insert(0, console_renderer(sys.stdout, sys.stderr))
+    output = Output(renderers)
+    sys.stdout = Stream(output, False, sys.stdout)
+    sys.stderr = Stream(output, True, sys.stderr)
+    atexit.register(close_output)
+
+
+def detach_file_logger(log_file):
+    """Stops writing `log_file`, the console output goes on."""
+    if output is None:
+        return
+    output.flush()
+    output.renderers = [r for r in output.renderers if r.stream is not log_file]
+
+
+def close_output():
+    """Writes everything pending and restores the original stdout and stderr."""
+    global output
+    if output is None:
+        return
+    for stream in (sys.stdout, sys.stderr):
+        if isinstance(stream, Stream):
+            stream.flush()
+    if isinstance(sys.stdout, Stream):
+        sys.stdout = sys.stdout.original
+    if isinstance(sys.stderr, Stream):
+        sys.stderr = sys.stderr.original
+    output.close()
+    output = None
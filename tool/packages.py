@@ -0,0 +1,100 @@
+from typing import Dict, List, Tuple
+import mmap
+import re
+
+DPKG_STATUS = "/var/lib/dpkg/status"
+
+# package name prefixes answered by `PackageIndex.family` without a scan
+PACKAGE_FAMILIES = (
+    "nvidia-driver-",
+    "nvidia-dkms-",
+    "nvidia-headless-",
+    "nvidia-kernel-common-",
+    "nvidia-kernel-source-",
+    "xserver-xorg-video-nvidia-",
+    "libnvidia-gl-",
+)
+
+# driver branch of versioned nvidia packages: nvidia-driver-535-server -> 535
+NVIDIA_BRANCH_RE = re.compile(r"-(\d+)(?:-server|-open|-server-open)?$")
+
+
+class PackageIndex(object):
+    """Installed packages from the dpkg status file, keyed by name."""
+
+    def __init__(self, versions: Dict[str, str]):
+        self.versions = versions # type: Dict[str, str]
+        self.families = {
+            prefix: [] for prefix in PACKAGE_FAMILIES
+        } # type: Dict[str, List[str]]
+        for name in sorted(versions):
+            for prefix in PACKAGE_FAMILIES:
+                if name.startswith(prefix):
+                    self.families[prefix].append(name)
+
+    def __len__(self) -> int:
+        return len(self.versions)
+
+    def installed(self, name: str) -> bool:
+        return name in self.versions
+
+    def version(self, name: str) -> str:
+        return self.versions.get(name)
+
+    def family(self, prefix: str) -> List[str]:
+        """Installed packages starting with one of `PACKAGE_FAMILIES`."""
+        return self.families[prefix]
+
+    def nvidia_branches(self) -> Dict[str, List[Tuple[str, str]]]:
+        """Installed versioned nvidia packages grouped by driver branch."""
+        branches = {} # type: Dict[str, List[Tuple[str, str]]]
+        for prefix in PACKAGE_FAMILIES:
+            for name in self.families[prefix]:
+                match = NVIDIA_BRANCH_RE.search(name)
+                if match is not None:
+                    branch = branches.setdefault(match.group(1), [])
+                    branch.append((name, self.versions[name]))
+        return branches
+
+    @staticmethod
+    def from_status(path: str = DPKG_STATUS) -> "PackageIndex":
+        """Parses the dpkg status file, memory-mapped, one stanza at a time."""
+        versions = {} # type: Dict[str, str]
+        with open(path, "rb") as f:
+            try:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError: # empty file
+                return PackageIndex(versions)
+            with data:
+                start = 0
+                while start < len(data):
+                    end = data.find(b"\n\n", start)
+                    if end == -1:
+                        end = len(data)
+                    name, status, version = parse_stanza(data, start, end)
+                    if name and version and status.endswith(b" installed"):
+                        versions.setdefault(name.decode(), version.decode())
+                    start = end + 2
+        return PackageIndex(versions)
+
+
+def parse_stanza(
+    data: mmap.mmap, start: int, end: int
+) -> Tuple[bytes, bytes, bytes]:
+    """Returns Package, Status and Version fields of a stanza in data[start:end]."""
+    fields = {b"Package": b"", b"Status": b"", b"Version": b""}
+    pos = start
+    while pos < end:
+        eol = data.find(b"\n", pos, end)
+        if eol == -1:
+            eol = end
+        if data[pos : pos + 1] not in (b" ", b"\t"):
+            colon = data.find(b":", pos, eol)
+            if colon != -1:
+                key = data[pos:colon]
+                if key in fields:
+                    fields[key] = data[colon + 1 : eol].strip()
+                    if all(fields.values()):
+                        break
+        pos = eol + 1
+    return fields[b"Package"], fields[b"Status"], fields[b"Version"]
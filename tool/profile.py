@@ -0,0 +1,84 @@
+from contextlib import contextmanager
+from typing import Callable, List
+import functools
+import resource
+import threading
+import time
+
+# CPU time of the calling thread, collectors run in parallel with the checks.
+thread_time = getattr(time, "thread_time", time.process_time)
+
+
+class Sample(object):
+    def __init__(self, kind: str, name: str, wall: float, cpu: float, rss: int):
+        self.kind = kind # type: str
+        self.name = name # type: str
+        self.wall = wall # type: float
+        self.cpu = cpu # type: float
+        self.rss = rss # type: int
+
+
+class Profiler(object):
+    """Collects wall time, CPU time and peak RSS (KiB) of checks, collectors,
+    subprocesses and native calls. Does nothing until enabled."""
+
+    def __init__(self):
+        self.enabled = False # type: bool
+        self.samples = [] # type: List[Sample]
+        self.lock = threading.Lock()
+
+    def record(self, kind: str, name: str, wall: float, cpu: float, rss: int):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.samples.append(Sample(kind, name, wall, cpu, rss))
+
+    @contextmanager
+    def measure(self, kind: str, name: str):
+        if not self.enabled:
+            yield
+            return
+        wall, cpu = time.perf_counter(), thread_time()
+        try:
+            yield
+        finally:
+            self.record(
+                kind,
+                name,
+                time.perf_counter() - wall,
+                thread_time() - cpu,
+                resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            )
+
+    def format_report(self) -> str:
+        lines = [
+            " {:<10} {:<40} {:>9} {:>9} {:>10}".format(
+                "kind", "name", "wall, s", "cpu, s", "rss, KiB"
+            )
+        ]
+        with self.lock:
+            samples = sorted(self.samples, key=lambda s: s.wall, reverse=True)
+        for s in samples:
+            lines.append(
+                " {:<10} {:<40} {:>9.3f} {:>9.3f} {:>10}".format(
+                    s.kind, s.name[:40], s.wall, s.cpu, s.rss
+                )
+            )
+        return "\n".join(lines)
+
+
+profiler = Profiler()
+
+
+def profiled(kind: str) -> Callable:
+    """Measures every call of the decorated function under its name."""
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with profiler.measure(kind, func.__name__):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,255 @@
+from typing import Callable, Dict, List, Tuple
+
+# RGBA colors of the scenes rendered by lib/src/render.cpp
+BLACK = (0, 0, 0, 255)
+RED = (255, 0, 0, 255)
+GREEN = (0, 255, 0, 255)
+BLUE = (0, 0, 255, 255)
+WHITE = (255, 255, 255, 255)
+
+CHECKER_SIZE = 8
+
+# diff image: mismatching pixels in this color over the darkened rendering
+DIFF_COLOR = (255, 0, 255)
+
+
+class Scene(object):
+    """A scene of the native `renderScene` and its golden image.
+
+    `golden(w, h)` returns RGBA rows bottom to top, like `glReadPixels`.
+    `tolerance` is the largest per-channel difference still matching.
+    """
+
+    def __init__(self, name: str, tolerance: int, golden: Callable[[int, int], bytes]):
+        self.name = name # type: str
+        self.tolerance = tolerance # type: int
+        self.golden = golden # type: Callable[[int, int], bytes]
+
+
+def pixel(color: Tuple[int, int, int, int]) -> bytes:
+    return bytes(color)
+
+
+def rect_rows(
+    w: int, h: int, background: tuple, rects: List[Tuple[int, int, int, int, tuple]]
+) -> bytes:
+    """Background with rectangles (x0, y0, x1, y1, color), later ones on top."""
+    rows = [bytearray(pixel(background) * w) for _ in range(h)]
+    for x0, y0, x1, y1, color in rects:
+        span = pixel(color) * (x1 - x0)
+        for y in range(y0, y1):
+            rows[y][x0 * 4 : x1 * 4] = span
+    return b"".join(rows)
+
+
+def unorm(value: float) -> int:
+    return int(value * 255 + 0.5)
+
+
+def golden_clear(w: int, h: int) -> bytes:
+    return pixel((unorm(0.2), unorm(0.4), unorm(0.6), 255)) * (w * h)
+
+
+def golden_indexed_quads(w: int, h: int) -> bytes:
+    return rect_rows(
+        w,
+        h,
+        BLACK,
+        [
+            (w // 4, h // 4, 3 * w // 4, h // 2, RED),
+            (w // 8, h // 2, w // 2, 7 * h // 8, GREEN),
+        ],
+    )
+
+
+def golden_gradient(w: int, h: int) -> bytes:
+    """Red grows left to right, green bottom to top, sampled at pixel centers."""
+    row = bytearray(pixel(BLACK) * w)
+    row[0::4] = bytes(unorm((x + 0.5) / w) for x in range(w))
+    rows = []
+    for y in range(h):
+        row[1::4] = bytes([unorm((y + 0.5) / h)]) * w
+        rows.append(bytes(row))
+    return b"".join(rows)
+
+
+def golden_depth(w: int, h: int) -> bytes:
+    return rect_rows(w, h, BLUE, [(w // 4, h // 4, 3 * w // 4, 3 * h // 4, GREEN)])
+
+
+def golden_texture(w: int, h: int) -> bytes:
+    """8x8 checkerboard with a white bottom left texel, nearest filtering."""
+    texel_w = w // CHECKER_SIZE
+    even = b"".join(
+        pixel(WHITE if x % 2 == 0 else BLACK) * texel_w for x in range(CHECKER_SIZE)
+    )
+    odd = b"".join(
+        pixel(BLACK if x % 2 == 0 else WHITE) * texel_w for x in range(CHECKER_SIZE)
+    )
+    return b"".join(
+        even if (y * CHECKER_SIZE // h) % 2 == 0 else odd for y in range(h)
+    )
+
+
+def golden_blend(w: int, h: int) -> bytes:
+    """Half transparent red over blue."""
+    return pixel((unorm(0.5), 0, unorm(0.5), unorm(0.75))) * (w * h)
+
+
+# same order as `RenderScene` in lib/src/render.h
+SCENES = [
+    Scene("clear", 1, golden_clear),
+    Scene("indexed_quads", 0, golden_indexed_quads),
+    Scene("gradient", 2, golden_gradient),
+    Scene("depth", 0, golden_depth),
+    Scene("texture", 0, golden_texture),
+    Scene("blend", 1, golden_blend),
+]
+
+
+class Diff(object):
+    def __init__(self, w: int, h: int):
+        self.w = w # type: int
+        self.h = h # type: int
+        self.mismatched = 0 # type: int
+        self.max_diff = 0 # type: int
+        self.image = None # type: bytes
+
+    @property
+    def percent(self) -> float:
+        return 100.0 * self.mismatched / (self.w * self.h)
+
+
+def compare(actual: bytes, golden: bytes, w: int, h: int, tolerance: int) -> Diff:
+    """Counts pixels with a channel differing by more than `tolerance`.
+
+    Uses NumPy when it is installed, `compare_rows` without it, both read
+    the buffers in place. The diff image (RGB, rows bottom to top) is made
+    only when pixels differ.
+    """
+    try:
+        import numpy
+    except ImportError:
+        return compare_rows(actual, golden, w, h, tolerance)
+
+    a = numpy.frombuffer(actual, numpy.uint8).reshape(h, w, 4)
+    g = numpy.frombuffer(golden, numpy.uint8).reshape(h, w, 4)
+    per_pixel = numpy.maximum(a, g) - numpy.minimum(a, g)
+    per_pixel = per_pixel.max(axis=2)
+    bad = per_pixel > tolerance
+    diff = Diff(w, h)
+    diff.mismatched = int(numpy.count_nonzero(bad))
+    diff.max_diff = int(per_pixel.max())
+    if diff.mismatched:
+        image = a[:, :, :3] // 3
+        image[bad] = DIFF_COLOR
+        diff.image = image.tobytes()
+    return diff
+
+
+# bytes compared at once without NumPy, bounds the size of the big integers
+CHUNK_BYTES = 1 << 20
+
+
+def spread(data: bytes) -> int:
+    """Bytes as one integer with a 16 bit lane per byte, most significant first."""
+    lanes = bytearray(len(data) * 2)
+    lanes[1::2] = data
+    return int.from_bytes(lanes, "big")
+
+
+class Lanes(object):
+    """Constants for lane-parallel arithmetic on `spread` integers of n bytes."""
+
+    def __init__(self, n: int):
+        self.n = n # type: int
+        self.one = spread(b"\x01" * n) # type: int
+        self.sign = self.one << 15 # type: int
+
+    def difference(self, actual: bytes, golden: bytes) -> int:
+        """Lanes of 256 + actual - golden, no lane borrows from its neighbour."""
+        return spread(actual) + (self.one << 8) - spread(golden)
+
+    def exceeds(self, v: int, t: int) -> int:
+        """Sign bits set in the lanes of `v` where |actual - golden| > t."""
+        above = v + self.one * (0x8000 - 257 - t)
+        below = self.one * (0x8000 + 255 - t) - v
+        return (above | below) & self.sign
+
+    def max_difference(self, v: int) -> int:
+        lo, hi = 0, 255
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.exceeds(v, mid):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def pixels(self, mask: int) -> bytes:
+        """Per RGBA pixel byte, 0x80 where any channel lane of `mask` is set."""
+        channels = mask.to_bytes(self.n * 2, "big")[0::2]
+        merged = 0
+        for c in range(4):
+            merged |= int.from_bytes(channels[c::4], "big")
+        return merged.to_bytes(self.n // 4, "big")
+
+
+def compare_rows(actual: bytes, golden: bytes, w: int, h: int, tolerance: int) -> Diff:
+    """Pure Python `compare`: chunks of whole rows, equal ones skipped, the
+    others compared in 16 bit lanes of big integers."""
+    actual = memoryview(actual)
+    golden = memoryview(golden)
+    diff = Diff(w, h)
+    stride = w * 4
+    step = max(1, CHUNK_BYTES // stride) * stride
+    bad = bytearray(w * h)
+    lanes = {} # type: Dict[int, Lanes]
+    for start in range(0, len(actual), step):
+        a = actual[start : start + step]
+        g = golden[start : start + step]
+        if a == g:
+            continue
+        if len(a) not in lanes:
+            lanes[len(a)] = Lanes(len(a))
+        chunk = lanes[len(a)]
+        v = chunk.difference(a, g)
+        diff.max_diff = max(diff.max_diff, chunk.max_difference(v))
+        mask = chunk.exceeds(v, tolerance)
+        if mask:
+            bad[start // 4 : (start + len(a)) // 4] = chunk.pixels(mask)
+    diff.mismatched = len(bad) - bad.count(0)
+    if diff.mismatched:
+        diff.image = overlay(actual, bytes(bad))
+    return diff
+
+
+def overlay(actual: bytes, bad: bytes) -> bytes:
+    """Darkened RGB of `actual` with `DIFF_COLOR` where `bad` is not zero."""
+    n = len(bad)
+    dark = bytes(actual).translate(bytes(v // 3 for v in range(256)))
+    image = bytearray(n * 3)
+    select = bytearray(n * 3)
+    full = bytes(bad).translate(bytes([0] + [255] * 255))
+    for c in range(3):
+        image[c::3] = dark[c::4]
+        select[c::3] = full
+    mask = int.from_bytes(select, "big")
+    color = int.from_bytes(bytes(DIFF_COLOR) * n, "big")
+    picture = int.from_bytes(image, "big")
+    return ((picture & ~mask) | (color & mask)).to_bytes(n * 3, "big")
+
+
+def to_ppm(pixels: bytes, w: int, h: int, channels: int) -> bytes:
+    """Binary PPM of bottom-to-top rows of RGB or RGBA pixels."""
+    stride = w * channels
+    rows = []
+    for y in reversed(range(h)):
+        row = pixels[y * stride : (y + 1) * stride]
+        if channels == 4:
+            rgb = bytearray(w * 3)
+            for c in range(3):
+                rgb[c::3] = row[c::4]
+            row = bytes(rgb)
+        rows.append(row)
+    return b"P6\n%d %d\n255\n" % (w, h) + b"".join(rows)
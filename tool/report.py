@@ -1,16 +1,172 @@
 from .config import Config
-from .utils import create_acrhive
+from typing import List
+import io
 import os
-import shutil
+import sys
+import tarfile
+import tempfile
+import threading
+import time
+
+EXTENSIONS = {"gz": "tar.gz", "xz": "tar.xz", "zst": "tar.zst"}
+
+
+def open_compressor(fileobj, compression: str, level: int = None):
+    if compression == "gz":
+        import gzip
+
+        return gzip.GzipFile(
+            fileobj=fileobj, mode="wb", compresslevel=6 if level is None else level
+        )
+    if compression == "xz":
+        import lzma
+
+        return lzma.LZMAFile(fileobj, "wb", preset=6 if level is None else level)
+    if compression == "zst":
+        level = 3 if level is None else level
+        try:
+            from compression import zstd
+
+            return zstd.ZstdFile(fileobj, "wb", level=level)
+        except ImportError:
+            pass
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError(
+                "zstd compression requires python 3.14 or the 'zstandard' package"
+            )
+        return zstandard.ZstdCompressor(level=level).stream_writer(fileobj)
+    raise ValueError("Unknown compression '{}'".format(compression))
+
+
+class ReportWriter(object):
+    """Writes the report archive as a single tar stream.
+
+    Files go straight into the compressed stream. Command outputs are spooled
+    to `temp_dir` while the command runs and moved into the stream when it
+    exits. Safe to use from collector threads.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        temp_dir: str = None,
+        compression: str = "gz",
+        level: int = None,
+    ):
+        self.path = path # type: str
+        self.temp_dir = temp_dir or tempfile.gettempdir() # type: str
+        self.root = "gfx-health-report" # type: str
+        self.names = set()
+        self.lock = threading.Lock()
+        self.file = open(path, "wb")
+        try:
+            self.stream = open_compressor(self.file, compression, level)
+        except Exception:
+            self.file.close()
+            os.remove(path)
+            raise
+        self.tar = tarfile.open(fileobj=self.stream, mode="w|")
+
+    def __enter__(self) -> "ReportWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def add_file(self, path: str, arcname: str = None) -> bool:
+        """Adds a file or a directory tree, missing paths are skipped."""
+        if not os.path.exists(path):
+            return False
+        arcname = self.__unique__(arcname or os.path.basename(path))
+        with self.lock:
+            self.tar.add(path, arcname=arcname)
+        return True
+
+    def add_text(self, arcname: str, text: str):
+        self.add_bytes(arcname, text.encode("utf-8", "replace"))
+
+    def add_bytes(self, arcname: str, data: bytes):
+        info = tarfile.TarInfo(self.__unique__(arcname))
+        info.size = len(data)
+        info.mtime = int(time.time())
+        info.mode = 0o644
+        with self.lock:
+            self.tar.addfile(info, io.BytesIO(data))
+
+    def command_log(self, name: str, command: List[str]) -> "CommandLog":
+        return CommandLog(self, name, command)
+
+    def close(self):
+        with self.lock:
+            if self.tar is None:
+                return
+            self.tar.close()
+            self.stream.close()
+            self.file.close()
+            self.tar = None
+
+    def __unique__(self, arcname: str) -> str:
+        with self.lock:
+            name, ext = os.path.splitext(arcname)
+            unique, n = arcname, 1
+            while unique in self.names:
+                n += 1
+                unique = "{}.{}{}".format(name, n, ext)
+            self.names.add(unique)
+            return os.path.join(self.root, unique)
+
+
+class CommandLog(object):
+    """Spool file a command output is streamed to, added to the report on close."""
+
+    def __init__(self, report: ReportWriter, name: str, command: List[str]):
+        self.report = report # type: ReportWriter
+        self.name = name # type: str
+        fd, self.path = tempfile.mkstemp(
+            dir=report.temp_dir, prefix=name + ".", suffix=".log"
+        )
+        self.file = os.fdopen(fd, "wb")
+        self.file.write(
+            ("=" * 40 + "\n" + " ".join(command) + "\nstdout:\n").encode()
+        )
+
+    def write(self, chunk: bytes):
+        self.file.write(chunk)
+
+    def close(self, stderr: str):
+        self.file.write(
+            ("stderr:\n" + stderr + "\n" + "=" * 40 + "\n").encode("utf-8", "replace")
+        )
+        self.file.close()
+        try:
+            self.report.add_file(self.path, self.name + ".log")
+        finally:
+            os.remove(self.path)
+
+
+def open_report(config: Config) -> ReportWriter:
+    path = os.path.join(
+        config.report_dir, "gfx_health_report." + EXTENSIONS[config.compression]
+    )
+    try:
+        return ReportWriter(
+            path, config.temp_dir, config.compression, config.compression_level
+        )
+    except (OSError, RuntimeError) as e:
+        print(e)
+        exit(-1)
 
 
 def create_report(config: Config, log_file):
+    report = config.report
+    report.add_file("/var/log/Xorg.0.log")
+    report.add_file("/etc/X11/xorg.conf") # might have different name
+    report.add_file("/etc/X11/xorg.conf.d")
+    report.add_file("/etc/modprobe.d")
+    sys.stdout.flush() # waits for the output writer thread
     log_file.flush()
-    shutil.copy(log_file.name, os.path.join(config.temp_dir, "gfx_health.log"))
-    shutil.copy("/var/log/Xorg.0.log", config.temp_dir)
-    shutil.copy("/etc/X11/xorg.conf", config.temp_dir) # might have different name
-    shutil.copytree("/etc/X11/xorg.conf.d", os.path.join(config.temp_dir, "xorg.conf.d"))
-    shutil.copytree("/etc/modprobe.d", os.path.join(config.temp_dir, "modprobe.d"))
-    report_path = os.path.join(config.report_dir, "gfx_health_report.tar.gz")
-    create_acrhive(config.temp_dir, report_path)
-    print("report path: {}".format(report_path))
+    report.add_file(log_file.name, "gfx_health.log")
+    report.close()
+    print("report path: {}".format(report.path))
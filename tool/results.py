@@ -0,0 +1,112 @@
+from typing import Iterator, List
+import json
+import socket
+import struct
+import sys
+import time
+import zlib
+
+FORMATS = ["jsonl", "bin"]
+
+# Every binary frame is MAGIC, payload length and a zlib-compressed JSON record.
+FRAME_MAGIC = b"GHCR"
+FRAME_HEADER = struct.Struct("<4sI")
+
+
+def to_record(value):
+    """Turns info objects (GpuInfo, OpenGLInfo, ...) into JSON-compatible values."""
+    if isinstance(value, (set, frozenset)):
+        return sorted(to_record(x) for x in value)
+    if isinstance(value, (list, tuple)):
+        return [to_record(x) for x in value]
+    if isinstance(value, dict):
+        return {str(k): to_record(v) for k, v in value.items()}
+    if hasattr(value, "__dict__"):
+        return {k: to_record(v) for k, v in vars(value).items()}
+    return value
+
+
+def check_status(check) -> str:
+    if check.skipped is not None:
+        return "skip"
+    kinds = {msg[0] for msg in check.messages}
+    if "fail" in kinds:
+        return "fail"
+    return "warn" if kinds else "ok"
+
+
+def check_record(check) -> dict:
+    return {
+        "name": type(check).__name__,
+        "label": check.label,
+        "status": check_status(check),
+        "skipped": check.skipped,
+        "messages": [list(msg) for msg in check.messages],
+        "duration": check.duration,
+        "data": to_record(check.data),
+    }
+
+
+def run_record(checks: list, info) -> dict:
+    return {
+        "host": socket.gethostname(),
+        "time": time.time(),
+        "system": {
+            "os_name": info.os_name,
+            "os_version": info.os_version,
+            "arch": info.arch,
+            "gpus": to_record(info.gpus_info),
+            "opengl": to_record(info.opengl_info),
+        },
+        "checks": [check_record(check) for check in checks],
+    }
+
+
+def encode_record(record: dict, format: str) -> bytes:
+    data = json.dumps(record, separators=(",", ":")).encode()
+    if format == "jsonl":
+        return data + b"\n"
+    payload = zlib.compress(data)
+    return FRAME_HEADER.pack(FRAME_MAGIC, len(payload)) + payload
+
+
+def write_results(path: str, checks: list, info, format: str = "jsonl"):
+    """Appends one record with the run results to `path`, '-' is stdout."""
+    write_record(path, run_record(checks, info), format)
+
+
+def write_record(path: str, record: dict, format: str = "jsonl"):
+    data = encode_record(record, format)
+    if path == "-":
+        sys.__stdout__.flush()
+        sys.__stdout__.buffer.write(data)
+        sys.__stdout__.buffer.flush()
+    else:
+        with open(path, "ab") as f:
+            f.write(data)
+
+
+def iter_results(data: bytes) -> Iterator[dict]:
+    """Yields every record from JSON Lines or binary framed `data`."""
+    if data[: len(FRAME_MAGIC)] != FRAME_MAGIC:
+        for line in data.splitlines():
+            if line.strip().startswith(b"{"):
+                yield json.loads(line.decode())
+        return
+    offset = 0
+    while offset + FRAME_HEADER.size <= len(data):
+        magic, size = FRAME_HEADER.unpack_from(data, offset)
+        if magic != FRAME_MAGIC:
+            raise ValueError("Corrupted results frame at offset {}".format(offset))
+        offset += FRAME_HEADER.size
+        yield json.loads(zlib.decompress(data[offset : offset + size]).decode())
+        offset += size
+
+
+def read_results(data: bytes) -> List[dict]:
+    return list(iter_results(data))
+
+
+def load_results(path: str) -> List[dict]:
+    with open(path, "rb") as f:
+        return read_results(f.read())
@@ -0,0 +1,53 @@
+from .profile import profiler
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict
+
+
+class Task(object):
+    def __init__(self, name: str, func: Callable, args: tuple):
+        self.name = name # type: str
+        self.func = func # type: Callable
+        self.args = args # type: tuple
+        self.future = Future() # type: Future
+
+
+class Scheduler(object):
+    """Runs collectors on a thread pool of `max_workers` threads.
+
+    Collectors do not read each other's results, checks declare the collectors
+    they read in `Check.inputs` and wait only for those. Collectors must not
+    write to the console: checks print their progress from the main thread.
+    """
+
+    def __init__(self, max_workers: int = 4):
+        self.max_workers = max_workers # type: int
+        self.tasks = {} # type: Dict[str, Task]
+        self.executor = None # type: ThreadPoolExecutor
+
+    def add(self, name: str, func: Callable, *args):
+        if name in self.tasks:
+            raise ValueError("Collector '{}' is already scheduled".format(name))
+        self.tasks[name] = Task(name, func, args)
+
+    def start(self):
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        for task in self.tasks.values():
+            self.executor.submit(self.__execute__, task)
+
+    def wait(self, *names: str):
+        """Blocks until the given collectors (all when empty) are done."""
+        for name in names or list(self.tasks):
+            self.tasks[name].future.result()
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+    def __execute__(self, task: Task):
+        try:
+            with profiler.measure("collector", task.name):
+                result = task.func(*task.args)
+            task.future.set_result(result)
+        except BaseException as e:
+            task.future.set_exception(e)
@@ -1,6 +1,11 @@
+from .cache import Cache, cached
 from .config import Config
-from .utils import run
-from typing import List, Tuple
+from .kernel_log import KernelLogAnalyzer
+from .driver_config import DriverConfig
+from .packages import DPKG_STATUS, PackageIndex
+from .utils import Capture, acquire_sudo, run
+from typing import Dict, FrozenSet, Iterable, List, Tuple
+import os
 import re
 
 
@@ -10,14 +15,65 @@ class ErrorContext(object):
         self.gpu_info_parse_error = None # type: str
         self.opengl_info_parse_error = None # type: str
         self.opengl_version_parse_error = None # type: str
+        self.journal_error = None # type: str
+        self.packages_error = None # type: str
+        self.driver_config_error = None # type: str
+        self.cache_error = None # type: str
+
+
+# SystemInfo attributes and ErrorContext fields written by every collector
+COLLECTOR_STATE = {
+    "os": (("os_name", "os_version", "arch"), ("os_parse_error",)),
+    "gpu": (("gpus_info",), ("gpu_info_parse_error",)),
+    "opengl": (
+        ("opengl_info",),
+        ("opengl_info_parse_error", "opengl_version_parse_error"),
+    ),
+    "journal": (("kernel_log",), ("journal_error",)),
+    "packages": (("packages",), ("packages_error",)),
+    "driver_config": (("driver_config",), ("driver_config_error",)),
+}
+
+# collector -> command it runs with sudo, the password is asked before it starts
+SUDO_COMMANDS = {
+    "journal": ["dmesg"],
+}
+
+PCI_DEVICES_DIR = "bus/pci/devices"
+
+# PCI class (base class and subclass) of display controllers, named like lspci
+PCI_DISPLAY_CLASSES = {
+    0x0300: "VGA compatible controller",
+    0x0301: "XGA compatible controller",
+    0x0302: "3D controller",
+    0x0380: "Display controller",
+}
+
+PCI_VENDORS = {
+    0x1002: "Advanced Micro Devices, Inc. [AMD/ATI]",
+    0x102B: "Matrox Electronics Systems Ltd.",
+    0x10DE: "NVIDIA Corporation",
+    0x15AD: "VMware",
+    0x1A03: "ASPEED Technology, Inc.",
+    0x1AF4: "Red Hat, Inc.",
+    0x1B36: "Red Hat, Inc.",
+    0x80EE: "InnoTek Systemberatung GmbH",
+    0x8086: "Intel Corporation",
+}
 
 
 class GpuInfo:
     def __init__(self):
+        self.slot = None # type: str
         self.description = None # type: str
         self.kernel_module_in_use = None # type: str
         self.kernel_modules = [] # type: List[str]
         self.subsystem = None # type: str
+        self.class_id = None # type: int
+        self.vendor_id = None # type: int
+        self.device_id = None # type: int
+        self.subsystem_vendor_id = None # type: int
+        self.subsystem_device_id = None # type: int
 
     @staticmethod
     def from_lspci_strings(err_ctx: ErrorContext, lines: List[str]) -> "GpuInfo":
@@ -30,13 +86,71 @@ class GpuInfo:
             kv_map[key.strip()] = val.strip()
 
         info = GpuInfo()
-        info.description = (description,)
-        info.kernel_module_in_use = (kv_map.get("Kernel driver in use"),)
+        info.slot = description.split(" ", 1)[0]
+        info.description = description
+        info.kernel_module_in_use = kv_map.get("Kernel driver in use")
         for x in kv_map.get("Kernel modules", "").split(","):
-            info.kernel_modules.append(x.strip())
-        info.subsystem = (kv_map.get("Subsystem"),)
+            if x.strip():
+                info.kernel_modules.append(x.strip())
+        info.subsystem = kv_map.get("Subsystem")
+        return info
+
+    @staticmethod
+    def from_sysfs(err_ctx: ErrorContext, device_dir: str) -> "GpuInfo":
+        """Reads a `/sys/bus/pci/devices/<slot>` directory of a display controller.
+
+        Names are known only for common vendors, devices are shown by id the
+        same way lspci does without pci.ids.
+        """
+
+        def read_id(name: str) -> int:
+            with open(os.path.join(device_dir, name)) as f:
+                return int(f.read().strip(), 16)
+
+        def vendor_device(vendor: int, device: int) -> str:
+            name = PCI_VENDORS.get(vendor, "Device {:04x}".format(vendor))
+            return "{} Device {:04x}".format(name, device)
+
+        info = GpuInfo()
+        info.slot = os.path.basename(device_dir)
+        if info.slot.startswith("0000:"):
+            info.slot = info.slot[len("0000:") :]
+        info.class_id = read_id("class") >> 8
+        info.vendor_id = read_id("vendor")
+        info.device_id = read_id("device")
+        info.subsystem_vendor_id = read_id("subsystem_vendor")
+        info.subsystem_device_id = read_id("subsystem_device")
+        info.description = "{} {}: {}".format(
+            info.slot,
+            PCI_DISPLAY_CLASSES.get(info.class_id, "Display controller"),
+            vendor_device(info.vendor_id, info.device_id),
+        )
+        info.subsystem = vendor_device(
+            info.subsystem_vendor_id, info.subsystem_device_id
+        )
+        driver = os.path.join(device_dir, "driver")
+        if os.path.islink(driver):
+            info.kernel_module_in_use = os.path.basename(os.readlink(driver))
+            module = os.path.join(driver, "module")
+            if os.path.islink(module):
+                info.kernel_modules.append(os.path.basename(os.readlink(module)))
         return info
 
+    @staticmethod
+    def from_sysfs_tree(
+        err_ctx: ErrorContext, sysfs_root: str = "/sys"
+    ) -> List["GpuInfo"]:
+        """Finds all display controllers, raises OSError when sysfs is unusable."""
+        devices_dir = os.path.join(sysfs_root, PCI_DEVICES_DIR)
+        gpus = []
+        for slot in sorted(os.listdir(devices_dir)):
+            device_dir = os.path.join(devices_dir, slot)
+            with open(os.path.join(device_dir, "class")) as f:
+                if int(f.read().strip(), 16) >> 16 != 0x03:
+                    continue
+            gpus.append(GpuInfo.from_sysfs(err_ctx, device_dir))
+        return gpus
+
 
 class OpenGLVersion(object):
     def __init__(self):
@@ -47,20 +161,107 @@ class OpenGLVersion(object):
     @staticmethod
     def from_string(err_ctx: ErrorContext, version: str) -> Tuple[int, int]:
         try:
-            dot = version.find(".")
-            major = int(version[dot - 1])
-            minor = int(version[dot + 1])
-            return major, minor
+            match = VERSION_RE.search(version)
+            return int(match.group(1)), int(match.group(2))
         except Exception as e:
-            err_ctx.opengl_version_parse_error = str(e)
+            err_ctx.opengl_version_parse_error = "unexpected version '{}': {}".format(
+                version, e
+            )
             return None, None
 
+    @staticmethod
+    def parse(err_ctx: ErrorContext, string: str) -> "OpenGLVersion":
+        version = OpenGLVersion()
+        version.string = string
+        version.major, version.minor = OpenGLVersion.from_string(err_ctx, string)
+        return version
+
+
+VERSION_RE = re.compile(r"(\d+)\.(\d+)")
+MEMORY_RE = re.compile(r"(\d+)\s*MB")
+
+# `key: value` lines of glxinfo output -> (OpenGLInfo attribute, is a version)
+GLXINFO_FIELDS = {
+    "OpenGL vendor string": ("vendor", False),
+    "OpenGL renderer string": ("renderer", False),
+    "OpenGL version string": ("version", True),
+    "OpenGL shading language version string": ("glsl_version", True),
+    "OpenGL core profile version string": ("core_version", True),
+    "OpenGL core profile shading language version string": ("core_glsl_version", True),
+    "direct rendering": ("direct_rendering", False),
+}
+
+# section headers followed by indented lines -> section kind
+GLXINFO_SECTIONS = {
+    "OpenGL extensions": "extensions",
+    "OpenGL core profile extensions": "extensions",
+    "GLX extensions": "glx_extensions",
+    "server glx extensions": "glx_extensions",
+    "client glx extensions": "glx_extensions",
+    "Memory info (GL_NVX_gpu_memory_info)": "memory",
+    "Memory info (GL_ATI_meminfo)": "memory",
+    "Extended renderer info (GLX_MESA_query_renderer)": "memory",
+    "OpenGL limits": "limits",
+    "OpenGL core profile limits": "limits",
+}
+
 
 class OpenGLInfo(object):
     def __init__(self):
         self.vendor = None # type: str
         self.renderer = None # type: str
+        self.direct_rendering = None # type: str
         self.version = None # type: OpenGLVersion
+        self.glsl_version = None # type: OpenGLVersion
+        self.core_version = None # type: OpenGLVersion
+        self.core_glsl_version = None # type: OpenGLVersion
+        self.extensions = None # type: FrozenSet[str]
+        self.glx_extensions = None # type: FrozenSet[str]
+        self.memory = {} # type: Dict[str, int]
+        self.limits = {} # type: Dict[str, str]
+
+    def has_extension(self, name: str) -> bool:
+        return self.extensions is not None and name in self.extensions
+
+    @staticmethod
+    def from_glxinfo(err_ctx: ErrorContext, output: str) -> "OpenGLInfo":
+        """Parses `glxinfo` (-B, full or -l) output in a single pass."""
+        info = OpenGLInfo()
+        sets = {"extensions": set(), "glx_extensions": set()}
+        seen = set()
+        section = None
+        for line in output.splitlines():
+            if line[:1] in (" ", "\t"):
+                if section in sets:
+                    names = (x.strip() for x in line.split(","))
+                    sets[section].update(x for x in names if x)
+                elif section == "memory":
+                    key, _, value = line.partition(":")
+                    match = MEMORY_RE.search(value)
+                    if "memory" in key and match:
+                        info.memory[key.strip()] = int(match.group(1))
+                elif section == "limits":
+                    key, _, value = line.partition("=")
+                    if value:
+                        info.limits[key.strip()] = value.strip()
+                continue
+
+            key, sep, value = line.partition(":")
+            section = GLXINFO_SECTIONS.get(key) if not value.strip() else None
+            seen.add(section)
+            field = GLXINFO_FIELDS.get(key) if sep else None
+            if field is None:
+                continue
+            attr, is_version = field
+            value = value.strip()
+            if is_version:
+                value = OpenGLVersion.parse(err_ctx, value)
+            setattr(info, attr, value)
+
+        for kind, names in sets.items():
+            if kind in seen:
+                setattr(info, kind, frozenset(names))
+        return info
 
 
 class SystemInfo(object):
@@ -69,11 +270,78 @@ class SystemInfo(object):
         self.os_version = None # type: str
         self.arch = None # type: str
         self.gpus_info = None # type: List[GpuInfo]
-        self.opengl_info = None # type: str
+        self.opengl_info = None # type: OpenGLInfo
+        self.kernel_log = None # type: KernelLogAnalyzer
+        self.packages = None # type: PackageIndex
+        self.driver_config = None # type: DriverConfig
+        self.collectors = None # type: Scheduler
+        self.cache = None # type: Cache
+        self.sudo_asked = False # type: bool
+
+    def start_collectors(
+        self, err_ctx: ErrorContext, config: Config, names: Iterable[str] = None
+    ):
+        """Starts collectors (all when `names` is None) in background.
+
+        Checks `require` what they use. Results of previous runs of the started
+        collectors are dropped first; sudo is only asked for on the first start
+        of a collector in `SUDO_COMMANDS`.
+        """
+        if names is None:
+            names = [name for name in COLLECTOR_STATE]
+        sudo = [cmd for name, cmd in SUDO_COMMANDS.items() if name in names]
+        if sudo and not self.sudo_asked and not config.quiet:
+            self.sudo_asked = True
+            acquire_sudo([arg for cmd in sudo for arg in cmd])
+        if not config.no_cache:
+            try:
+                self.cache = Cache(config.cache_dir, config.cache_ttl, config.refresh)
+            except OSError as e:
+                err_ctx.cache_error = str(e)
+        from .scheduler import Scheduler
+
+        collectors = [
+            ("os", self.collect_os_info),
+            ("gpu", self.collect_gpu_info),
+            ("opengl", self.collect_opengl_info),
+            ("journal", self.collect_journal_info),
+            ("packages", self.collect_packages_info),
+            ("driver_config", self.collect_driver_config),
+        ]
+        self.collectors = Scheduler(config.jobs)
+        for name, collect in collectors:
+            if name not in names:
+                continue
+            attrs, errors = COLLECTOR_STATE[name]
+            for attr in attrs:
+                setattr(self, attr, None)
+            for error in errors:
+                setattr(err_ctx, error, None)
+            self.collectors.add(name, collect, err_ctx, config)
+        self.collectors.start()
+
+    def require(self, *names: str):
+        """Waits for the given collectors (all when empty) to finish.
+
+        Collectors left out of the last `start_collectors` keep earlier results.
+        """
+        if self.collectors is None:
+            return
+        started = [name for name in names if name in self.collectors.tasks]
+        if started or not names:
+            self.collectors.wait(*started)
+
+    def stop_collectors(self):
+        if self.collectors is not None:
+            self.collectors.shutdown()
 
     def collect_os_info(self, err_ctx: ErrorContext, config: Config):
         try:
-            output = run(["uname", "-rms"], log_dir=config.temp_dir)
+            output = run(
+                ["uname", "-rms"],
+                report=config.report,
+                capture=Capture(max_bytes=config.max_output),
+            )
             err_ctx.uname_output = output
             parts = output.split()
             if len(parts) == 3:
@@ -88,9 +356,20 @@ class SystemInfo(object):
             err_ctx.os_parse_error = str(e)
             self.os_name = self.os_version = self.arch = None
 
+    @cached("gpus_info")
     def collect_gpu_info(self, err_ctx: ErrorContext, config: Config):
         try:
-            output = run(["lspci", "-k"], log_dir=config.temp_dir)
+            self.gpus_info = GpuInfo.from_sysfs_tree(err_ctx)
+        except (OSError, ValueError):
+            self.__collect_gpu_info_lspci__(err_ctx, config)
+
+    def __collect_gpu_info_lspci__(self, err_ctx: ErrorContext, config: Config):
+        try:
+            output = run(
+                ["lspci", "-k"],
+                report=config.report,
+                capture=Capture(max_bytes=config.max_output),
+            )
             err_ctx.lspci_output = output
             lines = output.splitlines()
             blocks = []
@@ -116,36 +395,61 @@ class SystemInfo(object):
             err_ctx.gpu_info_parse_error = str(e)
             self.gpus_info = None
 
+    @cached(
+        "opengl_info",
+        key=lambda config: "opengl_full" if config.glxinfo_full else None,
+    )
     def collect_opengl_info(self, err_ctx: ErrorContext, config: Config):
         try:
-            info = OpenGLInfo()
-            version = OpenGLVersion()
-            output = run(["glxinfo"], log_dir=config.temp_dir)
-            err_ctx.glxinfo_output = output
-            for line in output.splitlines():
-                if "OpenGL vendor string" in line:
-                    info.vendor = line.split(":", 1)[1].strip()
-                elif "OpenGL renderer string" in line:
-                    info.renderer = line.split(":", 1)[1].strip()
-                elif "OpenGL version string" in line:
-                    version.string = line.split(":", 1)[1].strip()
-            version.major, version.minor = OpenGLVersion.from_string(
-                err_ctx, version.string
+            output = run(
+                ["glxinfo", "-l"] if config.glxinfo_full else ["glxinfo", "-B"],
+                report=config.report,
+                capture=Capture(max_bytes=config.max_output),
             )
-            info.version = version
+            err_ctx.glxinfo_output = output
+            info = OpenGLInfo.from_glxinfo(err_ctx, output)
+            if info.version is None:
+                raise RuntimeError("no 'OpenGL version string' in glxinfo output")
             self.opengl_info = info
         except Exception as e:
             err_ctx.opengl_info_parse_error = str(e)
             self.opengl_info = None
 
     def collect_journal_info(self, err_ctx: ErrorContext, config: Config):
+        commands = [
+            (["dmesg"], True),
+            (["journalctl", "-k", "-b", "--no-pager", "-o", "short-monotonic"], False),
+        ]
+        errors = []
+        for cmd, sudo in commands:
+            analyzer = KernelLogAnalyzer()
+            try:
+                run(
+                    cmd,
+                    report=config.report,
+                    sudo=sudo,
+                    timeout=30,
+                    capture=Capture(
+                        line_filter=analyzer.feed, max_bytes=config.max_output
+                    ),
+                )
+                self.kernel_log = analyzer
+                return
+            except Exception as e:
+                errors.append(str(e))
+        err_ctx.journal_error = "\n".join(errors)
+
+    def collect_packages_info(self, err_ctx: ErrorContext, config: Config):
         try:
-            run(["dmesg"], log_dir=config.temp_dir, sudo=True, timeout=30)
+            self.packages = PackageIndex.from_status()
         except Exception as e:
-            print(e)
+            err_ctx.packages_error = "Failed to read {}: {}".format(DPKG_STATUS, e)
+            return
+        if config.report is not None:
+            config.report.add_file(DPKG_STATUS, "dpkg_status")
 
-    def collect_packages_info(self, err_ctx: ErrorContext, config: Config):
+    def collect_driver_config(self, err_ctx: ErrorContext, config: Config):
         try:
-            run(["apt", "list"], log_dir=config.temp_dir)
+            self.driver_config = DriverConfig.from_root()
         except Exception as e:
-            print(e)
+            err_ctx.driver_config_error = "Failed to read driver config: {}".format(e)
@@ -1,9 +1,87 @@
-from pathlib import Path
-from typing import List
-import subprocess
+from .logging import log_command
+from .profile import profiler
+from typing import TYPE_CHECKING, Callable, List
 import os
+import selectors
 import shutil
-import tarfile
+import subprocess
+import time
+
+if TYPE_CHECKING:
+    from .report import ReportWriter
+
+
+class Capture(object):
+    """What `run` keeps in memory from a command stdout.
+
+    The full output is always streamed to the report log in chunks, only the
+    first `head` and last `tail` bytes, or the lines accepted by `line_filter`,
+    are kept for the parsers. Reading stops after `max_bytes`.
+    """
+
+    def __init__(
+        self,
+        head: int = None,
+        tail: int = None,
+        line_filter: Callable[[str], bool] = None,
+        max_bytes: int = None,
+    ):
+        self.head = head # type: int
+        self.tail = tail # type: int
+        self.line_filter = line_filter # type: Callable[[str], bool]
+        self.max_bytes = max_bytes # type: int
+        self.head_data = bytearray()
+        self.tail_data = bytearray()
+        self.lines = [] # type: List[str]
+        self.partial = b""
+        self.size = 0 # type: int
+        self.truncated = False # type: bool
+
+    def feed(self, chunk: bytes) -> bool:
+        """Consumes a chunk, returns False once `max_bytes` is reached."""
+        if self.max_bytes is not None and self.size + len(chunk) > self.max_bytes:
+            chunk = chunk[: self.max_bytes - self.size]
+            self.truncated = True
+        self.size += len(chunk)
+
+        if self.line_filter is not None:
+            data = self.partial + chunk
+            lines = data.split(b"\n")
+            self.partial = lines.pop()[-PARTIAL_LINE_LIMIT:]
+            for line in lines:
+                self.__filter__(line)
+        elif self.head is None and self.tail is None:
+            self.head_data += chunk
+        else:
+            if self.head is not None and len(self.head_data) < self.head:
+                self.head_data += chunk[: self.head - len(self.head_data)]
+            if self.tail is not None:
+                self.tail_data += chunk
+                del self.tail_data[: max(0, len(self.tail_data) - self.tail)]
+        return not self.truncated
+
+    def output(self) -> bytes:
+        if self.line_filter is not None:
+            if self.partial:
+                self.__filter__(self.partial)
+                self.partial = b""
+            return "\n".join(self.lines).encode()
+        if not self.tail_data or self.size <= len(self.head_data):
+            return bytes(self.head_data)
+        if self.size <= len(self.head_data) + len(self.tail_data):
+            skip = len(self.head_data) + len(self.tail_data) - self.size
+            return bytes(self.head_data + self.tail_data[skip:])
+        return bytes(self.head_data + b"\n[...]\n" + self.tail_data)
+
+    def __filter__(self, raw: bytes):
+        line = raw.decode("utf-8", "replace")
+        if self.line_filter(line):
+            self.lines.append(line)
+
+
+PARTIAL_LINE_LIMIT = 64 * 1024
+STDERR_LIMIT = 64 * 1024
+CHUNK_SIZE = 64 * 1024
 
 
 def run(
@@ -11,54 +89,135 @@ def run(
     shell: bool = False,
     check: bool = True,
     universal_newlines: bool = True,
-    log_dir: str = None,
+    report=None, # type: ReportWriter
     sudo: bool = False,
     timeout: int = 5,
+    capture: Capture = None,
 ) -> str:
+    command = ["sudo", "-n", *cmd] if sudo else cmd
+    capture = capture or Capture()
+    stderr = bytearray()
+    log = None
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=shell
+    )
+    deadline = time.monotonic() + timeout
+
+    def hanged() -> RuntimeError:
+        proc.kill()
+        proc.wait()
+        return RuntimeError(
+            "Command '{}' hanged for {} seconds".format(" ".join(cmd), timeout)
+        )
+
     try:
-        if sudo:
-            print("running '{}' with sudo".format(" ".join(cmd)))
-            command = ["sudo", *cmd]
-        else:
-            command = cmd
-        result = subprocess.run(
+        if report is not None:
+            log = report.command_log(cmd[0].split(" ")[0], command)
+        with selectors.DefaultSelector() as selector:
+            selector.register(proc.stdout, selectors.EVENT_READ)
+            selector.register(proc.stderr, selectors.EVENT_READ)
+            while selector.get_map():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise hanged()
+                for key, _ in selector.select(remaining):
+                    chunk = os.read(key.fileobj.fileno(), CHUNK_SIZE)
+                    if not chunk:
+                        selector.unregister(key.fileobj)
+                    elif key.fileobj is proc.stderr:
+                        stderr += chunk[: STDERR_LIMIT - len(stderr)]
+                    else:
+                        if log is not None:
+                            log.write(chunk)
+                        if not capture.feed(chunk):
+                            proc.kill()
+                            selector.unregister(proc.stdout)
+                            selector.unregister(proc.stderr)
+                            break
+        # the child may close its pipes and keep running
+        try:
+            returncode, usage = wait_with_usage(proc, deadline - time.monotonic())
+        except subprocess.TimeoutExpired:
+            raise hanged()
+        log_command(
             command,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            universal_newlines=universal_newlines,
-            check=check,
-            shell=shell,
-            timeout=timeout,
+            returncode,
+            time.perf_counter() - started,
+            stderr.decode("utf-8", "replace"),
         )
-    except subprocess.CalledProcessError as e:
-        raise RuntimeError(
-            "Command '{}' failed with exit code {}:\n{}".format(
-                " ".join(cmd), e.returncode, e.stderr.strip()
+        if usage is not None:
+            profiler.record(
+                "subprocess",
+                " ".join(command),
+                time.perf_counter() - started,
+                usage.ru_utime + usage.ru_stime,
+                usage.ru_maxrss,
             )
-        ) from e
-    except subprocess.TimeoutExpired as e:
-        raise RuntimeError(
-            "Command '{}' hanged for {} seconds".format(" ".join(cmd), timeout)
-        ) from e
+        if capture.truncated:
+            stderr += "\n[output truncated at {} bytes]".format(capture.max_bytes).encode()
+        elif check and returncode != 0:
+            raise RuntimeError(
+                "Command '{}' failed with exit code {}:\n{}".format(
+                    " ".join(cmd), returncode, stderr.decode("utf-8", "replace").strip()
+                )
+            )
+    finally:
+        proc.stdout.close()
+        proc.stderr.close()
+        if log is not None:
+            log.close(stderr.decode("utf-8", "replace"))
 
-    if not log_dir is None:
-        cmd_name = cmd[0].split(" ")[0] + ".log"
-        file_name = os.path.join(log_dir, cmd_name)
-        with open(file_name, "a") as f:
-            f.write("=" * 40 + "\n")
-            f.write(" ".join(command) + "\n")
-            f.write("stdout:\n")
-            f.write(result.stdout)
-            f.write("stderr:\n")
-            f.write(result.stderr)
-            f.write("\n" + "=" * 40 + "\n")
+    output = capture.output()
+    if not universal_newlines:
+        return output.strip()
+    return output.decode("utf-8", "replace").strip()
 
-    return result.stdout.strip()
+
+def wait_with_usage(proc: subprocess.Popen, timeout: float = None):
+    """Reaps `proc` with wait4 to get its resource usage, like `proc.wait()`.
+
+    Raises `subprocess.TimeoutExpired` when `proc` still runs after `timeout`.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    delay = 0.001
+    while True:
+        try:
+            pid, status, usage = os.wait4(
+                proc.pid, 0 if deadline is None else os.WNOHANG
+            )
+        except ChildProcessError:
+            return proc.wait(), None
+        if pid != 0:
+            break
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise subprocess.TimeoutExpired(proc.args, timeout)
+        time.sleep(min(delay, remaining))
+        delay = min(delay * 2, 0.05)
+    if os.WIFSIGNALED(status):
+        proc.returncode = -os.WTERMSIG(status)
+    else:
+        proc.returncode = os.WEXITSTATUS(status)
+    return proc.returncode, usage
+
+
+def acquire_sudo(cmd: List[str]) -> bool:
+    """Asks for the sudo password upfront, so that `run(..., sudo=True)` never
+    prompts from a background collector."""
+    if os.geteuid() == 0:
+        return True
+    print("running '{}' with sudo".format(" ".join(cmd)))
+    try:
+        return subprocess.call(["sudo", "-v"]) == 0
+    except OSError as e:
+        print(e)
+        return False
 
 
 def local_path(path: str) -> str:
-    script_dir = Path(__file__).parent.resolve()
-    return str(script_dir.joinpath("..", path).resolve().absolute())
+    script_dir = os.path.dirname(os.path.realpath(__file__))
+    return os.path.realpath(os.path.join(script_dir, "..", path))
 
 
 def force_mkdir(path: str):
@@ -69,7 +228,3 @@ def force_mkdir(path: str):
             os.remove(path)
     os.makedirs(path)
 
-
-def create_acrhive(src_dir: str, dest_path: str):
-    with tarfile.open(dest_path, "w:gz") as tar:
-        tar.add(src_dir, arcname=os.path.basename(src_dir))
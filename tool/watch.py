@@ -0,0 +1,251 @@
+from .analyser import Check, create_checks, execute_checks, load_lib
+from .config import Config
+from .logging import TextColor, detach_file_logger
+from .packages import DPKG_STATUS
+from .history import record_history
+from .report import create_report
+from .results import encode_record, run_record, write_record
+from .system_info import ErrorContext, SystemInfo
+from typing import Dict, FrozenSet, Iterable, List, Set, Tuple
+import os
+import selectors
+import signal
+import socket
+import stat
+import sys
+import time
+
+
+class WatchPath(object):
+    def __init__(self, path: str, depth: int, collectors: Tuple[str, ...]):
+        self.path = path # type: str
+        self.depth = depth # type: int
+        self.collectors = collectors # type: Tuple[str, ...]
+
+
+# depth is how many directory levels below `path` are compared
+WATCH_PATHS = [
+    WatchPath("/etc/modprobe.d", 1, ("gpu", "driver_config")),
+    WatchPath("/lib/modprobe.d", 1, ("driver_config",)),
+    WatchPath("/etc/X11", 2, ("opengl", "driver_config")),
+    WatchPath(DPKG_STATUS, 0, ("packages", "opengl")),
+    WatchPath("/lib/modules", 1, ("os", "gpu", "opengl")),
+    WatchPath("/sys/bus/pci/drivers", 2, ("gpu", "opengl", "journal")),
+]
+
+CLIENT_TIMEOUT = 1.0
+
+
+def snapshot(path: str, depth: int) -> FrozenSet[Tuple[str, int, int]]:
+    """Path, mtime and size of `path` and of entries up to `depth` levels below."""
+    entries = set() # type: Set[Tuple[str, int, int]]
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return frozenset()
+    entries.add((path, st.st_mtime_ns, st.st_size))
+    if depth > 0 and stat.S_ISDIR(st.st_mode):
+        scan_entries(path, depth, entries)
+    return frozenset(entries)
+
+
+def scan_entries(path: str, depth: int, entries: Set[Tuple[str, int, int]]):
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    st = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                entries.add((entry.path, st.st_mtime_ns, st.st_size))
+                if depth > 1 and stat.S_ISDIR(st.st_mode):
+                    scan_entries(entry.path, depth - 1, entries)
+    except OSError:
+        pass
+
+
+class Watcher(object):
+    """Polls a few paths and maps their changes to collectors to run again.
+
+    Only directory listings and `lstat` results are compared, so a poll costs a
+    few hundred system calls and nothing runs between polls.
+    """
+
+    def __init__(self, paths: List[WatchPath] = WATCH_PATHS):
+        self.paths = paths # type: List[WatchPath]
+        self.snapshots = {
+            p.path: snapshot(p.path, p.depth) for p in paths
+        } # type: Dict[str, FrozenSet[Tuple[str, int, int]]]
+
+    def poll(self) -> Tuple[Set[str], List[str]]:
+        """Returns collectors affected by changes since the last poll and the
+        changed watched paths."""
+        collectors = set() # type: Set[str]
+        changed = [] # type: List[str]
+        for p in self.paths:
+            current = snapshot(p.path, p.depth)
+            if current != self.snapshots[p.path]:
+                self.snapshots[p.path] = current
+                collectors.update(p.collectors)
+                changed.append(p.path)
+        return collectors, changed
+
+
+class Publisher(object):
+    """Publishes result records to the RESULTS file and to UNIX socket clients.
+
+    Clients connecting to the socket get the latest record immediately and
+    every following record as it is produced.
+    """
+
+    def __init__(self, results: str, socket_path: str, format: str):
+        self.results = results # type: str
+        self.socket_path = socket_path # type: str
+        self.format = format # type: str
+        self.latest = None # type: bytes
+        self.clients = [] # type: List[socket.socket]
+        self.server = None # type: socket.socket
+        self.selector = selectors.DefaultSelector()
+        if socket_path is not None:
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+            self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.server.bind(socket_path)
+            self.server.listen(8)
+            self.server.setblocking(False)
+            self.selector.register(self.server, selectors.EVENT_READ)
+
+    def publish(self, record: dict):
+        if self.results is not None:
+            write_record(self.results, record, self.format)
+        self.latest = encode_record(record, self.format)
+        for client in list(self.clients):
+            self.__send__(client, self.latest)
+
+    def wait(self, timeout: float):
+        """Sleeps for `timeout` seconds, accepting socket clients meanwhile."""
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            if self.server is None:
+                time.sleep(remaining)
+                return
+            for _ in self.selector.select(remaining):
+                self.__accept__()
+
+    def close(self):
+        for client in self.clients:
+            client.close()
+        self.clients = []
+        if self.server is not None:
+            self.selector.unregister(self.server)
+            self.server.close()
+            self.server = None
+            try:
+                os.remove(self.socket_path)
+            except OSError:
+                pass
+        self.selector.close()
+
+    def __accept__(self):
+        try:
+            client, _ = self.server.accept()
+        except OSError:
+            return
+        client.setblocking(True)
+        client.settimeout(CLIENT_TIMEOUT)
+        self.clients.append(client)
+        if self.latest is not None:
+            self.__send__(client, self.latest)
+
+    def __send__(self, client: socket.socket, data: bytes):
+        try:
+            client.sendall(data)
+        except OSError:
+            client.close()
+            self.clients.remove(client)
+
+
+def affected(checks: List[Check], collectors: Iterable[str]) -> List[int]:
+    """Indexes of checks to run again: checks without inputs probe the live
+    system and always run, dependents run with their prerequisites."""
+    names = set() # type: Set[str]
+    indexes = []
+    for i, check in enumerate(checks):
+        if (
+            not check.inputs
+            or set(check.inputs) & set(collectors)
+            or set(check.requires) & names
+        ):
+            names.add(check.name)
+            indexes.append(i)
+    return indexes
+
+
+def watch_record(checks: List[Check], info: SystemInfo, changed: List[str]) -> dict:
+    record = run_record(checks, info)
+    record["changed"] = changed
+    return record
+
+
+def interrupt(signum, frame):
+    raise KeyboardInterrupt()
+
+
+def watch(config: Config, log_file):
+    """Runs all checks, then runs again the checks affected by system changes.
+
+    Only the first run is logged to `log_file` and put into the report.
+    Changes are collected until one poll sees nothing new, so a package upgrade
+    touching the watched paths many times triggers only one run.
+    """
+    TextColor.enable()
+    signal.signal(signal.SIGTERM, interrupt)
+    load_lib(config)
+    info = SystemInfo()
+    err_ctx = ErrorContext()
+    checks = create_checks(config)
+    watcher = Watcher()
+    publisher = Publisher(config.results, config.socket, config.format)
+    try:
+        execute_checks(checks, err_ctx, info, config)
+        create_report(config, log_file)
+        # the log is only read by the report, a daemon must not grow it forever
+        detach_file_logger(log_file)
+        log_file.close()
+        config.report = None
+        config.refresh = True
+        publisher.publish(watch_record(checks, info, []))
+        if not config.no_history:
+            record_history(config, run_record(checks, info))
+        print("watching for system changes every {}s".format(config.watch_interval))
+
+        pending = set() # type: Set[str]
+        changed = [] # type: List[str]
+        while True:
+            publisher.wait(config.watch_interval)
+            collectors, paths = watcher.poll()
+            if collectors:
+                pending.update(collectors)
+                changed.extend(p for p in paths if p not in changed)
+                continue
+            if not pending:
+                continue
+
+            print("changed: {}".format(", ".join(changed)))
+            rerun = [(i, type(checks[i])()) for i in affected(checks, pending)]
+            execute_checks([c for _, c in rerun], err_ctx, info, config, pending)
+            for i, check in rerun:
+                checks[i] = check
+            publisher.publish(watch_record(checks, info, changed))
+            if not config.no_history:
+                record_history(config, run_record(checks, info))
+            pending = set()
+            changed = []
+    except KeyboardInterrupt:
+        pass
+    finally:
+        publisher.close()
+        sys.stdout.flush()
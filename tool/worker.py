@@ -0,0 +1,279 @@
+from .lib import Lib, NativeError
+from .profile import profiler
+from typing import Dict, List, Tuple
+import atexit
+import ctypes
+import functools
+import mmap
+import os
+import signal
+import tempfile
+import threading
+
+# deadlines of slow native calls, seconds, others get `NativeRunner.timeout`
+CALL_TIMEOUTS = {"runGpuBenchmark": 120.0, "runFramePacing": 120.0}
+
+STARTUP_TIMEOUT = 30.0
+
+
+class CallError(NativeError):
+    """A native call raised an exception in the worker, which keeps running."""
+
+
+class Struct(object):
+    """Picklable copy of a ctypes structure, fields keep their names."""
+
+    def __init__(self, fields: Dict[str, object]):
+        self.__dict__.update(fields)
+
+
+def to_plain(value):
+    if isinstance(value, ctypes.Structure):
+        return Struct(
+            {name: to_plain(getattr(value, name)) for name, _ in value._fields_}
+        )
+    if isinstance(value, ctypes.Array):
+        return [to_plain(x) for x in value]
+    if isinstance(value, tuple):
+        return tuple(to_plain(x) for x in value)
+    return value
+
+
+class SharedBuffer(object):
+    """Memory mapped by the caller and, for one call, by the worker.
+
+    A native call passed a SharedBuffer writes its result straight into these
+    pages and the caller reads them in place, nothing is copied or pickled.
+    The file descriptor is sent to the worker along with the call. The caller
+    closes the buffer, or uses it as a context manager, once no view of `map`
+    is left.
+    """
+
+    def __init__(self, size: int):
+        self.size = size # type: int
+        if hasattr(os, "memfd_create"):
+            self.file = open(os.memfd_create("gfx_health_check"), "r+b")
+        else:
+            self.file = tempfile.TemporaryFile()
+        self.file.truncate(size)
+        self.map = mmap.mmap(self.file.fileno(), size)
+
+    def __enter__(self) -> "SharedBuffer":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def fileno(self) -> int:
+        return self.file.fileno()
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+
+class SharedArg(object):
+    """Stands for a `SharedBuffer` argument in a call sent to the worker."""
+
+    def __init__(self, size: int):
+        self.size = size # type: int
+
+
+def attach(conn, arg: SharedArg) -> mmap.mmap:
+    from multiprocessing.reduction import recv_handle
+
+    fd = recv_handle(conn)
+    try:
+        return mmap.mmap(fd, arg.size)
+    finally:
+        os.close(fd)
+
+
+def unshare(value, maps: List[mmap.mmap]):
+    """`value` with the shared buffers and ctypes objects laid over them
+    replaced by None, the caller has them already."""
+    if isinstance(value, tuple):
+        return tuple(unshare(x, maps) for x in value)
+    if any(value is m for m in maps):
+        return None
+    if isinstance(value, (ctypes.Structure, ctypes.Array)):
+        address = ctypes.addressof(value)
+        for m in maps:
+            start = ctypes.addressof(ctypes.c_char.from_buffer(m))
+            if start <= address < start + len(m):
+                return None
+    return value
+
+
+def describe_exit(code: int) -> str:
+    if code is None:
+        return ""
+    if code < 0:
+        try:
+            return " with {}".format(signal.Signals(-code).name)
+        except ValueError:
+            return " with signal {}".format(-code)
+    return " with exit code {}".format(code)
+
+
+def serve(conn):
+    """Worker process loop: loads the lib, then runs calls until the pipe closes."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    lib = Lib()
+    try:
+        lib.load()
+    except Exception as e:
+        conn.send(("error", str(e)))
+        return
+    conn.send(("ok", None))
+    while True:
+        try:
+            name, args = conn.recv()
+            maps = [attach(conn, a) for a in args if isinstance(a, SharedArg)]
+        except (EOFError, OSError):
+            return
+        shared = iter(maps)
+        args = tuple(next(shared) if isinstance(a, SharedArg) else a for a in args)
+        try:
+            result = getattr(lib, name)(*args)
+            conn.send(("ok", to_plain(unshare(result, maps))))
+        except Exception as e:
+            conn.send(("error", "{}: {}".format(type(e).__name__, e)))
+
+
+class Worker(object):
+    def __init__(self, context):
+        self.conn, child = context.Pipe()
+        self.process = context.Process(target=serve, args=(child,), daemon=True)
+        self.process.start()
+        child.close()
+        self.started = False # type: bool
+
+    def call(self, name: str, args: tuple, timeout: float):
+        from multiprocessing.reduction import send_handle
+
+        shared = [a for a in args if isinstance(a, SharedBuffer)]
+        message = tuple(
+            SharedArg(a.size) if isinstance(a, SharedBuffer) else a for a in args
+        )
+        try:
+            self.conn.send((name, message))
+            for buffer in shared:
+                send_handle(self.conn, buffer.fileno(), self.process.pid)
+        except OSError:
+            self.__crashed__(name)
+        return self.receive(name, timeout)
+
+    def receive(self, name: str, timeout: float):
+        if not self.conn.poll(timeout):
+            self.kill()
+            raise NativeError(
+                "Native call '{}' timed out after {:.0f}s".format(name, timeout)
+            )
+        try:
+            status, value = self.conn.recv()
+        except (EOFError, OSError):
+            self.__crashed__(name)
+        if status != "ok":
+            raise CallError(value)
+        return value
+
+    def start(self):
+        """Waits until the worker has loaded the lib."""
+        if not self.started:
+            self.receive("load", STARTUP_TIMEOUT)
+            self.started = True
+
+    def kill(self):
+        if self.process.is_alive():
+            try:
+                os.kill(self.process.pid, signal.SIGKILL)
+            except OSError:
+                pass
+        self.process.join(1)
+        self.conn.close()
+
+    def __crashed__(self, name: str):
+        self.process.join(1)
+        code = self.process.exitcode
+        self.kill()
+        raise NativeError("Native call '{}' crashed{}".format(name, describe_exit(code)))
+
+
+class NativeRunner(object):
+    """Runs `Lib` calls in a worker process with a deadline for every call.
+
+    Workers are forked by a forkserver that has already imported the lib
+    bindings, and a spare worker is kept ready. A call that crashes or runs
+    out of time kills its worker and raises `NativeError`; the next call goes
+    to the spare, without the GL state of the lost one.
+    """
+
+    def __init__(self, spares: int = 1, timeout: float = 30.0):
+        self.spares = spares # type: int
+        self.timeout = timeout # type: float
+        self.restarts = 0 # type: int
+        self.context = None
+        self.worker = None # type: Worker
+        self.idle = [] # type: List[Worker]
+        self.lock = threading.Lock()
+
+    def load(self):
+        import multiprocessing
+
+        self.context = multiprocessing.get_context("forkserver")
+        self.context.set_forkserver_preload([Lib.__module__])
+        self.worker = Worker(self.context)
+        self.worker.start()
+        self.idle = [Worker(self.context) for _ in range(self.spares)]
+        atexit.register(self.close)
+
+    def session(self, w: int = 1, h: int = 1, backend: str = "auto") -> Lib.Session:
+        return Lib.Session(self, w, h, backend)
+
+    def probeOpenGL(self) -> Tuple[Lib.Result, Lib.GlProbe]:
+        """`Lib.probeOpenGL` into memory shared with the worker, copied out once
+        so that the buffer is closed right away."""
+        with SharedBuffer(ctypes.sizeof(Lib.GlProbe)) as buffer:
+            res, _ = self.call("probeOpenGL", buffer)
+            return res, Lib.GlProbe.from_buffer_copy(buffer.map)
+
+    def renderScene(
+        self, scene: int, w: int, h: int, buffer: SharedBuffer
+    ) -> Tuple[Lib.Result, mmap.mmap]:
+        """`Lib.renderScene` into `buffer` of at least w * h * 4 bytes, shared
+        with the worker; the caller compares the pixels in place and closes
+        the buffer, which can be reused by later calls."""
+        res, _ = self.call("renderScene", scene, w, h, buffer)
+        return res, buffer.map
+
+    def call(self, name: str, *args):
+        timeout = CALL_TIMEOUTS.get(name, self.timeout)
+        with self.lock, profiler.measure("native", name):
+            if self.worker is None:
+                self.__replace__()
+            try:
+                return self.worker.call(name, args, timeout)
+            except CallError:
+                raise
+            except NativeError:
+                self.worker = None
+                self.restarts += 1
+                raise
+
+    def close(self):
+        for worker in [self.worker] + self.idle:
+            if worker is not None:
+                worker.kill()
+        self.worker = None
+        self.idle = []
+
+    def __replace__(self):
+        self.worker = self.idle.pop(0) if self.idle else Worker(self.context)
+        self.idle.append(Worker(self.context))
+        self.worker.start()
+
+    def __getattr__(self, name: str):
+        if name.startswith("__") or not hasattr(Lib, name):
+            raise AttributeError(name)
+        return functools.partial(self.call, name)